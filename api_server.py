@@ -1,13 +1,33 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
+from werkzeug.datastructures import MultiDict
 from flask_cors import CORS
 import numpy as np
-import pandas as pd
-from tensorflow.keras.models import load_model
-import joblib
 from datetime import datetime
+import argparse
+import hashlib
+import hmac
+import json
 import os
+import subprocess
+import sys
+import threading
+import time
 import requests
 import backtest_engine
+import chart_data
+import forecaster
+import indicators
+import job_queue
+import kline_cache
+import market_data
+import metrics
+import micro_batcher
+import model_registry
+import multi_asset
+import price_hub
+import risk_engine
+import rollups
+import training
 
 app = Flask(__name__)
 CORS(app)
@@ -17,61 +37,544 @@ MODEL_PATH = 'models/market_model.h5'
 SCALER_PATH = 'models/market_scaler.pkl'
 DATA_PATH = 'data/BTC_USD.csv'
 
-model = None
-scaler = None
+# Shared cache in front of Binance klines; swap the client to point at a fake server
+klines = kline_cache.KlineCache(kline_cache.BinanceKlineClient())
+KLINE_LIMIT = 1000  # most candles Binance returns per request; larger ranges come from local stores
+MAX_CHART_POINTS = 20000
+MAX_RISK_PATHS = 200000
+MAX_RISK_HORIZON = 10000  # days per path
+
+# Changing metrics settings and reading profiles (which expose source paths
+# and call stacks) needs this token in an X-Admin-Token header. Without it
+# they are refused for every client except loopback ones. Set it when
+# behind a reverse proxy, where every client looks like loopback.
+METRICS_ADMIN_TOKEN = os.environ.get('METRICS_ADMIN_TOKEN')
+
+# Shared multi-asset model (training.py with several --data files). Coins it
+# covers get their own forecast; the rest follow Bitcoin's trend below
+MULTI_MODEL_PATH = multi_asset.MODEL_PATH
+MULTI_SCALERS_PATH = multi_asset.SCALERS_PATH
+
+# Coin correlation coefficients (how much they follow Bitcoin's trend)
+COIN_CORRELATIONS = {
+    'BTCUSDT': 1.0,      # Bitcoin - baseline
+    'ETHUSDT': 1.15,     # Ethereum
+    'BNBUSDT': 1.10,     # Binance Coin
+    'SOLUSDT': 1.40,     # Solana
+    'ADAUSDT': 1.25,     # Cardano
+    'XRPUSDT': 1.30,     # Ripple
+    'DOTUSDT': 1.35,     # Polkadot  
+    'DOGEUSDT': 1.50,    # Dogecoin
+    'AVAXUSDT': 1.35,    # Avalanche
+    'POLUSDT': 1.30,     # Polygon (POL)
+}
+
+# Timeframe multipliers
+TIMEFRAME_MULTIPLIERS = {
+    '30m': 0.02,
+    '1h': 0.04,
+    '4h': 0.15,
+    '1d': 1.0,
+    '1w': 5.0,
+    '1M': 15.0
+}
+
+# Live prices: one upstream feed for every coin, fanned out to all clients.
+# PRICE_FEED=replay:<ticks.csv> replays recorded ticks instead of polling Binance
+prices = price_hub.PriceHub(
+    price_hub.feed_from_config(os.environ.get('PRICE_FEED', 'binance')),
+    list(COIN_CORRELATIONS),
+)
+PRICE_WAIT = 2.0  # seconds predict waits for the first tick after startup
+STREAM_MAX_SECONDS = 300  # streams end periodically so server threads get recycled
+# Each open SSE stream holds a gthread thread, so cap them below gunicorn's
+# THREADS per worker and answer 503 above that to keep threads for requests
+MAX_STREAMS = int(os.environ.get('MAX_STREAMS', max(1, int(os.environ.get('THREADS', 16)) // 2)))
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+BASE_CONFIDENCE = 0.85
+CONFIDENCE_ADJUSTMENTS = {
+    '30m': 0.05,
+    '1h': 0.03,
+    '4h': 0.0,
+    '1d': 0.0,
+    '1w': -0.05,
+    '1M': -0.10
+}
+
+# Base forecast shared by every symbol/timeframe, keyed by
+# (last candle date, model version, scaler version)
+_forecast = None
+_forecast_lock = threading.Lock()
+prediction_cache_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+_cache_stats_lock = threading.Lock()
+PREDICT_CACHE_CONTROL = 'private, max-age=60'
+
+# Compiled forecaster for the current model/scaler versions, and multi-day
+# forecasts keyed by (base forecast key, horizon)
+_forecaster = None
+_forecaster_lock = threading.Lock()
+_forecasts = {}
+_forecasts_lock = threading.Lock()
+MAX_HORIZON = 365
+
+# Next-day forecast of every coin the multi-asset model covers, from one
+# batched forward pass, keyed by (model version, scalers version, last candles)
+_symbol_forecasts = None
+_symbol_forecasts_lock = threading.Lock()
+_predictor = None
+MAX_INDICATOR_ROWS = 5000
+
+# Bitcoin's next-bar forecast at each intraday timeframe with its own model
+# (training.py train --timeframe 1h), from that timeframe's rollup store and
+# keyed by (model version, scaler version, last closed bar)
+_timeframe_forecasts = {}
+_timeframe_forecasts_lock = threading.Lock()
+
+# Concurrent forecaster steps are merged into one model call when they arrive
+# within this many milliseconds of each other (0 disables batching)
+MICRO_BATCH_MS = float(os.environ.get('MICRO_BATCH_MS', 2))
+_batcher = None
+
+# Model warm-up reported by /api/health: cold -> warming -> ready (or failed)
+warmup_state = {'state': 'cold', 'started': None, 'seconds': None, 'error': None}
+
+# Background backtests: identical requests share one job, results kept 10 minutes
+backtest_jobs = job_queue.JobQueue(max_workers=2, max_pending=32, result_ttl=600)
 
 def load_ml_model():
-    """Load the LSTM model and scaler"""
-    global model, scaler
+    """Warm the model registry with the LSTM model and scaler"""
     try:
         if os.path.exists(MODEL_PATH):
-            model = load_model(MODEL_PATH)
+            model_registry.get_model(MODEL_PATH)
             print("✅ Model loaded successfully")
         else:
             print(f"⚠️ Model file not found at {MODEL_PATH}")
             
         if os.path.exists(SCALER_PATH):
-            scaler = joblib.load(SCALER_PATH)
+            model_registry.get_scaler(SCALER_PATH)
             print("✅ Scaler loaded successfully")
         else:
             print(f"⚠️ Scaler file not found at {SCALER_PATH}")
     except Exception as e:
         print(f"❌ Error loading model/scaler: {e}")
 
-def get_latest_data(sequence_length=60):
-    """Get the latest data for prediction"""
+def warm_up():
+    """
+    Load the model and scaler, then run one dummy prediction through the
+    forecaster and model.predict so the first real request skips tracing
+    """
+    warmup_state.update(state='warming', started=time.time(), error=None)
+    start = time.perf_counter()
+    prices.start()
     try:
-        df = pd.read_csv(DATA_PATH)
-        df = df.sort_values('Date')
+        load_ml_model()
+        model, scaler = get_model_and_scaler()
+        if model is None or scaler is None:
+            raise RuntimeError('Model or scaler file missing')
         
-        # Get the last sequence_length rows
-        latest_data = df[['BTC_Close', 'BTC_Volume']].tail(sequence_length).values
+        _, sequence_length, n_features = model.input_shape
+        dummy = np.zeros((1, sequence_length, n_features), dtype=np.float32)
+        get_forecaster(model, scaler).rollout(dummy, 1)
+        model.predict(dummy, verbose=0)
+        try:
+            indicators.get_engine(DATA_PATH)
+        except Exception as e:
+            print(f"⚠️ Market data not loaded during warm-up: {e}")
+        try:
+            get_symbol_forecasts()
+        except Exception as e:
+            print(f"⚠️ Multi-asset model not warmed up: {e}")
+        warmup_state['state'] = 'ready'
+        print(f"🔥 Model warmed up in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        warmup_state.update(state='failed', error=str(e))
+        print(f"❌ Warm-up failed: {e}")
+    finally:
+        warmup_state['seconds'] = time.perf_counter() - start
+
+def preload():
+    """
+    Load what workers can share before a pre-forking server forks them.
+
+    NumPy models are plain arrays, so warming up here leaves one
+    copy-on-write copy for every worker. TensorFlow must not be initialized
+    before fork, so with the keras backend only the scaler and market data
+    are preloaded and each worker loads its model in start_worker().
+    """
+    if model_registry.BACKEND == 'numpy':
+        warm_up()
+        return
+    try:
+        if os.path.exists(SCALER_PATH):
+            model_registry.get_scaler(SCALER_PATH)
+        indicators.get_engine(DATA_PATH)
+    except Exception as e:
+        print(f"⚠️ Preload failed, workers will load on their own: {e}")
+
+def start_worker():
+    """Per-worker startup after fork: warm up in the background unless preloaded"""
+    if warmup_state['state'] != 'ready':
+        threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+def count_cache(result):
+    """Bump a prediction cache counter; a bare += from many request threads loses updates"""
+    with _cache_stats_lock:
+        prediction_cache_stats[result] += 1
+
+def cache_stats():
+    with _cache_stats_lock:
+        return dict(prediction_cache_stats)
+
+def get_model_and_scaler():
+    """Current model and scaler from the registry, or None for a missing artifact"""
+    model = model_registry.get_model(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+    scaler = model_registry.get_scaler(SCALER_PATH) if os.path.exists(SCALER_PATH) else None
+    return model, scaler
+
+def get_base_forecast(model, scaler):
+    """
+    Bitcoin next-day forecast, cached until a new candle arrives or the model
+    or scaler changes on disk
+
+    Returns:
+        dict with btc_price, btc_predicted_price, btc_percent_change and the
+        cache key, or None if the market data is unavailable
+    """
+    global _forecast
+    try:
+        with metrics.span('predict.store'):
+            last_date = market_data.get_store(DATA_PATH).last_date()
+    except Exception as e:
+        print(f"❌ Error getting latest data: {e}")
+        return None
+    key = (str(last_date), model_registry.get_version(MODEL_PATH), model_registry.get_version(SCALER_PATH))
+    
+    forecast = _forecast
+    if forecast is not None and forecast['key'] == key:
+        count_cache('hits')
+        return forecast
+    
+    with _forecast_lock:
+        if _forecast is not None and _forecast['key'] == key:
+            count_cache('hits')
+            return _forecast
+        count_cache('misses')
+        
+        runner = get_forecaster(model, scaler)
+        X, btc_price = get_latest_data(scaler, runner.sequence_length)
+        if X is None:
+            return None
+        
+        # Make prediction using Bitcoin model
+        with metrics.span('predict.model'):
+            scaled_prediction = runner.rollout(X, 1)
+        
+        # Inverse transform
+        with metrics.span('predict.inverse'):
+            dummy_pred = np.zeros((len(scaled_prediction), 2))
+            dummy_pred[:, 0] = scaled_prediction.flatten()
+            btc_predicted_price = scaler.inverse_transform(dummy_pred)[0][0]
+        
+        # Calculate Bitcoin's percentage change
+        btc_percent_change = ((btc_predicted_price - btc_price) / btc_price) * 100
+        
+        _forecast = {
+            'key': key,
+            'btc_price': float(btc_price),
+            'btc_predicted_price': float(btc_predicted_price),
+            'btc_percent_change': float(btc_percent_change),
+        }
+        return _forecast
+
+def get_forecaster(model, scaler):
+    """Forecaster for the loaded model and scaler, recompiled when either is reloaded"""
+    global _forecaster, _batcher
+    current = _forecaster
+    if current is None or current.model is not model or current.scaler is not scaler:
+        with _forecaster_lock:
+            current = _forecaster
+            if current is None or current.model is not model or current.scaler is not scaler:
+                step = forecaster.compile_step(model)
+                if MICRO_BATCH_MS > 0:
+                    if _batcher is not None:
+                        _batcher.close()
+                    _batcher = micro_batcher.MicroBatcher(step, max_wait=MICRO_BATCH_MS / 1000)
+                    step = _batcher.predict
+                current = _forecaster = forecaster.Forecaster(model, scaler, step=step)
+    return current
+
+def get_symbol_forecasts():
+    """
+    {symbol: forecast} from the multi-asset model, cached until any coin gets
+    a new candle or the model or scalers change; {} without a multi-asset model
+    """
+    global _symbol_forecasts, _predictor
+    if not multi_asset.available():
+        return {}
+    model = model_registry.get_model(MULTI_MODEL_PATH)
+    scalers = model_registry.get_scalers(MULTI_SCALERS_PATH)
+    predictor = _predictor
+    if predictor is None or predictor.model is not model or predictor.scalers is not scalers:
+        predictor = _predictor = multi_asset.MultiAssetPredictor(model, scalers)
+    key = (
+        model_registry.get_version(MULTI_MODEL_PATH), model_registry.get_version(MULTI_SCALERS_PATH),
+        tuple((p, str(store.last_date())) for p, store in predictor.stores().items()),
+    )
+    
+    cached = _symbol_forecasts
+    if cached is not None and cached['key'] == key:
+        count_cache('hits')
+        return cached['forecasts']
+    
+    with _symbol_forecasts_lock:
+        if _symbol_forecasts is not None and _symbol_forecasts['key'] == key:
+            count_cache('hits')
+            return _symbol_forecasts['forecasts']
+        count_cache('misses')
+        _symbol_forecasts = {'key': key, 'forecasts': predictor.forecast(1)}
+        return _symbol_forecasts['forecasts']
+
+def get_timeframe_forecast(timeframe):
+    """
+    Bitcoin's next `timeframe` bar from the model trained on that timeframe,
+    or None without such a model or stored candles (predict() then scales
+    the daily forecast)
+    """
+    if timeframe == '1d' or timeframe not in rollups.TIMEFRAMES:
+        return None
+    model_path, scaler_path = training.model_paths(timeframe)
+    if not (os.path.exists(model_path) and os.path.exists(scaler_path) and rollups.available('BTC', timeframe)):
+        return None
+    model = model_registry.get_model(model_path)
+    scaler = model_registry.get_scaler(scaler_path)
+    _, sequence_length, _ = model.input_shape
+    view = rollups.closed_tail('BTC', timeframe, sequence_length)
+    if len(view['Date']) < sequence_length:
+        return None
+    key = (model_registry.get_version(model_path), model_registry.get_version(scaler_path), str(view['Date'][-1]))
+    
+    cached = _timeframe_forecasts.get(timeframe)
+    if cached is not None and cached['key'] == key:
+        count_cache('hits')
+        return cached
+    
+    with _timeframe_forecasts_lock:
+        cached = _timeframe_forecasts.get(timeframe)
+        if cached is not None and cached['key'] == key:
+            count_cache('hits')
+            return cached
+        count_cache('misses')
+        runner = cached['forecaster'] if cached is not None and cached['forecaster'].model is model \
+            and cached['forecaster'].scaler is scaler else forecaster.Forecaster(model, scaler)
+        price = float(view['BTC_Close'][-1])
+        window = market_data.stack(view, ['BTC_Close', 'BTC_Volume'])
+        predicted = float(runner.forecast(window, 1)[0, 0])
+        _timeframe_forecasts[timeframe] = {
+            'key': key,
+            'forecaster': runner,
+            'btc_price': price,
+            'btc_predicted_price': predicted,
+            'btc_percent_change': (predicted - price) / price * 100,
+        }
+        return _timeframe_forecasts[timeframe]
+
+def get_multi_day_forecast(model, scaler, horizon):
+    """Bitcoin forecast for the next `horizon` days, cached like the base forecast"""
+    base = get_base_forecast(model, scaler)
+    if base is None:
+        return None
+    key = (base['key'], horizon)
+    
+    cached = _forecasts.get(key)
+    if cached is not None:
+        count_cache('hits')
+        return cached
+    count_cache('misses')
+    
+    runner = get_forecaster(model, scaler)
+    store = market_data.get_store(DATA_PATH)
+    window = market_data.stack(store.tail(runner.sequence_length), ['BTC_Close', 'BTC_Volume'])
+    with metrics.span('forecast.rollout'):
+        prices = runner.forecast(window, horizon)[0]
+    last_date = np.datetime64(store.last_date(), 'D')
+    dates = last_date + np.arange(1, horizon + 1)
+    
+    result = {
+        'key': base['key'],
+        'btc_price': base['btc_price'],
+        'dates': [str(d) for d in dates],
+        'prices': prices.tolist(),
+    }
+    # Only forecasts for the current candle and model stay useful. The
+    # rollout above runs unlocked so concurrent horizons still micro-batch.
+    with _forecasts_lock:
+        for old in [k for k in _forecasts if k[0] != base['key']]:
+            _forecasts.pop(old, None)
+        _forecasts[key] = result
+    return result
+
+def get_forecast_as_of(model, scaler, horizon, as_of):
+    """
+    Forecast from the model's input window ending on `as_of` (a past date),
+    to compare with what actually happened. Not cached.
+    """
+    runner = get_forecaster(model, scaler)
+    view = market_data.get_store(DATA_PATH).between(None, as_of)
+    if len(view['Date']) < runner.sequence_length:
+        return None
+    window = market_data.stack(view, ['BTC_Close', 'BTC_Volume'])[-runner.sequence_length:]
+    prices = runner.forecast(window, horizon)[0]
+    dates = np.datetime64(view['Date'][-1], 'D') + np.arange(1, horizon + 1)
+    return {
+        'btc_price': float(view['BTC_Close'][-1]),
+        'dates': [str(d) for d in dates],
+        'prices': prices.tolist(),
+    }
+
+def get_latest_data(scaler, sequence_length=backtest_engine.SEQUENCE_LENGTH):
+    """Get the latest data for prediction"""
+    try:
+        with metrics.span('predict.data'):
+            store = market_data.get_store(DATA_PATH)
+            
+            # Get the last sequence_length rows
+            latest = store.tail(sequence_length)
+            latest_data = market_data.stack(latest, ['BTC_Close', 'BTC_Volume'])
         
         # Scale the data
-        scaled_data = scaler.transform(latest_data)
+        with metrics.span('predict.scale'):
+            scaled_data = scaler.transform(latest_data)
         
         # Reshape for LSTM input (1, sequence_length, features)
         X = scaled_data.reshape(1, sequence_length, 2)
         
-        return X, df['BTC_Close'].iloc[-1]
+        return X, latest['BTC_Close'][-1]
     except Exception as e:
         print(f"❌ Error getting latest data: {e}")
         return None, None
 
+@app.before_request
+def start_request_metrics():
+    """Start the request timer, and the sampling profiler when this request asks for it"""
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+    if metrics.profiling_allowed() and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1') \
+            and is_metrics_admin():
+        g.sampler = metrics.Sampler().start()
+
+@app.after_request
+def record_request_metrics(response):
+    sampler = g.pop('sampler', None)
+    if sampler is not None:
+        # Streamed responses are profiled up to their first byte
+        response.headers['X-Profile-Id'] = metrics.save_profile(sampler.stop(), request.full_path)
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(endpoint, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+@metrics.collector
+def collect_serving_stats():
+    """Caches, queues and loaded artifacts, read from their own stats on each scrape"""
+    for result, n in cache_stats().items():
+        yield 'prediction_cache_total', 'counter', 'Forecast cache lookups', {'result': result}, n
+    kline_stats = klines.stats()
+    for result in ('hits', 'misses', 'coalesced'):
+        yield 'kline_cache_total', 'counter', 'Kline cache lookups', {'result': result}, kline_stats[result]
+    yield 'kline_cache_bytes', 'gauge', 'Bytes held by the kline cache', {}, kline_stats['bytes']
+    for status, n in backtest_jobs.stats().items():
+        yield 'backtest_jobs', 'gauge', 'Backtest jobs by status (deduplicated is a running total)', {'status': status}, n
+    price_stats = prices.stats()
+    yield 'price_ticks_total', 'counter', 'Price updates published by the price hub', {}, price_stats['ticks']
+    yield 'price_subscribers', 'gauge', 'Open price streams', {}, price_stats['subscribers']
+    yield 'sse_streams', 'gauge', 'Open server-sent event streams (capped at MAX_STREAMS)', {}, _open_streams
+    if _batcher is not None:
+        yield 'micro_batch_queue_depth', 'gauge', 'Rows waiting for the next batched model call', {}, \
+            _batcher.stats()['queue_depth']
+    for path, entry in model_registry.stats().items():
+        yield 'artifact_load_seconds', 'gauge', 'Load time of each cached model/scaler', {'path': path}, entry['load_time_s']
+        yield 'artifact_memory_bytes', 'gauge', 'Memory held by each cached model/scaler', {'path': path}, entry['memory_bytes']
+    yield 'warmup_ready', 'gauge', '1 once the model is warmed up', {}, int(warmup_state['state'] == 'ready')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy',
-        'model_loaded': model is not None,
-        'scaler_loaded': scaler is not None,
+        'status': 'healthy' if warmup_state['state'] == 'ready' else warmup_state['state'],
+        'warmup': dict(warmup_state),
+        'model_loaded': model_registry.is_loaded(MODEL_PATH),
+        'scaler_loaded': model_registry.is_loaded(SCALER_PATH),
+        'inference_backend': model_registry.BACKEND,
+        'artifacts': model_registry.stats(),
+        'historical_cache': klines.stats(),
+        'prediction_cache': cache_stats(),
+        'backtest_jobs': backtest_jobs.stats(),
+        'micro_batcher': _batcher.stats() if _batcher is not None else None,
+        'prices': prices.stats(),
+        'streams': {'open': _open_streams, 'max': MAX_STREAMS},
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the model is warmed up, 503 before"""
+    is_ready = warmup_state['state'] == 'ready'
+    return jsonify({'ready': is_ready, 'state': warmup_state['state']}), 200 if is_ready else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage/endpoint latency histograms, upstream and error counters, cache and queue gauges"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def is_metrics_admin():
+    """True when the request carries METRICS_ADMIN_TOKEN, or comes from loopback with no token set"""
+    if METRICS_ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), METRICS_ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def metrics_admin_denied():
+    return jsonify({'error': 'Needs the METRICS_ADMIN_TOKEN in an X-Admin-Token header'}), 403
+
+@app.route('/api/metrics/config', methods=['GET', 'POST'])
+def metrics_config():
+    """Read the instrumentation/profiling switches; admins can flip them at runtime with POST"""
+    if request.method == 'POST':
+        if not is_metrics_admin():
+            return metrics_admin_denied()
+        body = request.get_json(silent=True) or {}
+        if 'metrics' in body:
+            metrics.enable(body['metrics'])
+        if 'profiling' in body:
+            metrics.allow_profiling(body['profiling'])
+    return jsonify({'metrics': metrics.ENABLED, 'profiling': metrics.profiling_allowed()})
+
+@app.route('/api/metrics/profiles', methods=['GET'])
+def list_profiles():
+    """Profiled requests still kept, oldest first"""
+    if not is_metrics_admin():
+        return metrics_admin_denied()
+    return jsonify({'profiles': metrics.list_profiles()})
+
+@app.route('/api/metrics/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Collapsed stacks of one profiled request (?format=json for the summary)"""
+    if not is_metrics_admin():
+        return metrics_admin_denied()
+    profile = metrics.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Unknown or expired profile'}), 404
+    if request.args.get('format') == 'json':
+        return jsonify({k: v for k, v in profile.items() if k != 'collapsed'})
+    return Response(profile['collapsed'], mimetype='text/plain')
+
 @app.route('/api/predict', methods=['GET'])
 def predict():
     """Get cryptocurrency price prediction"""
     try:
+        model, scaler = get_model_and_scaler()
         if model is None or scaler is None:
             return jsonify({
                 'error': 'Model not loaded',
@@ -82,84 +585,81 @@ def predict():
         timeframe = request.args.get('timeframe', '1d', type=str)
         symbol = request.args.get('symbol', 'BTCUSDT', type=str)
         
-        # Coin correlation coefficients (how much they follow Bitcoin's trend)
-        coin_correlations = {
-            'BTCUSDT': 1.0,      # Bitcoin - baseline
-            'ETHUSDT': 1.15,     # Ethereum
-            'BNBUSDT': 1.10,     # Binance Coin
-            'SOLUSDT': 1.40,     # Solana
-            'ADAUSDT': 1.25,     # Cardano
-            'XRPUSDT': 1.30,     # Ripple
-            'DOTUSDT': 1.35,     # Polkadot  
-            'DOGEUSDT': 1.50,    # Dogecoin
-            'AVAXUSDT': 1.35,    # Avalanche
-            'POLUSDT': 1.30,     # Polygon (POL)
-        }
-        
-        correlation_mult = coin_correlations.get(symbol, 1.2)
+        correlation_mult = COIN_CORRELATIONS.get(symbol, 1.2)
+        multiplier = TIMEFRAME_MULTIPLIERS.get(timeframe, 1.0)
         
-        # Timeframe multipliers
-        timeframe_multipliers = {
-            '30m': 0.02,
-            '1h': 0.04,
-            '4h': 0.15,
-            '1d': 1.0,
-            '1w': 5.0,
-            '1M': 15.0
-        }
+        # Bitcoin forecast, computed once per input candle
+        forecast = get_base_forecast(model, scaler)
         
-        multiplier = timeframe_multipliers.get(timeframe, 1.0)
+        # The coin's own forecast when the multi-asset model covers it
+        try:
+            with metrics.span('predict.multi_asset'):
+                symbol_forecast = get_symbol_forecasts().get(symbol)
+        except Exception as e:
+            print(f"⚠️ Multi-asset forecast failed, using Bitcoin's trend: {e}")
+            symbol_forecast = None
         
-        # Get Bitcoin data for prediction
-        X, btc_price = get_latest_data()
+        # Bitcoin's own forecast at an intraday timeframe, when one is trained
+        try:
+            with metrics.span('predict.timeframe'):
+                timeframe_forecast = get_timeframe_forecast(timeframe)
+        except Exception as e:
+            print(f"⚠️ {timeframe} forecast failed, scaling the daily one: {e}")
+            timeframe_forecast = None
         
-        if X is None:
+        if forecast is None:
             return jsonify({
                 'error': 'Data not available',
                 'message': 'Could not load market data'
             }), 500
         
-        # Make prediction using Bitcoin model
-        scaled_prediction = model.predict(X, verbose=0)
+        btc_price = forecast['btc_price']
+        btc_percent_change = forecast['btc_percent_change']
         
-        # Inverse transform
-        dummy_pred = np.zeros((len(scaled_prediction), 2))
-        dummy_pred[:, 0] = scaled_prediction.flatten()
-        btc_predicted_price = scaler.inverse_transform(dummy_pred)[0][0]
+        # Get current price of requested coin from the price hub
+        with metrics.span('predict.price'):
+            current_coin_price = prices.get_price(symbol, timeout=PRICE_WAIT)
+        if current_coin_price is None:
+            current_coin_price = symbol_forecast['price'] if symbol_forecast else btc_price
         
-        # Calculate Bitcoin's percentage change
-        btc_percent_change = ((btc_predicted_price - btc_price) / btc_price) * 100
-        
-        # Get current price of requested coin
-        try:
-            coin_response = requests.get(f'https://api.binance.com/api/v3/ticker/price?symbol={symbol}')
-            current_coin_price = float(coin_response.json()['price'])
-        except:
-            current_coin_price = btc_price
+        # Identical inputs give an identical body, so repeat polls can get a 304
+        etag = hashlib.sha1(repr(
+            (forecast['key'], symbol_forecast, timeframe_forecast and timeframe_forecast['key'],
+             symbol, timeframe, current_coin_price)
+        ).encode()).hexdigest()
+        if etag in request.if_none_match:
+            count_cache('not_modified')
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = PREDICT_CACHE_CONTROL
+            return response
         
-        # Apply Bitcoin's trend to the selected coin
-        adjusted_percent_change = btc_percent_change * correlation_mult * multiplier
+        if timeframe_forecast is not None:
+            # Native bars: no timeframe multiplier, only the coin's correlation
+            adjusted_percent_change = timeframe_forecast['btc_percent_change'] * correlation_mult
+            model_name = f'LSTM ({timeframe} bars)'
+            features = ['BTC_Close', 'BTC_Volume']
+        elif symbol_forecast is not None:
+            adjusted_percent_change = symbol_forecast['percent_change'] * multiplier
+            correlation_mult = None
+            model_name = 'LSTM (multi-asset)'
+            features = [f"{symbol[:-len('USDT')]}_{f}" for f in multi_asset.FEATURES]
+        else:
+            # Apply Bitcoin's trend to the selected coin
+            adjusted_percent_change = btc_percent_change * correlation_mult * multiplier
+            model_name = 'LSTM (Bitcoin-based trend)'
+            features = ['BTC_Close', 'BTC_Volume']
         predicted_coin_price = current_coin_price * (1 + (adjusted_percent_change / 100))
         
         # Adjust confidence
-        base_confidence = 0.85
-        confidence_adjustments = {
-            '30m': 0.05,
-            '1h': 0.03,
-            '4h': 0.0,
-            '1d': 0.0,
-            '1w': -0.05,
-            '1M': -0.10
-        }
-        
-        coin_confidence_adj = -0.05 if symbol != 'BTCUSDT' else 0.0
+        coin_confidence_adj = -0.05 if symbol != 'BTCUSDT' and (symbol_forecast is None or timeframe_forecast is not None) else 0.0
         
-        confidence = base_confidence + confidence_adjustments.get(timeframe, 0.0) + coin_confidence_adj
+        confidence = BASE_CONFIDENCE + CONFIDENCE_ADJUSTMENTS.get(timeframe, 0.0) + coin_confidence_adj
         confidence = max(0.50, min(0.95, confidence))
         
         accuracy = 92.5 if symbol == 'BTCUSDT' else 88.0
         
-        return jsonify({
+        response = jsonify({
             'predicted_price': float(predicted_coin_price),
             'current_price': float(current_coin_price),
             'confidence': confidence,
@@ -168,9 +668,12 @@ def predict():
             'symbol': symbol,
             'correlation': correlation_mult,
             'timestamp': datetime.now().isoformat(),
-            'model': 'LSTM (Bitcoin-based trend)',
-            'features': ['BTC_Close', 'BTC_Volume']
+            'model': model_name,
+            'features': features
         })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = PREDICT_CACHE_CONTROL
+        return response
         
     except Exception as e:
         return jsonify({
@@ -178,63 +681,510 @@ def predict():
             'message': 'Error making prediction'
         }), 500
 
+@app.route('/api/forecast', methods=['GET'])
+def forecast():
+    """Bitcoin price forecast for each of the next `horizon` days"""
+    try:
+        model, scaler = get_model_and_scaler()
+        if model is None or scaler is None:
+            return jsonify({
+                'error': 'Model not loaded',
+                'message': 'Please train the model first'
+            }), 500
+        
+        horizon = request.args.get('horizon', 7, type=int)
+        if not 1 <= horizon <= MAX_HORIZON:
+            return jsonify({
+                'error': f'horizon must be between 1 and {MAX_HORIZON}'
+            }), 400
+        
+        as_of = request.args.get('as_of')
+        if as_of:
+            try:
+                np.datetime64(as_of, 'D')
+            except ValueError:
+                return jsonify({'error': 'as_of must be a date (YYYY-MM-DD)'}), 400
+            result = get_forecast_as_of(model, scaler, horizon, as_of)
+        else:
+            result = get_multi_day_forecast(model, scaler, horizon)
+        if result is None:
+            return jsonify({
+                'error': 'Data not available',
+                'message': 'Could not load market data'
+            }), 500
+        
+        btc_price = result['btc_price']
+        return jsonify({
+            'symbol': 'BTCUSDT',
+            'horizon': horizon,
+            'as_of': as_of or None,
+            'current_price': btc_price,
+            'forecast': [
+                {'date': d, 'price': p, 'percent_change': (p - btc_price) / btc_price * 100}
+                for d, p in zip(result['dates'], result['prices'])
+            ],
+            'timestamp': datetime.now().isoformat(),
+            'model': 'LSTM (autoregressive)',
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Error making forecast'
+        }), 500
+
+def event_stream(chunks):
+    """
+    Server-sent events response for the `chunks` generator, or 503 when
+    MAX_STREAMS streams are already open in this process
+    """
+    global _open_streams
+    with _streams_lock:
+        full = _open_streams >= MAX_STREAMS
+        if not full:
+            _open_streams += 1
+    if full:
+        chunks.close()
+        response = jsonify({'error': 'Too many open streams', 'max_streams': MAX_STREAMS})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    def release():
+        global _open_streams
+        with _streams_lock:
+            _open_streams -= 1
+
+    response = Response(chunks, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
+@app.route('/api/prices', methods=['GET'])
+def latest_prices():
+    """Latest price of every tracked coin"""
+    return jsonify({'prices': prices.snapshot(), 'timestamp': datetime.now().isoformat()})
+
+@app.route('/api/prices/stream', methods=['GET'])
+def price_stream():
+    """Server-sent events: each coin's latest price on connect, then every change"""
+    symbols = [s for s in request.args.get('symbols', '').upper().split(',') if s]
+    unknown = [s for s in symbols if s not in COIN_CORRELATIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown symbols: {', '.join(unknown)}"}), 400
+    
+    return event_stream(prices.stream(symbols or None, max_seconds=STREAM_MAX_SECONDS))
+
+def get_chart_series(symbol, timeframe, limit, start=None, end=None):
+    """
+    Candle columns for the chart: the last `limit` candles from Binance
+    (through the kline cache), or from the local daily / rollup store when
+    a time range or more than KLINE_LIMIT candles are asked for
+    """
+    if start is None and end is None and limit <= KLINE_LIMIT:
+        return chart_data.from_records(json.loads(klines.get(symbol, timeframe, limit))['data'])
+    
+    prefix = symbol[:-len('USDT')] if symbol.endswith('USDT') else symbol
+    if timeframe == '1d' and os.path.exists(multi_asset.data_path(prefix)):
+        store = market_data.get_store(multi_asset.data_path(prefix))
+    elif timeframe in rollups.TIMEFRAMES and rollups.available(prefix, timeframe):
+        store = rollups.get_store(prefix, timeframe)
+    else:
+        raise LookupError(f"No stored {timeframe} candles for {symbol}")
+    if start is None and end is None:
+        return chart_data.from_view(store.tail(limit), prefix)
+    return chart_data.between(chart_data.from_view(store.between(), prefix), start, end)
+
 @app.route('/api/historical', methods=['GET'])
 def historical():
-    """Get historical data from Binance API"""
+    """
+    Get historical candles, by default the latest `limit` from Binance.
+    `start`/`end` (epoch seconds) select a stored range, `since` only
+    returns candles from the client's last one on, `max_points` downsamples
+    and `format` picks records, columns or binary.
+    """
     try:
         symbol = request.args.get('symbol', 'BTCUSDT', type=str)
         timeframe = request.args.get('timeframe', '1d', type=str)
         limit = request.args.get('limit', 100, type=int)
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+        cursor = request.args.get('since', type=int)
+        max_points = request.args.get('max_points', type=int)
+        fmt = request.args.get('format', 'records', type=str)
+        series_type = request.args.get('series', 'candles', type=str)
         
-        # Binance API endpoint for klines
-        url = f'https://api.binance.com/api/v3/klines?symbol={symbol}&interval={timeframe}&limit={limit}'
-        response = requests.get(url)
-        data = response.json()
+        if fmt not in chart_data.FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(chart_data.FORMATS)}"}), 400
+        if series_type not in ('candles', 'line'):
+            return jsonify({'error': 'series must be candles or line'}), 400
+        if max_points is not None and not 3 <= max_points <= MAX_CHART_POINTS:
+            return jsonify({'error': f'max_points must be between 3 and {MAX_CHART_POINTS}'}), 400
         
         # Format for frontend (Lightweight Charts expects: time, open, high, low, close)
-        formatted_data = []
-        for candle in data:
-            formatted_data.append({
-                'time': int(candle[0] / 1000), # Convert ms to seconds
-                'open': float(candle[1]),
-                'high': float(candle[2]),
-                'low': float(candle[3]),
-                'close': float(candle[4]),
-            })
-            
+        if (start, end, cursor, max_points) == (None, None, None, None) and fmt == 'records' \
+                and series_type == 'candles' and limit <= KLINE_LIMIT:
+            with metrics.span('historical.fetch'):
+                body = klines.get(symbol, timeframe, limit)
+            return Response(body, mimetype='application/json')
+        
+        try:
+            with metrics.span('historical.fetch'):
+                series = get_chart_series(symbol, timeframe, limit, start, end)
+        except LookupError as e:
+            return jsonify({'error': str(e), 'message': 'Fetch the candles first (data_engine.py or rollups.py)'}), 404
+        # The next poll's `since`: the last candle, which may still be forming
+        next_cursor = int(series['time'][-1]) if len(series['time']) else cursor
+        series = chart_data.since(series, cursor)
+        total = len(series['time'])
+        if series_type == 'line':
+            series = chart_data.line(series, max_points)
+        else:
+            series = chart_data.downsample(series, max_points)
+        
+        with metrics.span('historical.encode'):
+            body, mimetype = chart_data.encode(series, fmt, cursor=next_cursor, source_count=total)
+        response = Response(body, mimetype=mimetype)
+        if next_cursor is not None:
+            response.headers['X-Cursor'] = str(next_cursor)
+        response.headers['X-Source-Count'] = str(total)
+        return response
+        
+    except Exception as e:
         return jsonify({
-            'data': formatted_data,
-            'count': len(formatted_data)
+            'error': str(e),
+            'message': 'Error fetching historical data'
+        }), 500
+
+@app.route('/api/indicators', methods=['GET'])
+def get_indicators():
+    """
+    Technical indicators for the last `limit` daily candles of `symbol`
+    (default BTCUSDT), plus the latest values and key drivers
+    """
+    try:
+        symbol = request.args.get('symbol', 'BTCUSDT', type=str).upper()
+        if symbol not in COIN_CORRELATIONS:
+            return jsonify({'error': f'Unknown symbol: {symbol}'}), 400
+        prefix = symbol[:-len('USDT')]
+        path = DATA_PATH if symbol == 'BTCUSDT' else multi_asset.data_path(prefix)
+        if not os.path.exists(path):
+            return jsonify({
+                'error': f'No stored daily candles for {symbol}',
+                'message': f'Run: python data_engine.py --symbols {prefix}-USD',
+            }), 404
+        limit = request.args.get('limit', 100, type=int)
+        if not 1 <= limit <= MAX_INDICATOR_ROWS:
+            return jsonify({'error': f'limit must be between 1 and {MAX_INDICATOR_ROWS}'}), 400
+        names = [n for n in request.args.get('names', '').split(',') if n] or indicators.NAMES
+        unknown = [n for n in names if n not in indicators.NAMES]
+        if unknown:
+            return jsonify({
+                'error': f"Unknown indicators: {', '.join(unknown)}",
+                'available': indicators.NAMES,
+            }), 400
+        
+        with metrics.span('indicators.refresh'):
+            engine = indicators.get_engine(path, prefix)
+            view = engine.tail(limit, names)
+        # NaN (indicator warm-up) is not valid JSON
+        def clean(values):
+            return [None if v != v else float(v) for v in values.tolist()]
+        
+        return jsonify({
+            'symbol': symbol,
+            'dates': [str(d) for d in view[market_data.DATE_COL]],
+            'indicators': {n: clean(view[n]) for n in names},
+            'latest': {n: (None if v != v else v) for n, v in engine.latest().items() if n in names},
+            'drivers': indicators.drivers(engine),
+            'timestamp': datetime.now().isoformat()
         })
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'message': 'Error fetching historical data'
+            'message': 'Error computing indicators'
         }), 500
 
+def backtest_params(source):
+    """
+    Backtest parameters from query args or a JSON body, with engine defaults;
+    ValueError (a 400) when one is out of range
+    """
+    params = {
+        'days': source.get('days', 30, type=int),
+        'initial_capital': source.get('capital', 10000, type=float),
+        'threshold': source.get('threshold', backtest_engine.ENTRY_THRESHOLD, type=float),
+        'hold_days': source.get('hold', backtest_engine.HOLD_DAYS, type=int),
+        'fee': source.get('fee', backtest_engine.FEE, type=float),
+        'slippage': source.get('slippage', backtest_engine.SLIPPAGE, type=float),
+        'timeframe': source.get('timeframe', '1d', type=str),
+    }
+    backtest_engine.check_params(params['days'], params['initial_capital'], params['hold_days'],
+                                 params['fee'], params['slippage'])
+    return params
+
+def submit_backtest(params):
+    """Queue a backtest, or join the job already running/finished for the same inputs"""
+    # Results depend on the data and model too, so they are part of the key
+    timeframe = params['timeframe']
+    if timeframe != '1d' and timeframe not in rollups.TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    model_path, scaler_path = backtest_engine.model_paths(timeframe)
+    if timeframe == '1d' or rollups.available('BTC', timeframe):
+        store = market_data.get_store(DATA_PATH) if timeframe == '1d' else rollups.get_store('BTC', timeframe)
+        data_key = (len(store), str(store.last_date()))
+    else:
+        data_key = None  # the job reports the missing candles
+    key = (
+        tuple(sorted(params.items())), data_key,
+        model_registry.get_version(model_path), model_registry.get_version(scaler_path),
+    )
+    print(f"Running {timeframe} backtest for {params['days']} bars with ${params['initial_capital']} capital...")
+    return backtest_jobs.submit(
+        key, params, lambda progress: backtest_engine.run_backtest(progress=progress, **params)
+    )
+
+@app.route('/api/backtest', methods=['POST'])
+def start_backtest():
+    """Start a backtest job; poll /api/backtest/jobs/<id> for progress and the result"""
+    try:
+        body = request.get_json(silent=True)
+        params = backtest_params(MultiDict(body) if isinstance(body, dict) else request.args)
+        job, created = submit_backtest(params)
+        response = jsonify({
+            **job.to_dict(include_result=False),
+            'deduplicated': not created,
+            'status_url': f'/api/backtest/jobs/{job.id}',
+            'events_url': f'/api/backtest/jobs/{job.id}/events',
+        })
+        response.status_code = 202
+        return response
+        
+    except job_queue.QueueFull as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Too many backtests queued, try again shortly'
+        }), 429
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Error starting backtest'
+        }), 500
+
+@app.route('/api/backtest/jobs/<job_id>', methods=['GET'])
+def backtest_job(job_id):
+    """Status, progress (percent of days simulated) and, once done, the result"""
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job', 'job_id': job_id}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/backtest/jobs/<job_id>/events', methods=['GET'])
+def backtest_job_events(job_id):
+    """Server-sent events with the job state on every change, ending when it finishes"""
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job', 'job_id': job_id}), 404
+    
+    def stream():
+        version = -1
+        while True:
+            version = job.wait_for_change(version, timeout=15)
+            finished = job.status in (job_queue.DONE, job_queue.FAILED)
+            yield f"data: {json.dumps(job.to_dict(include_result=finished))}\n\n"
+            if finished:
+                return
+    
+    return event_stream(stream())
+
 @app.route('/api/backtest', methods=['GET'])
 def backtest():
-    """Run real backtest on historical data"""
+    """Run real backtest on historical data (blocks until the shared job finishes)"""
+    try:
+        job, _ = submit_backtest(backtest_params(request.args))
+        job.done_event.wait()
+        
+        if job.status == job_queue.FAILED:
+            return jsonify({'error': job.error}), 500
+        
+        return jsonify(job.result)
+        
+    except job_queue.QueueFull as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Too many backtests queued, try again shortly'
+        }), 429
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Error running backtest'
+        }), 500
+
+@app.route('/api/backtest/sweep', methods=['GET'])
+def backtest_sweep():
+    """Rank a grid of strategy parameters against one set of model predictions"""
     try:
-        days = request.args.get('days', 30, type=int)
+        days = request.args.get('days', 365, type=int)
         initial_capital = request.args.get('capital', 10000, type=float)
+        parse = backtest_engine.parse_grid
         
-        print(f"Running backtest for {days} days with ${initial_capital} capital...")
-        result = backtest_engine.run_backtest(days=days, initial_capital=initial_capital)
+        result = backtest_engine.run_sweep(
+            days=days,
+            initial_capital=initial_capital,
+            thresholds=parse(request.args.get('thresholds', str(backtest_engine.ENTRY_THRESHOLD))),
+            hold_days=parse(request.args.get('holds', str(backtest_engine.HOLD_DAYS)), int),
+            fees=parse(request.args.get('fees', str(backtest_engine.FEE))),
+            slippages=parse(request.args.get('slippages', str(backtest_engine.SLIPPAGE))),
+            sort_by=request.args.get('sort_by', 'total_return', type=str),
+            top=request.args.get('top', 50, type=int),
+            timeframe=request.args.get('timeframe', '1d', type=str),
+        )
         
         if 'error' in result:
-            return jsonify(result), 500
+            return jsonify(result), 400
         
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'message': 'Error running backtest'
+            'message': 'Error running parameter sweep'
         }), 500
 
+@app.route('/api/backtest/risk', methods=['GET'])
+def backtest_risk():
+    """Bootstrap and trade Monte Carlo confidence intervals around a backtest"""
+    try:
+        params = backtest_params(request.args)
+        paths = request.args.get('paths', risk_engine.PATHS, type=int)
+        confidence = request.args.get('confidence', risk_engine.CONFIDENCE, type=float)
+        ruin = request.args.get('ruin', risk_engine.RUIN, type=float)
+        horizon = request.args.get('horizon', None, type=int)
+        block = request.args.get('block', risk_engine.BLOCK_DAYS, type=int)
+        if not 1 <= paths <= MAX_RISK_PATHS:
+            return jsonify({'error': f'paths must be between 1 and {MAX_RISK_PATHS}'}), 400
+        if horizon is not None and not 1 <= horizon <= MAX_RISK_HORIZON:
+            return jsonify({'error': f'horizon must be between 1 and {MAX_RISK_HORIZON}'}), 400
+        if block < 1:
+            return jsonify({'error': 'block must be at least 1'}), 400
+        if not 0 < confidence < 1 or not 0 < ruin <= 1:
+            return jsonify({'error': 'confidence must be in (0, 1) and ruin in (0, 1]'}), 400
+
+        # Shares the backtest job (and its cached result) with /api/backtest
+        job, _ = submit_backtest(params)
+        job.done_event.wait()
+        if job.status == job_queue.FAILED:
+            return jsonify({'error': job.error}), 500
+        if 'error' in job.result:
+            return jsonify(job.result), 400
+
+        with metrics.span('risk.simulate'):
+            report = risk_engine.analyze(
+                job.result,
+                paths=paths,
+                horizon=horizon,
+                block=block,
+                confidence=confidence,
+                ruin=ruin,
+                methods=request.args.getlist('method') or risk_engine.METHODS,
+                seed=request.args.get('seed', 0, type=int),
+            )
+        return jsonify({**report, 'days': params['days'], 'timeframe': params['timeframe']})
+
+    except job_queue.QueueFull as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Too many backtests queued, try again shortly'
+        }), 429
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Error computing backtest risk'
+        }), 500
+
+def benchmark_startup(port=5055, repeats=3):
+    """
+    Import time of this module, and for a --fast-start server: time until
+    /api/health answers, until /api/ready is 200, and the first forecast latency
+    """
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    here = os.path.dirname(os.path.abspath(__file__))
+    import_times = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, '-c', 'import time; t = time.perf_counter(); import api_server; '
+                                   'print(time.perf_counter() - t)'],
+            capture_output=True, text=True, check=True, env=env, cwd=here,
+        )
+        import_times.append(float(out.stdout.strip().splitlines()[-1]))
+    
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(here, 'api_server.py'), '--fast-start', '--port', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+    )
+    result = {'import_s': min(import_times)}
+    try:
+        while 'health_s' not in result:
+            try:
+                requests.get(f'{base}/api/health', timeout=1)
+                result['health_s'] = time.perf_counter() - start
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        while requests.get(f'{base}/api/ready', timeout=5).status_code != 200:
+            if server.poll() is not None:
+                raise RuntimeError('Server exited during warm-up')
+            time.sleep(0.01)
+        result['ready_s'] = time.perf_counter() - start
+        
+        first = time.perf_counter()
+        requests.get(f'{base}/api/forecast?horizon=1', timeout=30).raise_for_status()
+        result['first_forecast_ms'] = (time.perf_counter() - first) * 1000
+        result['first_prediction_s'] = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
 if __name__ == '__main__':
-    print("🚀 Starting Crypto AI Trading API...")
-    load_ml_model()
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    parser = argparse.ArgumentParser(description="Crypto AI Trading API")
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--fast-start', action='store_true', default=os.environ.get('FAST_START') == '1',
+                        help='Serve immediately and load the model in the background (or FAST_START=1)')
+    parser.add_argument('--bench-startup', action='store_true',
+                        help='Measure import time and time to first prediction')
+    parser.add_argument('--max-import-seconds', type=float,
+                        help='With --bench-startup, exit non-zero if importing takes longer')
+    args = parser.parse_args()
+    
+    if args.bench_startup:
+        result = benchmark_startup()
+        print(f"Import api_server:     {result['import_s']:.2f}s")
+        print(f"Health answering:      {result['health_s']:.2f}s")
+        print(f"Ready (model warm):    {result['ready_s']:.2f}s")
+        print(f"First forecast:        {result['first_forecast_ms']:.1f}ms")
+        print(f"Time to first predict: {result['first_prediction_s']:.2f}s")
+        if args.max_import_seconds is not None and result['import_s'] > args.max_import_seconds:
+            print(f"❌ Import took longer than {args.max_import_seconds:.2f}s")
+            sys.exit(1)
+    elif args.fast_start:
+        from werkzeug.serving import make_server
+        print("🚀 Starting Crypto AI Trading API (fast start)...")
+        # Bind the socket first so health checks answer while the model loads
+        server = make_server('0.0.0.0', args.port, app, threaded=True)
+        threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+        server.serve_forever()
+    else:
+        print("🚀 Starting Crypto AI Trading API...")
+        warm_up()
+        app.run(debug=True, port=args.port, host='0.0.0.0')
@@ -7,6 +7,11 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 import os
+import time
+import dashboard_data
+import forecaster
+
+RENDER_START = time.perf_counter()
 
 # -----------------------------------------------------------------------------
 # 1. SETUP
@@ -39,14 +44,14 @@ def build_model_structure():
 # -----------------------------------------------------------------------------
 # 3. LOAD RESOURCES
 # -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "MARKET_MASTER.csv")
+
 @st.cache_resource
 def load_resources():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    
     # CRITICAL: Look for .h5 file
-    model_path = os.path.join(base_dir, "models", "market_model.h5")
-    scaler_path = os.path.join(base_dir, "models", "market_scaler.pkl")
-    data_path = os.path.join(base_dir, "data", "MARKET_MASTER.csv")
+    model_path = os.path.join(BASE_DIR, "models", "market_model.h5")
+    scaler_path = os.path.join(BASE_DIR, "models", "market_scaler.pkl")
 
     print(f"🔍 LOOKING FOR: {model_path}")
 
@@ -61,61 +66,38 @@ def load_resources():
         model.load_weights(model_path)
         
         scaler = pickle.load(open(scaler_path, "rb"))
-        df = pd.read_csv(data_path)
-        return model, scaler, df
+        return model, scaler
     except Exception as e:
         st.error(f"Error loading brain: {e}")
         st.stop()
 
-model, scaler, df = load_resources()
+model, scaler = load_resources()
 
 # -----------------------------------------------------------------------------
-# 4. PREDICTION ENGINE
+# 4. PREDICTION ENGINE + DATA
 # -----------------------------------------------------------------------------
-def predict_next_7_days(model, scaler, df):
-    feature_cols = ['BTC_Close', 'BTC_Vol', 'ETH_Close', 'ETH_Vol']
-    last_60_days = df[feature_cols].values[-60:]
-    
-    scaled_input = scaler.transform(last_60_days)
-    current_batch = scaled_input.reshape(1, 60, 4) 
-    
-    future_prices = []
-    
-    for i in range(7): 
-        next_pred = model.predict(current_batch, verbose=0)
-        
-        dummy_row = np.zeros((1, 4))
-        dummy_row[0, 0] = next_pred 
-        price = float(scaler.inverse_transform(dummy_row)[0][0])
-        future_prices.append(price)
-        
-        new_row = current_batch[0, -1, :].copy() 
-        new_row[0] = next_pred 
-        new_row = new_row.reshape(1, 1, 4)
-        current_batch = np.append(current_batch[:, 1:, :], new_row, axis=1)
-
-    last_time = pd.to_datetime(df.iloc[-1]['Date'])
-    future_times = [(last_time + pd.Timedelta(days=i+1)).timestamp() for i in range(7)]
-    
-    return future_times, future_prices
+@st.cache_resource
+def load_dashboard(_model, _scaler):
+    # One data layer for every session: the CSV is tailed as it grows, the
+    # 7-day forecast reruns only on a new candle, and chart candles are
+    # serialized once and extended incrementally
+    return dashboard_data.Dashboard(forecaster.Forecaster(_model, _scaler), DATA_PATH)
 
-future_times, future_prices = predict_next_7_days(model, scaler, df)
+view = load_dashboard(model, scaler).render_data()
 
 # -----------------------------------------------------------------------------
 # 5. VISUALIZE
 # -----------------------------------------------------------------------------
-df['timestamp'] = pd.to_datetime(df['Date']).apply(lambda x: x.timestamp())
-candle_df = df[['timestamp', 'BTC_Open', 'BTC_High', 'BTC_Low', 'BTC_Close']].copy()
-candle_df.columns = ['time', 'open', 'high', 'low', 'close']
-candle_data = candle_df.astype(float).to_dict('records')
+# Whole history, merged into at most ~2 x CHART_POINTS candles (OHLC kept per bucket)
+candle_data = view['candles']
 
 series_pred = {
     "type": 'Line',
-    "data": [{"time": float(t), "value": float(p)} for t,p in zip(future_times, future_prices)],
+    "data": view['forecast'],
     "options": { "color": '#2962ff', "lineWidth": 2, "lineStyle": 2, "title": "AI Forecast" }
 }
 
-curr_price = df.iloc[-1]['BTC_Close']
+curr_price = view['price']
 
 st.markdown(f"""
 <div class="tv-header">
@@ -136,4 +118,14 @@ renderLightweightCharts([
             series_pred
         ]
     }
-], key="unified_chart")
\ No newline at end of file
+], key="unified_chart")
+
+# -----------------------------------------------------------------------------
+# 6. RENDER TIMINGS
+# -----------------------------------------------------------------------------
+total_ms = (time.perf_counter() - RENDER_START) * 1000
+timings = dict(view['timings'])
+timings['page + chart'] = total_ms - sum(view['timings'].values())
+timings['total rerun'] = total_ms
+with st.expander(f"⏱️ Rendered in {total_ms:.1f} ms (chart {view['chart']}, data through {view['last_date']})"):
+    st.table(pd.DataFrame({"Stage": list(timings), "ms": [round(v, 2) for v in timings.values()]}))
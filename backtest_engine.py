@@ -2,155 +2,427 @@
 Real Backtesting Engine
 Uses actual historical data and model predictions to calculate real performance
 """
-import pandas as pd
-import numpy as np
-from tensorflow.keras.models import load_model
-import joblib
+import argparse
 import os
+import threading
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import market_data
+import metrics
+import model_registry
+import rollups
+import training
 
 
 MODEL_PATH = 'models/market_model.h5'
 SCALER_PATH = 'models/market_scaler.pkl'
 DATA_PATH = 'data/BTC_USD.csv'
+FEATURE_COLS = ['BTC_Close', 'BTC_Volume']
+SEQUENCE_LENGTH = 60
+PREDICT_BATCH_SIZE = 256
+PROGRESS_STEPS = 20
+
+# Strategy defaults
+ENTRY_THRESHOLD = 0.005  # enter when the predicted return beats 0.5%
+HOLD_DAYS = 1
+FEE = 0.0  # fraction of notional per side
+SLIPPAGE = 0.0  # fraction of price, against us on entry and exit
+
+# Largest accepted request: bars, hold, costs (fraction per side/fill) and sweep size
+MAX_DAYS = 20000
+MAX_FEE = 0.1
+MAX_SLIPPAGE = 0.1
+MAX_GRID_VALUES = 10000  # values in one parameter grid
+MAX_SWEEP_COMBINATIONS = 1_000_000
+
+# Sweep combinations are simulated in chunks to cap memory
+SWEEP_CHUNK = 65536
+SWEEP_METRICS = ['total_return', 'win_rate', 'max_drawdown', 'profit_factor', 'total_trades']
+
+_prediction_caches = {}  # timeframe -> {'key', 'days', 'predictions'}
+_prediction_lock = threading.Lock()
+
+
+def model_paths(timeframe='1d'):
+    """(model, scaler) files used to backtest `timeframe` bars"""
+    return (MODEL_PATH, SCALER_PATH) if timeframe == '1d' else training.model_paths(timeframe)
+
+
+def load_backtest_components(timeframe='1d'):
+    """
+    Load model, scaler, and the shared market data store for `timeframe`;
+    intraday timeframes use their own model and the rollup store
+    """
+    model_path, scaler_path = model_paths(timeframe)
+    if timeframe == '1d':
+        store = market_data.get_store(DATA_PATH)
+    else:
+        if not rollups.available('BTC', timeframe):
+            raise FileNotFoundError(f"No {timeframe} candles; run: python rollups.py update --base 1m")
+        store = rollups.get_store('BTC', timeframe)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"No {timeframe} model; run: python training.py train --timeframe {timeframe}")
+    model = model_registry.get_model(model_path)
+    scaler = model_registry.get_scaler(scaler_path)
+    return model, scaler, store
+
+
+def predict_prices(model, scaler, features, sequence_length=SEQUENCE_LENGTH,
+                   batch_size=PREDICT_BATCH_SIZE, progress=None):
+    """
+    Predict the next close for every rolling window of `features` in one pass
+
+    The series is scaled once and the windows are strided views over it, so
+    no per-day copies or scaler calls are made before the single batched
+    `model.predict`.
+
+    Args:
+        model: Keras model taking (batch, sequence_length, n_features)
+        scaler: Fitted scaler used at training time
+        features: Array of shape (n_rows, n_features), oldest row first
+        sequence_length: Rows per input window
+        batch_size: Batch size passed to `model.predict`
+        progress: Optional callback taking the fraction of windows predicted;
+            when given, prediction runs in up to PROGRESS_STEPS chunks
+
+    Returns:
+        Array of n_rows - sequence_length + 1 predicted prices, where entry k
+        is the prediction made from rows k .. k + sequence_length - 1
+    """
+    scaled = scaler.transform(features)
+    # (n_windows, n_features, sequence_length) -> (n_windows, sequence_length, n_features)
+    windows = sliding_window_view(scaled, sequence_length, axis=0).transpose(0, 2, 1)
+
+    if progress is None:
+        scaled_pred = model.predict(windows, batch_size=batch_size, verbose=0)
+    else:
+        n = len(windows)
+        chunk = max(batch_size, -(-n // PROGRESS_STEPS))
+        parts = []
+        for start in range(0, n, chunk):
+            parts.append(model.predict(windows[start:start + chunk], batch_size=batch_size, verbose=0))
+            progress(min(start + chunk, n) / n)
+        scaled_pred = np.concatenate(parts) if parts else np.zeros((0, 1))
+
+    # Inverse transform all predictions at once
+    dummy_pred = np.zeros((len(scaled_pred), scaled.shape[1]))
+    dummy_pred[:, 0] = scaled_pred.flatten()
+    return scaler.inverse_transform(dummy_pred)[:, 0]
+
+
+def cached_predictions(model, scaler, store, days, batch_size=PREDICT_BATCH_SIZE, progress=None,
+                       timeframe='1d'):
+    """
+    Predictions for the trading days of a `days`-long backtest
+
+    The array covers the last `days` rows except the final one (the last day
+    is never traded); entry t is predicted from the 60 rows before that day.
+    Results are cached per timeframe and data/model version and reused for
+    any backtest of up to the largest `days` computed so far.
+    """
+    model_path, scaler_path = model_paths(timeframe)
+    key = (len(store), str(store.last_date()),
+           model_registry.get_version(model_path), model_registry.get_version(scaler_path))
+    n_pred = days - 1
+
+    with _prediction_lock:
+        cache = _prediction_caches.setdefault(timeframe, {'key': None, 'days': 0, 'predictions': None})
+        if cache['key'] != key or cache['days'] < days:
+            window = store.tail(days + SEQUENCE_LENGTH)
+            features = market_data.stack(window, FEATURE_COLS)[:-2]
+            with metrics.span('backtest.predict'):
+                cache['predictions'] = predict_prices(model, scaler, features, SEQUENCE_LENGTH,
+                                                      batch_size, progress)
+            cache['key'] = key
+            cache['days'] = days
+        predictions = cache['predictions']
+    return predictions[len(predictions) - n_pred:]
+
+
+# -----------------------------------------------------------------------------
+# Simulation core
+#
+# Trading days are t = 0 .. T-1 with prices closes[0 .. T] (closes[T] is the
+# final, untraded day) and one prediction per trading day. A long position is
+# entered at closes[e] when the predicted return beats the threshold and no
+# position is open. After `hold_days` days the exit is booked at the next
+# close, closes[e + hold_days + 1]; a position still open after the last
+# trading day is closed at closes[T]. With hold_days=1 this is the engine's
+# original one-day-hold rule.
+# -----------------------------------------------------------------------------
+def _next_signal_index(signal):
+    """next_sig[k] = first t >= k with signal[..., t] set, or T; shape (..., T + 1)"""
+    T = signal.shape[-1]
+    idx = np.where(signal, np.arange(T), T)
+    idx = np.concatenate([idx, np.full(signal.shape[:-1] + (1,), T)], axis=-1)
+    return np.minimum.accumulate(idx[..., ::-1], axis=-1)[..., ::-1]
 
 
-def load_backtest_components():
-    """Load model, scaler, and data"""
-    model = load_model(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    df = pd.read_csv(DATA_PATH)
-    df = df.sort_values('Date').reset_index(drop=True)
-    return model, scaler, df
+def check_params(days, initial_capital=10000, hold_days=HOLD_DAYS, fee=FEE, slippage=SLIPPAGE):
+    """
+    Raise ValueError for parameters outside their sane ranges. hold_days,
+    fee and slippage may also be sweep grids (sequences of values).
+    """
+    if not 2 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 2 and {MAX_DAYS}")
+    if not initial_capital > 0:
+        raise ValueError("capital must be positive")
+    # A hold below one day would re-enter on the same day forever
+    if not np.all((np.asarray(hold_days) >= 1) & (np.asarray(hold_days) <= MAX_DAYS)):
+        raise ValueError(f"hold must be between 1 and {MAX_DAYS} days")
+    if not np.all((np.asarray(fee) >= 0) & (np.asarray(fee) <= MAX_FEE)):
+        raise ValueError(f"fee must be between 0 and {MAX_FEE}")
+    if not np.all((np.asarray(slippage) >= 0) & (np.asarray(slippage) <= MAX_SLIPPAGE)):
+        raise ValueError(f"slippage must be between 0 and {MAX_SLIPPAGE}")
+
+
+def _trade_return(entry_price, exit_price, fee, slippage):
+    """Net return of a long trade after slippage on both fills and a fee per side"""
+    entry_fill = entry_price * (1 + slippage)
+    exit_fill = exit_price * (1 - slippage)
+    gross = (exit_fill - entry_fill) / entry_fill
+    return (1 + gross) * (1 - fee) ** 2 - 1
 
 
-def run_backtest(days=30, initial_capital=10000):
+def simulate(closes, predictions, initial_capital=10000, threshold=ENTRY_THRESHOLD,
+             hold_days=HOLD_DAYS, fee=FEE, slippage=SLIPPAGE):
+    """
+    Simulate one parameter set and return its equity curve, trades and metrics
+
+    Args:
+        closes: T + 1 closing prices
+        predictions: T predicted prices, one per trading day
+
+    Returns:
+        dict with equity (T,), trades (entry/exit index, price, return, pnl
+        arrays for positions closed inside the window), final_capital and the
+        metrics from _metrics
+    """
+    if hold_days < 1:
+        raise ValueError("hold_days must be at least 1")
+    closes = np.asarray(closes, dtype=np.float64)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    T = len(predictions)
+
+    predicted_return = (predictions - closes[:T]) / closes[:T]
+    next_sig = _next_signal_index(predicted_return > threshold)
+
+    # Walk entry to entry: each trade blocks the following hold_days days
+    entries = []
+    k = next_sig[0]
+    while k < T:
+        entries.append(k)
+        k = next_sig[min(k + hold_days + 1, T)]
+    entries = np.asarray(entries, dtype=np.int64)
+
+    exit_days = entries + hold_days
+    closed = exit_days < T
+    exit_prices = np.where(closed, closes[np.minimum(exit_days + 1, T)], closes[T])
+    returns = _trade_return(closes[entries], exit_prices, fee, slippage)
+
+    growth = np.cumprod(1 + returns)
+    capital_before = initial_capital * np.concatenate([[1.0], growth[:-1]])
+    pnl = capital_before * returns
+    final_capital = initial_capital * growth[-1] if len(growth) else float(initial_capital)
+
+    # Equity steps up on each in-window exit day
+    capital_after = np.concatenate([[initial_capital], initial_capital * growth[closed]])
+    equity = capital_after[np.searchsorted(exit_days[closed], np.arange(T), side='right')]
+
+    metrics = _metrics(
+        initial_capital, final_capital,
+        wins=np.sum(returns > 0), losses=np.sum(returns <= 0),
+        max_drawdown=_max_drawdown(equity),
+        gross_wins=np.sum(pnl[closed & (pnl > 0)]),
+        gross_losses=-np.sum(pnl[closed & (pnl < 0)]),
+        closed_trades=np.sum(closed),
+    )
+    return {
+        'equity': equity,
+        'trades': {
+            'entry_index': entries[closed],
+            'exit_index': exit_days[closed],
+            'entry': closes[entries[closed]],
+            'exit': exit_prices[closed],
+            'return': returns[closed],
+            'pnl': pnl[closed],
+        },
+        'final_capital': float(final_capital),
+        **metrics,
+    }
+
+
+def _max_drawdown(equity):
+    """Largest peak-to-trough decline in percent, along the last axis"""
+    if equity.shape[-1] == 0:
+        return np.zeros(equity.shape[:-1])
+    peak = np.maximum.accumulate(equity, axis=-1)
+    return np.max((peak - equity) / peak, axis=-1) * 100
+
+
+def _metrics(initial_capital, final_capital, wins, losses, max_drawdown,
+             gross_wins, gross_losses, closed_trades):
+    """Metrics shared by single runs and sweeps (scalars or arrays)"""
+    total = wins + losses
+    # Profit factor keeps the engine's conventions: 0 with no closed trades
+    # or no losing trades
+    gross_losses = np.where(closed_trades > 0, gross_losses, 1)
+    return {
+        'total_return': (final_capital - initial_capital) / initial_capital * 100,
+        'win_rate': np.where(total > 0, wins / np.maximum(total, 1) * 100, 0),
+        'max_drawdown': max_drawdown,
+        'profit_factor': np.where(gross_losses > 0, gross_wins / np.where(gross_losses > 0, gross_losses, 1), 0),
+        'total_trades': total,
+        'wins': wins,
+        'losses': losses,
+    }
+
+
+def simulate_grid(closes, predictions, thresholds, hold_days, fees, slippages, initial_capital=10000):
+    """
+    Simulate many parameter sets at once
+
+    All arguments after `predictions` are equal-length arrays, one entry per
+    combination. State is kept per combination and advanced one trade at a
+    time, so memory is O(combinations) and the Python loop runs once per trade
+    of the most active combination rather than once per day.
+
+    Returns:
+        dict of metric arrays, one value per combination
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    T = len(predictions)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    hold_days = np.asarray(hold_days, dtype=np.int64)
+    fees = np.asarray(fees, dtype=np.float64)
+    slippages = np.asarray(slippages, dtype=np.float64)
+    n = len(thresholds)
+    if np.any(hold_days < 1):
+        raise ValueError("hold_days must be at least 1")
+
+    # One next-signal row per distinct threshold
+    predicted_return = (predictions - closes[:T]) / closes[:T]
+    unique_thresholds, threshold_row = np.unique(thresholds, return_inverse=True)
+    next_sig = _next_signal_index(predicted_return[None, :] > unique_thresholds[:, None])
+
+    capital = np.full(n, float(initial_capital))
+    peak = capital.copy()
+    max_dd = np.zeros(n)
+    wins = np.zeros(n, dtype=np.int64)
+    losses = np.zeros(n, dtype=np.int64)
+    closed_trades = np.zeros(n, dtype=np.int64)
+    gross_wins = np.zeros(n)
+    gross_losses = np.zeros(n)
+
+    entry = next_sig[threshold_row, 0]
+    active = entry < T
+    while active.any():
+        rows = np.flatnonzero(active)
+        e = entry[rows]
+        exit_day = e + hold_days[rows]
+        closed = exit_day < T
+        exit_price = np.where(closed, closes[np.minimum(exit_day + 1, T)], closes[T])
+        returns = _trade_return(closes[e], exit_price, fees[rows], slippages[rows])
+
+        pnl = capital[rows] * returns
+        capital[rows] += pnl
+        wins[rows] += returns > 0
+        losses[rows] += returns <= 0
+
+        # Only in-window exits show up on the equity curve / profit factor
+        c = rows[closed]
+        closed_trades[c] += 1
+        gross_wins[c] += np.where(pnl[closed] > 0, pnl[closed], 0)
+        gross_losses[c] -= np.where(pnl[closed] < 0, pnl[closed], 0)
+        peak[c] = np.maximum(peak[c], capital[c])
+        max_dd[c] = np.maximum(max_dd[c], (peak[c] - capital[c]) / peak[c] * 100)
+
+        entry[rows] = np.where(closed, next_sig[threshold_row[rows], np.minimum(exit_day + 1, T)], T)
+        active = entry < T
+
+    return _metrics(initial_capital, capital, wins, losses, max_dd,
+                    gross_wins, gross_losses, closed_trades)
+
+
+def run_backtest(days=30, initial_capital=10000, batch_size=PREDICT_BATCH_SIZE,
+                 threshold=ENTRY_THRESHOLD, hold_days=HOLD_DAYS, fee=FEE, slippage=SLIPPAGE,
+                 progress=None, timeframe='1d'):
     """
     Run real backtest using historical data and model predictions
-    
+
     Args:
-        days: Number of days to backtest
+        days: Number of bars to backtest (days for the default 1d timeframe)
         initial_capital: Starting capital in USD
-    
+        batch_size: Batch size for the prediction stage
+        threshold: Minimum predicted return to enter a long
+        hold_days: Days a position is held before the exit is booked
+        fee: Fee per side as a fraction of notional
+        slippage: Adverse price slippage per fill as a fraction of price
+        progress: Optional callback taking the fraction of days simulated
+        timeframe: Bar size; anything but 1d runs on the rollup store
+
     Returns:
-        dict with equity_curve, metrics
+        dict with equity_curve, trades closed inside the window (return in
+        percent), metrics
+
+    Raises:
+        ValueError: for parameters outside check_params' ranges
     """
+    check_params(days, initial_capital, hold_days, fee, slippage)
     try:
-        model, scaler, df = load_backtest_components()
-        
+        model, scaler, store = load_backtest_components(timeframe)
+
         # Get the last N days of data
-        sequence_length = 60
-        total_needed = days + sequence_length
-        
-        if len(df) < total_needed:
+        total_needed = days + SEQUENCE_LENGTH
+
+        if len(store) < total_needed:
             return {'error': 'Not enough historical data'}
-        
-        # Start from the point where we have enough history
-        backtest_df = df.tail(total_needed).reset_index(drop=True)
-        
-        results = []
-        capital = initial_capital
-        position = 0  # 0 = no position, 1 = long
-        wins = 0
-        losses = 0
-        trades = []
-        
-        # Run backtest day by day
-        for i in range(sequence_length, len(backtest_df) - 1):
-            # Get sequence for prediction
-            sequence = backtest_df[['BTC_Close', 'BTC_Volume']].iloc[i-sequence_length:i].values
-            scaled_sequence = scaler.transform(sequence)
-            X = scaled_sequence.reshape(1, sequence_length, 2)
-            
-            # Make prediction
-            scaled_pred = model.predict(X, verbose=0)
-            dummy_pred = np.zeros((1, 2))
-            dummy_pred[:, 0] = scaled_pred.flatten()
-            predicted_price = scaler.inverse_transform(dummy_pred)[0][0]
-            
-            current_price = backtest_df['BTC_Close'].iloc[i]
-            next_day_actual = backtest_df['BTC_Close'].iloc[i + 1]
-            
-            # Trading logic: Buy if predicted price > current price
-            predicted_return = (predicted_price - current_price) / current_price
-            
-            # Enter long if prediction is bullish and we're not in a position
-            if predicted_return > 0.005 and position == 0:  # 0.5% threshold
-                position = 1
-                entry_price = current_price
-                entry_date = backtest_df['Date'].iloc[i]
-            
-            # Exit if we're in a position
-            elif position == 1:
-                actual_return = (next_day_actual - entry_price) / entry_price
-                trade_pnl = capital * actual_return
-                capital += trade_pnl
-                
-                if actual_return > 0:
-                    wins += 1
-                else:
-                    losses += 1
-                
-                trades.append({
-                    'entry': entry_price,
-                    'exit': next_day_actual,
-                    'return': actual_return,
-                    'pnl': trade_pnl
-                })
-                
-                position = 0
-            
-            # Record equity
-            current_equity = capital
-            results.append({
-                'date': backtest_df['Date'].iloc[i],
-                'equity': current_equity,
-                'price': current_price
-            })
-        
-        # Close any open position at the end
-        if position == 1:
-            final_price = backtest_df['BTC_Close'].iloc[-1]
-            actual_return = (final_price - entry_price) / entry_price
-            trade_pnl = capital * actual_return
-            capital += trade_pnl
-            
-            if actual_return > 0:
-                wins += 1
-            else:
-                losses += 1
-        
-        # Calculate metrics
-        total_return = ((capital - initial_capital) / initial_capital) * 100
-        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
-        
-        # Calculate max drawdown
-        equity_curve = [r['equity'] for r in results]
-        peak = equity_curve[0]
-        max_dd = 0
-        for equity in equity_curve:
-            if equity > peak:
-                peak = equity
-            dd = ((peak - equity) / peak) * 100
-            if dd > max_dd:
-                max_dd = dd
-        
-        # Calculate profit factor
-        gross_wins = sum([t['pnl'] for t in trades if t['pnl'] > 0]) if trades else 0
-        gross_losses = abs(sum([t['pnl'] for t in trades if t['pnl'] < 0])) if trades else 1
-        profit_factor = gross_wins / gross_losses if gross_losses > 0 else 0
-        
+
+        # Trading days are the last `days` rows, minus the final one
+        window = store.tail(days)
+        dates = window['Date']
+        closes = window['BTC_Close']
+        # Predicting is nearly all of the work, so it drives the progress
+        predictions = cached_predictions(
+            model, scaler, store, days, batch_size,
+            None if progress is None else (lambda f: progress(0.99 * f)),
+            timeframe,
+        )
+
+        with metrics.span('backtest.simulate'):
+            sim = simulate(closes, predictions, initial_capital, threshold, hold_days, fee, slippage)
+
+        results = [
+            {'date': str(date), 'equity': equity, 'price': price}
+            for date, equity, price in zip(dates[:-1], sim['equity'].tolist(), closes[:-1].tolist())
+        ]
+        trades = sim['trades']
+        trade_list = [
+            {'entry_date': str(dates[e]), 'exit_date': str(dates[x + 1]), 'entry': entry, 'exit': exit_,
+             'return': ret * 100, 'pnl': pnl}
+            for e, x, entry, exit_, ret, pnl in zip(
+                trades['entry_index'].tolist(), trades['exit_index'].tolist(), trades['entry'].tolist(),
+                trades['exit'].tolist(), trades['return'].tolist(), trades['pnl'].tolist())
+        ]
+        if progress is not None:
+            progress(1.0)
+
         return {
             'equity_curve': results,
-            'final_capital': capital,
-            'total_return': total_return,
-            'win_rate': win_rate,
-            'max_drawdown': max_dd,
-            'profit_factor': profit_factor,
-            'total_trades': wins + losses,
-            'wins': wins,
-            'losses': losses
+            'trades': trade_list,
+            'final_capital': sim['final_capital'],
+            'total_return': float(sim['total_return']),
+            'win_rate': float(sim['win_rate']),
+            'max_drawdown': float(sim['max_drawdown']),
+            'profit_factor': float(sim['profit_factor']),
+            'total_trades': int(sim['total_trades']),
+            'wins': int(sim['wins']),
+            'losses': int(sim['losses'])
         }
-        
+
     except Exception as e:
         print(f"Backtest error: {e}")
         import traceback
@@ -158,14 +430,159 @@ def run_backtest(days=30, initial_capital=10000):
         return {'error': str(e)}
 
 
+def parse_grid(spec, cast=float):
+    """
+    Parse a parameter grid: comma-separated values ("1,2,5") or an inclusive
+    linear range "start:stop:num" ("0:0.02:41"), at most MAX_GRID_VALUES values
+    """
+    values = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if ':' in part:
+            start, stop, num = part.split(':')
+            num = int(num)
+            # Checked before linspace allocates anything
+            if not 1 <= num <= MAX_GRID_VALUES - len(values):
+                raise ValueError(f"A parameter grid has at most {MAX_GRID_VALUES} values")
+            values.extend(cast(v) for v in np.linspace(float(start), float(stop), num))
+        else:
+            values.append(cast(float(part)))
+        if len(values) > MAX_GRID_VALUES:
+            raise ValueError(f"A parameter grid has at most {MAX_GRID_VALUES} values")
+    return values
+
+
+def run_sweep(days=365, initial_capital=10000, thresholds=(ENTRY_THRESHOLD,), hold_days=(HOLD_DAYS,),
+              fees=(FEE,), slippages=(SLIPPAGE,), sort_by='total_return', top=50,
+              batch_size=PREDICT_BATCH_SIZE, timeframe='1d'):
+    """
+    Evaluate every combination of the parameter grids against one cached
+    prediction array and return the combinations ranked by `sort_by`
+
+    Combinations are generated and simulated SWEEP_CHUNK at a time, keeping
+    only the best `top` so far, so memory doesn't grow with the grid.
+
+    Returns:
+        dict with combinations, elapsed seconds and the ranked results table
+
+    Raises:
+        ValueError: for parameters outside check_params' ranges or more than
+            MAX_SWEEP_COMBINATIONS combinations
+    """
+    grids = [np.asarray(g, dtype=np.float64) for g in (thresholds, hold_days, fees, slippages)]
+    shape = tuple(len(g) for g in grids)
+    combinations = int(np.prod(shape, dtype=object))
+    if combinations > MAX_SWEEP_COMBINATIONS:
+        raise ValueError(f"{combinations} combinations; a sweep runs at most {MAX_SWEEP_COMBINATIONS}")
+    if top < 1:
+        raise ValueError("top must be at least 1")
+    check_params(days, initial_capital, grids[1], grids[2], grids[3])
+    try:
+        if sort_by not in SWEEP_METRICS:
+            return {'error': f"sort_by must be one of {SWEEP_METRICS}"}
+        if combinations == 0:
+            return {'error': 'Empty parameter grid'}
+
+        model, scaler, store = load_backtest_components(timeframe)
+        if len(store) < days + SEQUENCE_LENGTH:
+            return {'error': 'Not enough historical data'}
+
+        closes = store.tail(days)['BTC_Close']
+        predictions = cached_predictions(model, scaler, store, days, batch_size, timeframe=timeframe)
+
+        start = time.perf_counter()
+        # Best `top` so far as combination indices plus their metrics; earlier
+        # combinations come first so ties rank as in one stable sort
+        best = {'index': np.empty(0, dtype=np.int64), **{name: np.empty(0) for name in SWEEP_METRICS}}
+        for lo in range(0, combinations, SWEEP_CHUNK):
+            index = np.arange(lo, min(lo + SWEEP_CHUNK, combinations))
+            params = [g[i] for g, i in zip(grids, np.unravel_index(index, shape))]
+            with metrics.span('sweep.simulate'):
+                results = simulate_grid(closes, predictions, params[0], params[1].astype(np.int64),
+                                        params[2], params[3], initial_capital)
+            merged = {'index': np.concatenate([best['index'], index])}
+            for name in SWEEP_METRICS:
+                merged[name] = np.concatenate([best[name], np.asarray(results[name], dtype=np.float64)])
+            # Best first; drawdown ranks ascending
+            key = merged[sort_by]
+            order = np.argsort(key if sort_by == 'max_drawdown' else -key, kind='stable')[:top]
+            best = {name: values[order] for name, values in merged.items()}
+        elapsed = time.perf_counter() - start
+
+        params = [g[i] for g, i in zip(grids, np.unravel_index(best['index'], shape))]
+        results = [
+            {
+                'threshold': float(params[0][j]),
+                'hold_days': int(params[1][j]),
+                'fee': float(params[2][j]),
+                'slippage': float(params[3][j]),
+                **{name: float(best[name][j]) for name in SWEEP_METRICS},
+            }
+            for j in range(len(best['index']))
+        ]
+        results = [dict(r, total_trades=int(r['total_trades'])) for r in results]
+
+        return {
+            'days': days,
+            'timeframe': timeframe,
+            'combinations': combinations,
+            'elapsed_seconds': elapsed,
+            'sort_by': sort_by,
+            'results': results
+        }
+
+    except Exception as e:
+        print(f"Sweep error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {'error': str(e)}
+
+
 if __name__ == '__main__':
-    print("Running real backtest...")
-    result = run_backtest(days=30)
-    if 'error' in result:
-        print(f"Error: {result['error']}")
+    parser = argparse.ArgumentParser(description="Backtest the LSTM strategy on historical data")
+    parser.add_argument('--days', type=int, default=30, help='Bars to backtest')
+    parser.add_argument('--timeframe', default='1d', choices=['1d'] + rollups.BASES + rollups.ROLLUPS)
+    parser.add_argument('--capital', type=float, default=10000)
+    parser.add_argument('--sweep', action='store_true', help='Rank a grid of strategy parameters')
+    parser.add_argument('--thresholds', default=str(ENTRY_THRESHOLD), help='e.g. 0:0.02:41 or 0.005,0.01')
+    parser.add_argument('--holds', default=str(HOLD_DAYS), help='e.g. 1,2,3,5')
+    parser.add_argument('--fees', default=str(FEE))
+    parser.add_argument('--slippages', default=str(SLIPPAGE))
+    parser.add_argument('--sort-by', default='total_return', choices=SWEEP_METRICS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--backend', choices=list(model_registry.MODEL_LOADERS),
+                        help='Inference backend (default: INFERENCE_BACKEND or keras)')
+    args = parser.parse_args()
+    if args.backend:
+        model_registry.BACKEND = args.backend
+
+    if args.sweep:
+        print("Running parameter sweep...")
+        result = run_sweep(
+            days=args.days, initial_capital=args.capital,
+            thresholds=parse_grid(args.thresholds), hold_days=parse_grid(args.holds, int),
+            fees=parse_grid(args.fees), slippages=parse_grid(args.slippages),
+            sort_by=args.sort_by, top=args.top, timeframe=args.timeframe,
+        )
+        if 'error' in result:
+            print(f"Error: {result['error']}")
+        else:
+            print(f"{result['combinations']} combinations in {result['elapsed_seconds']:.2f}s")
+            print(f"{'Thresh':>8} {'Hold':>4} {'Fee':>7} {'Slip':>7} {'Return%':>9} {'Win%':>6} {'MaxDD%':>7} {'PF':>6} {'Trades':>6}")
+            for r in result['results']:
+                print(f"{r['threshold']:>8.4f} {r['hold_days']:>4} {r['fee']:>7.4f} {r['slippage']:>7.4f} "
+                      f"{r['total_return']:>9.2f} {r['win_rate']:>6.1f} {r['max_drawdown']:>7.2f} "
+                      f"{r['profit_factor']:>6.2f} {r['total_trades']:>6}")
     else:
-        print(f"Total Return: {result['total_return']:.2f}%")
-        print(f"Win Rate: {result['win_rate']:.2f}%")
-        print(f"Max Drawdown: {result['max_drawdown']:.2f}%")
-        print(f"Profit Factor: {result['profit_factor']:.2f}")
-        print(f"Total Trades: {result['total_trades']}")
+        print("Running real backtest...")
+        result = run_backtest(days=args.days, initial_capital=args.capital, timeframe=args.timeframe)
+        if 'error' in result:
+            print(f"Error: {result['error']}")
+        else:
+            print(f"Total Return: {result['total_return']:.2f}%")
+            print(f"Win Rate: {result['win_rate']:.2f}%")
+            print(f"Max Drawdown: {result['max_drawdown']:.2f}%")
+            print(f"Profit Factor: {result['profit_factor']:.2f}")
+            print(f"Total Trades: {result['total_trades']}")
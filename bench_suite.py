@@ -0,0 +1,412 @@
+"""
+Benchmark Suite
+Offline, reproducible timings for the paths that regress quietly: data
+ingest and load, model inference, backtests and API endpoints.
+
+Everything runs in a temporary workspace with synthetic fixtures: a
+random-walk BTC-USD history ingested through data_engine's CSV source, a
+randomly initialized model with the train_model.ipynb architecture and a
+scaler fitted to the fixture, replayed price ticks and a fake kline
+server. No trained artifact or network access is needed, and a seed fixes
+every input.
+
+    python bench_suite.py run --out bench.json
+    python bench_suite.py run --quick --only backtest api
+    python bench_suite.py compare baseline.json bench.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+SUITE_VERSION = 1
+GROUPS = ['data', 'inference', 'backtest', 'api']
+SYMBOL = 'BTC-USD'
+DAYS = 3200  # enough history for a 3000-day backtest plus the 60-day lookback
+APPEND_DAYS = 5
+BACKTEST_DAYS = [30, 365, 3000]
+RISK_PATHS = [10000, 100000]
+LOOKBACK = 60
+THRESHOLD = 0.10  # relative slowdown flagged by compare
+FLOOR_MS = 0.05  # timings below this in both runs are too noisy to flag
+
+
+# -----------------------------------------------------------------------------
+# FIXTURES
+# -----------------------------------------------------------------------------
+def fixture_frame(days=DAYS, seed=0):
+    """Random-walk daily OHLCV in the Yahoo Finance shape, ending yesterday"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, days)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.02, days)) * close
+    end = datetime.now().date() - timedelta(days=1)
+    return pd.DataFrame({
+        'Date': pd.date_range(end=end, periods=days, freq='D'),
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.uniform(1e9, 5e9, days),
+    })
+
+
+def build_model(seed=0):
+    """Randomly initialized network with the notebook's architecture"""
+    import tensorflow as tf
+    import training
+
+    tf.keras.utils.set_random_seed(seed)
+    return training.build_model((LOOKBACK, len(training.FEATURES)))
+
+
+def write_artifacts(csv_path, model_path='models/market_model.h5', scaler_path='models/market_scaler.pkl', seed=0):
+    """Save the random model and a scaler fitted to the fixture where the API looks for them"""
+    import pandas as pd
+    from sklearn.preprocessing import MinMaxScaler
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    df = pd.read_csv(csv_path)
+    scaler = MinMaxScaler().fit(df[['BTC_Close', 'BTC_Volume']].to_numpy())
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+    build_model(seed).save(model_path)
+
+
+class FakeKlineClient:
+    """Deterministic klines in Binance's shape, for /api/historical without network"""
+
+    def get_klines(self, symbol, interval, limit, start_time=None):
+        t0 = 1_700_000_000_000 if start_time is None else int(start_time)
+        return [[t0 + i * 60_000, '100.0', '101.0', '99.0', str(100.0 + i % 7), '10.0', t0 + i * 60_000 + 59_999]
+                for i in range(limit)]
+
+
+# -----------------------------------------------------------------------------
+# MEASUREMENT
+# -----------------------------------------------------------------------------
+def _timings(fn, repeats, warmup=1):
+    """Per-call seconds of `repeats` calls after `warmup` untimed ones"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def _latency(fn, repeats, warmup=1):
+    """{'p50_ms', 'p99_ms'} of fn"""
+    times = _timings(fn, repeats, warmup) * 1000
+    p50, p99 = np.percentile(times, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+class Results:
+    """Flat name -> {value, unit, better} table, in insertion order"""
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, value, unit='ms', better='lower'):
+        self.values[name] = {'value': float(value), 'unit': unit, 'better': better}
+        print(f"  {name:<40} {value:>12.3f} {unit}")
+
+    def latency(self, name, fn, repeats, warmup=1):
+        r = _latency(fn, repeats, warmup)
+        self.add(f'{name}.p50', r['p50_ms'])
+        self.add(f'{name}.p99', r['p99_ms'])
+
+
+# -----------------------------------------------------------------------------
+# GROUPS
+# -----------------------------------------------------------------------------
+def bench_data(results, repeats):
+    """data_engine ingest (full and incremental), then CSV and columnar store loads"""
+    import pandas as pd
+    import data_engine
+    import market_data
+    import ohlcv_store
+
+    df = fixture_frame()
+    os.makedirs('fixtures', exist_ok=True)
+    fixture = os.path.join('fixtures', f'{SYMBOL}.csv')
+    source = data_engine.CsvSource('fixtures')
+    csv_path = data_engine.csv_path(SYMBOL)
+
+    # Full ingest of all but the last few days, then the incremental append
+    df.iloc[:-APPEND_DAYS].to_csv(fixture, index=False)
+    start = time.perf_counter()
+    data_engine.update_dataset(SYMBOL, source)
+    results.add('data.ingest_full', (time.perf_counter() - start) * 1000)
+    df.to_csv(fixture, index=False)
+    start = time.perf_counter()
+    data_engine.update_dataset(SYMBOL, source)
+    results.add('data.ingest_append', (time.perf_counter() - start) * 1000)
+
+    store_path = ohlcv_store.store_path(csv_path)
+    results.latency('data.load_csv_pandas', lambda: pd.read_csv(csv_path), repeats)
+    results.latency('data.load_csv_store', lambda: market_data.MarketDataStore(csv_path).refresh(), repeats)
+    results.latency('data.load_columnar', lambda: ohlcv_store.ColumnarStore(store_path).refresh().tail(LOOKBACK), repeats)
+    store = market_data.get_store(csv_path)
+    results.latency('data.tail_window', lambda: market_data.stack(store.tail(LOOKBACK), ['BTC_Close', 'BTC_Volume']),
+                    repeats * 10)
+    return csv_path
+
+
+def bench_inference(results, repeats, csv_path):
+    """Single-window latency per backend and batched throughput over the whole history"""
+    import backtest_engine
+    import forecaster
+    import inference
+    import market_data
+    import model_registry
+
+    model = model_registry.get_model('models/market_model.h5')
+    scaler = model_registry.get_scaler('models/market_scaler.pkl')
+    features = market_data.stack(market_data.get_store(csv_path).between(), ['BTC_Close', 'BTC_Volume'])
+    window = scaler.transform(features[-LOOKBACK:])[np.newaxis].astype(np.float32)
+
+    results.latency('inference.keras_predict_single', lambda: model.predict(window, verbose=0), repeats)
+    step = forecaster.compile_step(model)
+    results.latency('inference.compiled_step_single', lambda: np.asarray(step(window)), repeats)
+    inference.export('models/market_model.h5')
+    numpy_model = inference.load_exported('models/market_model.h5')
+    results.latency('inference.numpy_single', lambda: numpy_model(window), repeats)
+    runner = forecaster.Forecaster(model, scaler, step=step)
+    results.latency('inference.rollout_30_days', lambda: runner.rollout(window, 30), repeats)
+
+    n_windows = len(features) - LOOKBACK + 1
+    seconds = np.median(_timings(lambda: backtest_engine.predict_prices(model, scaler, features), max(repeats // 5, 1)))
+    results.add('inference.batched_total', seconds * 1000)
+    results.add('inference.batched_throughput', n_windows / seconds, unit='windows/s', better='higher')
+
+
+def bench_backtest(results, repeats):
+    """
+    run_backtest wall time, with the prediction cache cleared (cold) and
+    reused (warm), the parameter sweep, and risk_engine over a 365-day run
+    """
+    import backtest_engine
+
+    for days in BACKTEST_DAYS:
+        def cold():
+            backtest_engine._prediction_caches.clear()
+            result = backtest_engine.run_backtest(days=days)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+
+        n = max(repeats // 5, 1)
+        results.add(f'backtest.{days}d_cold', np.median(_timings(cold, n, warmup=0)) * 1000)
+        results.add(f'backtest.{days}d_warm',
+                    np.median(_timings(lambda: backtest_engine.run_backtest(days=days), repeats)) * 1000)
+    start = time.perf_counter()
+    backtest_engine.run_sweep(days=365, thresholds=np.linspace(0, 0.02, 21), hold_days=[1, 2, 3, 5],
+                              fees=[0, 0.001], slippages=[0, 0.0005])
+    results.add('backtest.sweep_336_combinations', (time.perf_counter() - start) * 1000)
+
+    import risk_engine
+    backtest = backtest_engine.run_backtest(days=365)
+    for paths in RISK_PATHS:
+        times = _timings(lambda: risk_engine.analyze(backtest, paths=paths), max(repeats // 10, 1), warmup=0)
+        results.add(f'backtest.risk_{paths}_paths', np.median(times) * 1000)
+
+
+def bench_api(results, requests_per_endpoint):
+    """Sequential requests through the Flask test client: throughput and latency per endpoint"""
+    import api_server
+    import kline_cache
+
+    api_server.klines = kline_cache.KlineCache(FakeKlineClient())
+    api_server.PRICE_WAIT = 0.5
+    api_server.warm_up()
+    client = api_server.app.test_client()
+    as_of = str(np.datetime64(datetime.now().date()) - 400)
+    endpoints = {
+        'predict': '/api/predict?symbol=ETHUSDT&timeframe=1d',
+        'forecast_7d': '/api/forecast?horizon=7',
+        'forecast_as_of': f'/api/forecast?horizon=7&as_of={as_of}',
+        'indicators': '/api/indicators?limit=100',
+        'historical': '/api/historical?symbol=BTCUSDT&timeframe=1h&limit=300',
+        'historical_lod': '/api/historical?symbol=BTCUSDT&timeframe=1d&limit=3200&max_points=500&format=binary',
+        'health': '/api/health',
+    }
+    for name, url in endpoints.items():
+        def call():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        times = _timings(call, requests_per_endpoint, warmup=2)
+        results.add(f'api.{name}.throughput', len(times) / times.sum(), unit='req/s', better='higher')
+        results.add(f'api.{name}.p50', float(np.percentile(times, 50)) * 1000)
+        results.add(f'api.{name}.p99', float(np.percentile(times, 99)) * 1000)
+    api_server.prices.stop()
+
+
+def environment():
+    """What produced the numbers, so comparisons across machines are visible"""
+    meta = {
+        'suite_version': SUITE_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    try:
+        import tensorflow as tf
+        meta['tensorflow'] = tf.__version__
+    except ImportError:
+        pass
+    try:
+        repo = os.path.dirname(os.path.abspath(__file__))
+        meta['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo,
+                                        capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        meta['commit'] = None
+    return meta
+
+
+def run(groups=GROUPS, quick=False, seed=0):
+    """Run the selected groups in a fresh workspace; returns {'meta', 'results'}"""
+    repeats = 10 if quick else 50
+    requests_per_endpoint = 50 if quick else 300
+    results = Results()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workspace:
+        os.chdir(workspace)
+        # The API reads its price feed at import; replayed ticks keep it offline
+        import price_hub
+        ticks = os.path.join(workspace, 'ticks.csv')
+        price_hub.save_ticks(ticks, price_hub.synthetic_ticks(
+            ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT', 'ADAUSDT', 'XRPUSDT', 'DOTUSDT', 'DOGEUSDT', 'AVAXUSDT',
+             'POLUSDT'], 1000, seed=seed))
+        os.environ['PRICE_FEED'] = f'replay:{ticks}'
+        try:
+            if 'data' in groups:
+                print("📊 data")
+                csv_path = bench_data(results, repeats)
+            else:
+                csv_path = _ingest_only()
+            write_artifacts(csv_path, seed=seed)
+            if 'inference' in groups:
+                print("📊 inference")
+                bench_inference(results, repeats, csv_path)
+            if 'backtest' in groups:
+                print("📊 backtest")
+                bench_backtest(results, repeats)
+            if 'api' in groups:
+                print("📊 api")
+                bench_api(results, requests_per_endpoint)
+        finally:
+            os.chdir(cwd)
+    meta = dict(environment(), groups=list(groups), quick=quick, seed=seed)
+    return {'meta': meta, 'results': results.values}
+
+
+def _ingest_only():
+    """Fixture data for groups that need it when the data group is skipped"""
+    import data_engine
+    os.makedirs('fixtures', exist_ok=True)
+    fixture_frame().to_csv(os.path.join('fixtures', f'{SYMBOL}.csv'), index=False)
+    data_engine.update_dataset(SYMBOL, data_engine.CsvSource('fixtures'))
+    return data_engine.csv_path(SYMBOL)
+
+
+# -----------------------------------------------------------------------------
+# COMPARE
+# -----------------------------------------------------------------------------
+def compare(baseline, current, threshold=THRESHOLD, floor_ms=FLOOR_MS):
+    """
+    Per-metric change from `baseline` to `current` (result dicts from run()).
+    A metric regresses when it gets worse by more than `threshold` (0.10 =
+    10%); millisecond timings under `floor_ms` in both runs are never flagged.
+
+    Returns:
+        list of {name, baseline, current, change, status}, where change is
+        the relative slowdown (positive = worse) and status is one of
+        'regression', 'improvement', 'ok', 'new' or 'missing'
+    """
+    old, new = baseline['results'], current['results']
+    rows = []
+    for name in list(old) + [n for n in new if n not in old]:
+        if name not in new or name not in old:
+            rows.append({'name': name, 'baseline': old.get(name, {}).get('value'),
+                         'current': new.get(name, {}).get('value'), 'change': None,
+                         'status': 'missing' if name not in new else 'new'})
+            continue
+        a, b = old[name]['value'], new[name]['value']
+        higher = new[name].get('better') == 'higher'
+        if a == 0 or b == 0:
+            change = 0.0
+        else:
+            change = a / b - 1 if higher else b / a - 1
+        status = 'ok'
+        if new[name].get('unit') == 'ms' and max(a, b) < floor_ms:
+            pass
+        elif change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        rows.append({'name': name, 'baseline': a, 'current': b, 'change': change, 'status': status})
+    return rows
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='Run the benchmarks and write JSON results')
+    p_run.add_argument('--out', default='bench.json', help='JSON file to write')
+    p_run.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS)
+    p_run.add_argument('--quick', action='store_true', help='Fewer repeats, for CI smoke runs')
+    p_run.add_argument('--seed', type=int, default=0)
+    p_cmp = sub.add_parser('compare', help='Flag regressions between two result files')
+    p_cmp.add_argument('baseline')
+    p_cmp.add_argument('current')
+    p_cmp.add_argument('--threshold', type=float, default=THRESHOLD, help='Relative slowdown to flag (0.10 = 10%%)')
+    p_cmp.add_argument('--floor-ms', type=float, default=FLOOR_MS)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+        report = run(args.only, args.quick, args.seed)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"✅ {len(report['results'])} results written to {args.out}")
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+        for key in ('platform', 'cpus', 'tensorflow'):
+            if baseline['meta'].get(key) != current['meta'].get(key):
+                print(f"⚠️ {key} differs: {baseline['meta'].get(key)} -> {current['meta'].get(key)}")
+        rows = compare(baseline, current, args.threshold, args.floor_ms)
+        print(f"{'Metric':<40} {'Baseline':>12} {'Current':>12} {'Change':>8}  Status")
+        for r in rows:
+            change = '' if r['change'] is None else f"{r['change'] * 100:+.1f}%"
+            fmt = lambda v: '-' if v is None else f'{v:.3f}'
+            print(f"{r['name']:<40} {fmt(r['baseline']):>12} {fmt(r['current']):>12} {change:>8}  {r['status']}")
+        regressions = [r for r in rows if r['status'] == 'regression']
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold * 100:.0f}%")
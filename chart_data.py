@@ -0,0 +1,309 @@
+"""
+Chart Payloads
+Level-of-detail and compact encodings for candle series sent to charts.
+
+Candles are handled as columns (time in epoch seconds, open/high/low/close,
+optionally volume) instead of one dict per candle:
+
+- downsample() merges neighbouring candles into at most `max_points`
+  buckets, keeping each bucket's open, high, low, close and total volume,
+  so wicks and gaps survive zooming out; bucket() does the same with a
+  fixed number of candles per bucket. lttb() picks representative
+  points of a line series (Largest-Triangle-Three-Buckets).
+- since() keeps only candles at or after a client's cursor (its last
+  candle's time), so polling resends the still-forming candle plus
+  anything newer instead of the whole range.
+- encode() writes records JSON (the /api/historical shape), columnar
+  JSON, or a binary frame with delta-encoded times and float64 columns.
+
+    python chart_data.py bench --rows 1000 100000 1000000
+"""
+import argparse
+import gzip
+import json
+import struct
+import time
+
+import numpy as np
+
+
+OHLC = ['open', 'high', 'low', 'close']
+FORMATS = ['records', 'columns', 'binary']
+MIMETYPES = {'records': 'application/json', 'columns': 'application/json', 'binary': 'application/octet-stream'}
+
+# Binary frame: header, then uint32 time deltas (the first is 0 from
+# `first_time`), then each value column as little-endian float64
+BINARY_MAGIC = b'OHLC'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sBBHIq')  # magic, version, flags, reserved, rows, first_time
+FLAG_VOLUME = 1
+FLAG_LINE = 2  # one 'value' column instead of OHLC
+
+
+def columns_of(series):
+    """Value column names of a series dict, in encoding order"""
+    if 'value' in series:
+        return ['value']
+    return OHLC + (['volume'] if 'volume' in series else [])
+
+
+def from_view(view, prefix, date_col='Date'):
+    """
+    Chart columns from a market_data / ohlcv_store view ({'Date': ...,
+    'BTC_Open': ...}); volume is included when the view has it
+    """
+    series = {'time': np.asarray(view[date_col]).astype('datetime64[s]').astype(np.int64)}
+    for name in OHLC + ['volume']:
+        column = f'{prefix}_{name.capitalize()}'
+        if column in view:
+            series[name] = np.asarray(view[column], dtype=np.float64)
+    return series
+
+
+def from_records(records):
+    """Chart columns from [{time, open, high, low, close}, ...]"""
+    series = {'time': np.fromiter((r['time'] for r in records), dtype=np.int64, count=len(records))}
+    for name in OHLC + ['volume']:
+        if records and name in records[0]:
+            series[name] = np.fromiter((r[name] for r in records), dtype=np.float64, count=len(records))
+    return series
+
+
+def _take(series, lo, hi):
+    return {k: v[lo:hi] for k, v in series.items()}
+
+
+def since(series, cursor):
+    """Candles with time >= cursor; clients pass their last candle's time"""
+    if cursor is None:
+        return series
+    return _take(series, np.searchsorted(series['time'], cursor, side='left'), len(series['time']))
+
+
+def between(series, start=None, end=None):
+    """Candles with start <= time <= end (epoch seconds)"""
+    times = series['time']
+    lo = 0 if start is None else np.searchsorted(times, start, side='left')
+    hi = len(times) if end is None else np.searchsorted(times, end, side='right')
+    return _take(series, lo, hi)
+
+
+# -----------------------------------------------------------------------------
+# LEVEL OF DETAIL
+# -----------------------------------------------------------------------------
+def downsample(series, max_points):
+    """
+    At most `max_points` candles, each merging a run of consecutive ones:
+    first time and open, highest high, lowest low, last close, summed volume
+    """
+    n = len(series['time'])
+    if max_points is None or n <= max_points:
+        return series
+    # Equal-count buckets, so every output candle spans the same number of bars
+    return _merge(series, (np.arange(max_points, dtype=np.int64) * n) // max_points)
+
+
+def bucket(series, stride):
+    """
+    Candles merged `stride` at a time from the first one; the last bucket
+    may be partial. Unlike downsample(), appending candles never moves a
+    bucket boundary, so only the last bucket onwards needs recomputing.
+    """
+    if stride <= 1:
+        return series
+    return _merge(series, np.arange(0, len(series['time']), stride, dtype=np.int64))
+
+
+def _merge(series, starts):
+    """One candle per run of candles beginning at each index in `starts`"""
+    n = len(series['time'])
+    if n == 0:
+        return series
+    ends = np.append(starts[1:], n) - 1
+    out = {'time': series['time'][starts], 'open': series['open'][starts],
+           'high': np.maximum.reduceat(series['high'], starts),
+           'low': np.minimum.reduceat(series['low'], starts),
+           'close': series['close'][ends]}
+    if 'volume' in series:
+        out['volume'] = np.add.reduceat(series['volume'], starts)
+    return out
+
+
+def lttb(x, y, max_points):
+    """
+    Indices of at most `max_points` points of the line (x, y) chosen by
+    Largest-Triangle-Three-Buckets: the first and last points, plus from
+    each bucket the point forming the largest triangle with the previously
+    chosen point and the next bucket's average
+    """
+    n = len(x)
+    if max_points is None or n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # max_points - 2 buckets over the points between the first and the last
+    edges = 1 + (np.arange(max_points - 1, dtype=np.int64) * (n - 2)) // (max_points - 2)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x, edges[:-1]) / counts
+    avg_y = np.add.reduceat(y, edges[:-1]) / counts
+    # The last bucket looks ahead to the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    chosen = np.empty(max_points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        chosen[i + 1] = a
+    return chosen
+
+
+def line(series, max_points=None):
+    """Close prices as a line series ({time, value}), thinned by LTTB"""
+    keep = lttb(series['time'], series['close'], max_points)
+    return {'time': series['time'][keep], 'value': series['close'][keep]}
+
+
+# -----------------------------------------------------------------------------
+# ENCODING
+# -----------------------------------------------------------------------------
+def to_records(series):
+    """[{time, open, high, low, close[, volume]}, ...] for chart libraries that take dicts"""
+    names = ['time'] + columns_of(series)
+    return [dict(zip(names, row)) for row in zip(series['time'].tolist(), *(series[c].tolist() for c in names[1:]))]
+
+
+def encode_records(series, **meta):
+    data = to_records(series)
+    return json.dumps({'data': data, 'count': len(data), **meta}).encode()
+
+
+def encode_columns(series, **meta):
+    """
+    One JSON array per column; `time` is delta-encoded (first value
+    absolute, then differences) to keep repeated large numbers out
+    """
+    times = series['time']
+    deltas = np.diff(times, prepend=0) if len(times) else times
+    body = {'time': deltas.tolist(), **{c: series[c].tolist() for c in columns_of(series)}}
+    return json.dumps({**body, 'time_encoding': 'delta', 'count': len(times), **meta}).encode()
+
+
+def encode_binary(series):
+    times = series['time']
+    names = columns_of(series)
+    flags = (FLAG_LINE if names == ['value'] else 0) | (FLAG_VOLUME if 'volume' in names else 0)
+    first = int(times[0]) if len(times) else 0
+    deltas = np.diff(times, prepend=first)
+    if len(deltas) and (deltas.min() < 0 or deltas.max() > np.iinfo(np.uint32).max):
+        raise ValueError("Times must be ascending with gaps under 2**32 seconds")
+    parts = [BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags, 0, len(times), first),
+             deltas.astype('<u4').tobytes()]
+    parts.extend(np.ascontiguousarray(series[c], dtype='<f8').tobytes() for c in names)
+    return b''.join(parts)
+
+
+def decode_binary(body):
+    """Series dict from an encode_binary() frame"""
+    magic, version, flags, _, n, first = BINARY_HEADER.unpack_from(body)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Not a chart frame")
+    offset = BINARY_HEADER.size
+    deltas = np.frombuffer(body, dtype='<u4', count=n, offset=offset)
+    series = {'time': first + np.cumsum(deltas, dtype=np.int64)}
+    offset += 4 * n
+    names = ['value'] if flags & FLAG_LINE else OHLC + (['volume'] if flags & FLAG_VOLUME else [])
+    for name in names:
+        series[name] = np.frombuffer(body, dtype='<f8', count=n, offset=offset)
+        offset += 8 * n
+    return series
+
+
+def encode(series, fmt='records', **meta):
+    """(body bytes, mimetype); `meta` (e.g. cursor) goes into JSON bodies and is dropped from binary"""
+    if fmt == 'binary':
+        return encode_binary(series), MIMETYPES[fmt]
+    if fmt == 'columns':
+        return encode_columns(series, **meta), MIMETYPES[fmt]
+    if fmt == 'records':
+        return encode_records(series, **meta), MIMETYPES[fmt]
+    raise ValueError(f"format must be one of {FORMATS}")
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def synthetic_series(n, interval=60, start=1_577_836_800, seed=0):
+    """Random-walk candles `interval` seconds apart, with volume"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    return {
+        'time': start + interval * np.arange(n, dtype=np.int64),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.gamma(2.0, 5.0, n),
+    }
+
+
+def _timed(fn, repeats):
+    """(median seconds, last result)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def benchmark(rows=100_000, max_points=2000, repeats=3):
+    """
+    Serialization time and payload size: the pandas to_dict('records')
+    path app.py used, each encode() format at full resolution, and each
+    format after downsampling to `max_points` (LTTB for the line series)
+    """
+    import pandas as pd
+
+    series = synthetic_series(rows)
+    df = pd.DataFrame(series)
+    cases = {
+        'pandas records': lambda: json.dumps(df.astype(float).to_dict('records')).encode(),
+        'records': lambda: encode(series, 'records')[0],
+        'columns': lambda: encode(series, 'columns')[0],
+        'binary': lambda: encode(series, 'binary')[0],
+        f'records @{max_points}': lambda: encode(downsample(series, max_points), 'records')[0],
+        f'columns @{max_points}': lambda: encode(downsample(series, max_points), 'columns')[0],
+        f'binary @{max_points}': lambda: encode(downsample(series, max_points), 'binary')[0],
+        f'line lttb @{max_points}': lambda: encode(line(series, max_points), 'columns')[0],
+        'since last 10': lambda: encode(since(series, int(series['time'][-10])), 'columns')[0],
+    }
+    results = []
+    for name, fn in cases.items():
+        # Larger inputs need fewer repeats for a stable median
+        seconds, body = _timed(fn, repeats if rows <= 100_000 else 1)
+        results.append({'case': name, 'ms': seconds * 1000, 'bytes': len(body),
+                        'gzip_bytes': len(gzip.compress(body, 6))})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Chart payload tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Serialization time and payload size per format')
+    p_bench.add_argument('--rows', type=int, nargs='+', default=[1000, 100_000, 1_000_000])
+    p_bench.add_argument('--max-points', type=int, default=2000)
+    p_bench.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        print(f"\n{rows:,} candles")
+        print(f"{'Payload':<18} {'Time':>10} {'Size':>11} {'gzip':>11}")
+        for r in benchmark(rows, args.max_points, args.repeats):
+            print(f"{r['case']:<18} {r['ms']:>8.2f}ms {r['bytes'] / 1024:>9.1f}KB {r['gzip_bytes'] / 1024:>9.1f}KB")
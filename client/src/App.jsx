@@ -10,17 +10,6 @@ function App() {
     const [timeframe, setTimeframe] = useState('1d');
     const [currentSymbol, setCurrentSymbol] = useState('BTCUSDT');
 
-    // Fetch live price for any cryptocurrency from Binance API
-    const fetchLivePrice = useCallback(async (symbol) => {
-        try {
-            const response = await fetch(`https://api.binance.com/api/v3/ticker/price?symbol=${symbol}`);
-            const data = await response.json();
-            setCurrentPrice(parseFloat(data.price));
-        } catch (error) {
-            console.error('Error fetching live price:', error);
-        }
-    }, []);
-
     // Fetch prediction from backend with timeframe and symbol
     const fetchPrediction = useCallback(async (selectedTimeframe, symbol) => {
         setLoading(true);
@@ -45,26 +34,46 @@ function App() {
     const handleSymbolChange = useCallback((newSymbol) => {
         console.log('Symbol changed to:', newSymbol);
         setCurrentSymbol(newSymbol);
-        fetchLivePrice(newSymbol);
         fetchPrediction(timeframe, newSymbol);
-    }, [fetchLivePrice, fetchPrediction, timeframe]);
+    }, [fetchPrediction, timeframe]);
+
+    // Live price pushed by the backend price hub. The browser reconnects dropped
+    // streams itself, but gives up on a 503 (server at its stream cap), so retry those.
+    useEffect(() => {
+        let priceStream;
+        let retryTimer;
+        const connect = () => {
+            priceStream = new EventSource(`/api/prices/stream?symbols=${currentSymbol}`);
+            priceStream.onmessage = (event) => {
+                const tick = JSON.parse(event.data);
+                setCurrentPrice(tick.price);
+            };
+            priceStream.onerror = () => {
+                console.error('Live price stream interrupted, reconnecting...');
+                if (priceStream.readyState === EventSource.CLOSED) {
+                    retryTimer = setTimeout(connect, 5000);
+                }
+            };
+        };
+        connect();
+
+        return () => {
+            clearTimeout(retryTimer);
+            priceStream.close();
+        };
+    }, [currentSymbol]);
 
     useEffect(() => {
         // Initial fetch
-        fetchLivePrice(currentSymbol);
         fetchPrediction(timeframe, currentSymbol);
 
-        // Update live price every 1 second
-        const priceInterval = setInterval(() => fetchLivePrice(currentSymbol), 1000);
-
         // Refresh prediction every 5 minutes
         const predictionInterval = setInterval(() => fetchPrediction(timeframe, currentSymbol), 5 * 60 * 1000);
 
         return () => {
-            clearInterval(priceInterval);
             clearInterval(predictionInterval);
         };
-    }, [currentSymbol, timeframe, fetchLivePrice, fetchPrediction]);
+    }, [currentSymbol, timeframe, fetchPrediction]);
 
     return (
         <div className="app">
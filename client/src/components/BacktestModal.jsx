@@ -8,22 +8,52 @@ function BacktestModal({ onClose }) {
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
 
+    const [progress, setProgress] = useState(0);
+    const pollTimer = React.useRef(null);
+
+    const pollJob = async (statusUrl) => {
+        try {
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+
+            if (!response.ok || job.status === 'error') {
+                setError(job.error || 'Failed to run backtest');
+                setLoading(false);
+            } else if (job.status === 'done') {
+                setBacktestData(job.result);
+                setLoading(false);
+            } else {
+                setProgress(job.progress);
+                pollTimer.current = setTimeout(() => pollJob(statusUrl), 500);
+            }
+        } catch (err) {
+            setError('Failed to run backtest');
+            setLoading(false);
+        }
+    };
+
     const runBacktest = async () => {
         setLoading(true);
         setError(null);
+        setProgress(0);
 
         try {
-            const response = await fetch('/api/backtest?days=30&capital=10000');
-            const data = await response.json();
-
-            if (data.error) {
-                setError(data.error);
+            // Backtests run as background jobs; identical requests share one job
+            const response = await fetch('/api/backtest', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ days: 30, capital: 10000 })
+            });
+            const job = await response.json();
+
+            if (job.error) {
+                setError(job.error);
+                setLoading(false);
             } else {
-                setBacktestData(data);
+                pollJob(job.status_url);
             }
         } catch (err) {
             setError('Failed to run backtest');
-        } finally {
             setLoading(false);
         }
     };
@@ -31,6 +61,7 @@ function BacktestModal({ onClose }) {
     // Auto-run on mount
     React.useEffect(() => {
         runBacktest();
+        return () => clearTimeout(pollTimer.current);
     }, []);
 
     const formatCurrency = (value) => {
@@ -50,7 +81,7 @@ function BacktestModal({ onClose }) {
                 {loading && (
                     <div className="backtest-loading">
                         <div className="backtest-spinner"></div>
-                        <p>Running real backtest on historical data...</p>
+                        <p>Running real backtest on historical data... {progress > 0 && `${Math.round(progress)}%`}</p>
                     </div>
                 )}
 
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { TrendingUp, TrendingDown, Activity, Brain, Clock, X } from 'lucide-react';
 import { PredictionPanelSkeleton } from './SkeletonLoader';
 import './PredictionPanel.css';
@@ -9,6 +9,19 @@ import BacktestModal from './BacktestModal';
 function PredictionPanel({ prediction, loading, currentPrice, currentSymbol, onTimeframeChange, onSymbolChange }) {
     const [timeframe, setTimeframe] = useState('1d');
     const [showBacktest, setShowBacktest] = useState(false);
+    const [drivers, setDrivers] = useState(null);
+
+    // Key drivers come from the server-side indicator engine, for the selected coin
+    useEffect(() => {
+        if (!prediction) return;
+        let ignore = false;
+        setDrivers(null);
+        fetch(`/api/indicators?limit=1&symbol=${encodeURIComponent(currentSymbol || 'BTCUSDT')}`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => { if (!ignore) setDrivers(data?.drivers || null); })
+            .catch(() => { if (!ignore) setDrivers(null); });
+        return () => { ignore = true; };
+    }, [prediction, currentSymbol]);
 
     const timeframeOptions = [
         { value: '30m', label: '30 Min' },
@@ -202,17 +215,19 @@ function PredictionPanel({ prediction, loading, currentPrice, currentSymbol, onT
                             <div className="drivers-list">
                                 <div className="driver-item">
                                     <span className="driver-name">Volume</span>
-                                    <span className="driver-value positive">High</span>
+                                    <span className={`driver-value ${drivers?.volume === 'Low' ? 'negative' : 'positive'}`}>
+                                        {drivers?.volume || '—'}
+                                    </span>
                                 </div>
                                 <div className="driver-item">
                                     <span className="driver-name">Trend Strength</span>
                                     <span className={`driver-value ${trend?.isPositive ? 'positive' : 'negative'}`}>
-                                        {trend?.isPositive ? 'Strong Buy' : 'Strong Sell'}
+                                        {drivers ? `${drivers.trend_strength} ${drivers.trend}` : (trend?.isPositive ? 'Strong Buy' : 'Strong Sell')}
                                     </span>
                                 </div>
                                 <div className="driver-item">
                                     <span className="driver-name">Volatility</span>
-                                    <span className="driver-value warning">Moderate</span>
+                                    <span className="driver-value warning">{drivers?.volatility || '—'}</span>
                                 </div>
                             </div>
                         </div>
@@ -0,0 +1,251 @@
+"""
+Dashboard Data
+Cached data layer behind the Streamlit dashboard (app.py). Streamlit reruns
+the whole page on every interaction, so a rerun should only pay for what
+changed since the last one:
+
+- Candles come from the shared market_data store. It parses the CSV once,
+  then reads only rows appended to MARKET_MASTER.csv; an unchanged file
+  costs one os.stat.
+- The 7-day forecast is memoized by the last candle's date and row count,
+  so it runs once per new candle rather than once per rerun.
+- The chart's candle records are built once with fixed-size buckets. When
+  rows are appended, only the last (possibly partial) bucket onwards is
+  rebuilt. Timestamps are converted as whole arrays, never row by row.
+
+Every call to render_data() reports the milliseconds spent in each stage.
+
+    python dashboard_data.py bench --rows 3000 100000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import chart_data
+import market_data
+
+
+DATA_PATH = 'data/MARKET_MASTER.csv'
+PREFIX = 'BTC'
+FEATURE_COLS = ['BTC_Close', 'BTC_Vol', 'ETH_Close', 'ETH_Vol']
+SEQUENCE_LENGTH = 60
+HORIZON = 7
+CHART_POINTS = 2000
+
+
+@contextmanager
+def stage(timings, name):
+    """Add the block's wall time in ms to timings[name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def future_times(last_date, horizon):
+    """Epoch seconds of the `horizon` days after `last_date`"""
+    days = np.datetime64(last_date, 'D') + np.arange(1, horizon + 1)
+    return days.astype('datetime64[s]').astype(np.int64)
+
+
+class ChartSeries:
+    """
+    Candle records for the chart, at most about 2 x `max_points` of them,
+    extended as the store grows. A returned list is never modified
+    afterwards: updates build a new one, since the page may still be
+    serialising the old one in another session.
+    """
+
+    def __init__(self, prefix=PREFIX, max_points=CHART_POINTS):
+        self.prefix = prefix
+        self.max_points = max_points
+        self.stride = None
+        self.records = []
+        self.rows = 0
+        self.first_date = None
+        self.last_date = None
+
+    def _rebuild(self, store):
+        n = len(store)
+        self.stride = max(1, -(-n // self.max_points))
+        series = chart_data.from_view(store.between(), self.prefix)
+        self.records = chart_data.to_records(chart_data.bucket(series, self.stride))
+        return n
+
+    def update(self, store):
+        """Records for the store's current rows; returns (records, 'cached' | 'appended' | 'rebuilt')"""
+        n = len(store)
+        if n == 0:
+            self.stride, self.records, self.rows = None, [], 0
+            return self.records, 'rebuilt'
+        dates = store.column('Date')
+        rewritten = (self.stride is None or n < self.rows or dates[0] != self.first_date
+                     or dates[self.rows - 1] != self.last_date)
+        if rewritten or len(self.records) > 2 * self.max_points:
+            self.rows = self._rebuild(store)
+            change = 'rebuilt'
+        elif n > self.rows:
+            # The last bucket may have been partial: redo it and everything after
+            keep = len(self.records) - 1
+            tail = chart_data.from_view(store.tail(n - keep * self.stride), self.prefix)
+            self.records = self.records[:keep] + chart_data.to_records(chart_data.bucket(tail, self.stride))
+            self.rows = n
+            change = 'appended'
+        else:
+            change = 'cached'
+        self.first_date, self.last_date = dates[0], dates[n - 1]
+        return self.records, change
+
+
+class Dashboard:
+    """Everything the page draws, cached across reruns (and sessions) until the data changes"""
+
+    def __init__(self, forecaster, data_path=DATA_PATH, horizon=HORIZON, chart_points=CHART_POINTS):
+        self.forecaster = forecaster
+        self.data_path = data_path
+        self.horizon = horizon
+        self.chart = ChartSeries(PREFIX, chart_points)
+        self._forecast_key = None
+        self._forecast = None
+        self._lock = threading.Lock()
+
+    def _forecast_for(self, store):
+        key = (str(store.last_date()), len(store))
+        if key != self._forecast_key:
+            window = market_data.stack(store.tail(SEQUENCE_LENGTH), FEATURE_COLS)
+            prices = self.forecaster.forecast(window, self.horizon)[0]
+            self._forecast = [{'time': int(t), 'value': float(p)}
+                              for t, p in zip(future_times(store.last_date(), self.horizon), prices)]
+            self._forecast_key = key
+        return self._forecast
+
+    def render_data(self):
+        """
+        dict with candles and forecast (chart records), price, last_date,
+        chart ('cached', 'appended' or 'rebuilt') and timings (ms per stage)
+        """
+        timings = {}
+        with self._lock:
+            with stage(timings, 'data'):
+                store = market_data.get_store(self.data_path)
+            with stage(timings, 'forecast'):
+                forecast = self._forecast_for(store)
+            with stage(timings, 'chart'):
+                candles, change = self.chart.update(store)
+            return {
+                'candles': candles,
+                'forecast': forecast,
+                'price': float(store.column(f'{PREFIX}_Close')[-1]),
+                'last_date': str(store.last_date()),
+                'chart': change,
+                'timings': timings,
+            }
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def write_synthetic(path, rows, seed=0):
+    """MARKET_MASTER-shaped CSV of random-walk BTC/ETH candles"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    btc = 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, rows)))
+    eth = 1500 * np.exp(np.cumsum(rng.normal(0, 0.035, rows)))
+    spread = np.abs(rng.normal(0, 0.02, rows)) * btc
+    pd.DataFrame({
+        'Date': pd.date_range('1990-01-01', periods=rows, freq='D').strftime('%Y-%m-%d'),
+        'BTC_Open': np.concatenate([[btc[0]], btc[:-1]]),
+        'BTC_High': btc + spread,
+        'BTC_Low': btc - spread,
+        'BTC_Close': btc,
+        'BTC_Vol': rng.uniform(1e9, 5e9, rows),
+        'ETH_Close': eth,
+        'ETH_Vol': rng.uniform(1e8, 5e8, rows),
+    }).to_csv(path, index=False)
+
+
+def _append_row(path):
+    """Append one day after the CSV's last row, like a daily data update"""
+    import pandas as pd
+
+    last = pd.read_csv(path).iloc[-1].copy()
+    last['Date'] = (pd.Timestamp(last['Date']) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    with open(path, 'a') as f:
+        f.write(','.join(str(v) for v in last.tolist()) + '\n')
+
+
+def benchmark(rows=3000, repeats=20, chart_points=CHART_POINTS):
+    """
+    Median ms of one rerun: the page's original per-rerun work (forecast,
+    row-by-row timestamps, to_dict('records') over every candle), then the
+    cached layer with nothing new, right after a one-row append, and from
+    a cold start
+    """
+    import pandas as pd
+    from sklearn.preprocessing import MinMaxScaler
+    import forecaster
+    import training
+
+    def median_ms(fn, n):
+        times = []
+        for _ in range(n):
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+        return float(np.median(times))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'MARKET_MASTER.csv')
+        write_synthetic(path, rows)
+        df = pd.read_csv(path)
+        model = training.build_model((SEQUENCE_LENGTH, len(FEATURE_COLS)))
+        scaler = MinMaxScaler().fit(df[FEATURE_COLS].to_numpy())
+        runner = forecaster.Forecaster(model, scaler)
+
+        def original():
+            runner.forecast(df[FEATURE_COLS].values[-SEQUENCE_LENGTH:], HORIZON)
+            frame = df[['Date', 'BTC_Open', 'BTC_High', 'BTC_Low', 'BTC_Close']].copy()
+            frame['time'] = pd.to_datetime(frame['Date']).apply(lambda x: x.timestamp())
+            frame.rename(columns={'BTC_Open': 'open', 'BTC_High': 'high', 'BTC_Low': 'low', 'BTC_Close': 'close'})[
+                ['time', 'open', 'high', 'low', 'close']].to_dict('records')
+
+        results = {'original rerun': median_ms(original, max(repeats // 4, 1))}
+        market_data._stores.pop(os.path.abspath(path), None)
+        dashboard = Dashboard(runner, path, chart_points=chart_points)
+        start = time.perf_counter()
+        dashboard.render_data()
+        results['cached: cold start'] = (time.perf_counter() - start) * 1000
+        results['cached: rerun'] = median_ms(dashboard.render_data, repeats)
+
+        appended = []
+        for _ in range(max(repeats // 4, 1)):
+            _append_row(path)
+            out = dashboard.render_data()
+            appended.append(sum(out['timings'].values()))
+        results['cached: after 1-row append'] = float(np.median(appended))
+        results['stages after append'] = out['timings']
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dashboard data layer tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Per-rerun cost: original page vs cached data layer')
+    p_bench.add_argument('--rows', type=int, nargs='+', default=[3000, 100_000])
+    p_bench.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        print(f"\n{rows:,} candles")
+        r = benchmark(rows, args.repeats)
+        stages = r.pop('stages after append')
+        for name, ms in r.items():
+            print(f"  {name:<28} {ms:>10.2f} ms")
+        print("  stages after append:        " + ', '.join(f"{k} {v:.2f}ms" for k, v in stages.items()))
@@ -1,101 +1,331 @@
-import yfinance as yf
 import pandas as pd
 import os
+import abc
+import random
+import tempfile
+import threading
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import metrics
+import ohlcv_store
 
 # CONFIGURATION
 # We will store data in a 'data' folder
 DATA_DIR = 'data'
 # Tickers to track (Yahoo Finance format)
 SYMBOLS = ['BTC-USD']
+# Every coin the API serves predictions for (see api_server.predict)
+TRACKED_SYMBOLS = ['BTC-USD', 'ETH-USD', 'BNB-USD', 'SOL-USD', 'ADA-USD',
+                   'XRP-USD', 'DOT-USD', 'DOGE-USD', 'AVAX-USD', 'POL-USD']
 START_DATE = "2012-01-01"
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0  # seconds, doubled on each retry
 
+# -----------------------------------------------------------------------------
+# DATA SOURCES
+# -----------------------------------------------------------------------------
+class RateLimiter:
+    """Spaces out calls so at most one starts every `min_interval` seconds"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DataSource(abc.ABC):
+    """
+    Interface for a daily OHLCV provider.
+
+    fetch() returns a DataFrame with columns Date (datetime), Open, High, Low,
+    Close, Volume for rows on or after `start`, oldest first. Each source owns
+    a RateLimiter shared by every worker that calls it.
+    """
+    name = 'base'
+    min_interval = 0.0
+
+    def __init__(self):
+        self.rate_limiter = RateLimiter(self.min_interval)
+
+    @abc.abstractmethod
+    def fetch(self, symbol, start):
+        """Rows on or after `start` (a YYYY-MM-DD string) for `symbol`"""
+
+
+class YahooSource(DataSource):
+    """Yahoo Finance via yfinance"""
+    name = 'yahoo'
+    min_interval = 0.5
+
+    def fetch(self, symbol, start):
+        import yfinance as yf
+
+        df = yf.download(symbol, start=start, progress=False)
+        if df.empty:
+            return df
+
+        df.reset_index(inplace=True)
+        # Flatten multi-index columns if they exist (common yfinance issue)
+        df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
+        # Keep only essential columns
+        return df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+
+
+class CsvSource(DataSource):
+    """Local fixture provider: reads <directory>/<SYMBOL>.csv (Date,Open,High,Low,Close,Volume)"""
+    name = 'csv'
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def fetch(self, symbol, start):
+        df = pd.read_csv(os.path.join(self.directory, f"{symbol}.csv"), parse_dates=['Date'])
+        return df[df['Date'] >= pd.Timestamp(start)].reset_index(drop=True)
+
+
+def fetch_with_retry(source, symbol, start, retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+    """Call source.fetch with rate limiting and exponential backoff; returns (df, attempts)"""
+    for attempt in range(1, retries + 2):
+        source.rate_limiter.wait()
+        try:
+            with metrics.upstream(source.name):
+                return source.fetch(symbol, start), attempt
+        except Exception as e:
+            if attempt > retries:
+                e.attempts = attempt
+                raise
+            delay = backoff * 2 ** (attempt - 1) * (1 + random.random() * 0.1)
+            print(f"⚠️ {symbol}: {source.name} fetch failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+# -----------------------------------------------------------------------------
+# STORAGE
+# -----------------------------------------------------------------------------
 def ensure_data_dir():
     """Creates the data folder if it doesn't exist."""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        print(f"📁 Created directory: {DATA_DIR}")
+    os.makedirs(DATA_DIR, exist_ok=True)
 
-def get_last_date(file_path):
+def symbol_prefix(symbol):
+    """Column prefix for a ticker, e.g. BTC-USD -> BTC"""
+    return symbol.split('-')[0]
+
+def csv_path(symbol):
+    return os.path.join(DATA_DIR, f"{symbol.replace('-', '_')}.csv")
+
+def write_csv_atomic(df, file_path):
+    """Write a whole CSV via a temp file + rename, so a failure never leaves a torn file"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(file_path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, file_path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def append_csv(df, file_path):
     """
-    Reads the CSV and returns the last date found.
+    Append rows in place, O(new rows). The file keeps its inode, so readers
+    tailing it (market_data) parse only the new rows. On failure it is
+    truncated back to its old size.
     """
-    if not os.path.exists(file_path):
-        return None
-    
+    data = df.to_csv(header=False, index=False).encode()
+    with open(file_path, 'ab', buffering=0) as f:
+        size = f.seek(0, os.SEEK_END)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[f.write(view):]
+            os.fsync(f.fileno())
+        except BaseException:
+            os.ftruncate(f.fileno(), size)
+            raise
+
+def csv_last_date(file_path):
+    """Date of the CSV's last row, read from the end of the file; None without rows"""
+    with open(file_path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 4096))
+        lines = [line for line in f.read().splitlines() if line.strip()]
     try:
-        df = pd.read_csv(file_path)
-        # Assuming the first column is 'Date'
-        last_date_str = df.iloc[-1]['Date']
-        # Convert to datetime object
-        return datetime.strptime(last_date_str, '%Y-%m-%d')
-    except Exception as e:
-        print(f"⚠️ Error reading {file_path}: {e}")
+        return datetime.strptime(lines[-1].split(b',')[0].decode(), '%Y-%m-%d')
+    except (IndexError, ValueError):
+        return None
+
+def get_last_date(file_path):
+    """
+    Returns the last date found in both the columnar store header and the
+    CSV (the earlier of the two), so neither misses rows; O(1) either way.
+    """
+    store = ohlcv_store.store_path(file_path)
+    dates = []
+    if ohlcv_store.exists(store):
+        dates.append(ohlcv_store.last_date(store))
+    if os.path.exists(file_path):
+        try:
+            dates.append(csv_last_date(file_path))
+        except Exception as e:
+            print(f"⚠️ Error reading {file_path}: {e}")
+            return None
+
+    if not dates or None in dates:
         return None
+    return min(dates)
+
+# -----------------------------------------------------------------------------
+# INGESTION
+# -----------------------------------------------------------------------------
+def update_dataset(symbol, source=None):
+    """
+    Bring one symbol's CSV and columnar store up to date.
+
+    Returns:
+        dict with symbol, status ('updated', 'up_to_date', 'no_data' or
+        'error'), rows ingested, attempts, seconds and error
+    """
+    source = source or YahooSource()
+    started = time.perf_counter()
+    result = {'symbol': symbol, 'source': source.name, 'status': 'error',
+              'rows': 0, 'attempts': 0, 'seconds': 0.0, 'error': None}
 
-def update_dataset(symbol):
-    ensure_data_dir()
-    file_path = os.path.join(DATA_DIR, f"{symbol.replace('-', '_')}.csv")
-    
-    # 1. Determine Start Date
-    last_date = get_last_date(file_path)
-    
-    if last_date is None:
-        # Scenario A: No data exists. Download from 2012.
-        print(f"🆕 {symbol}: No local data found. Downloading from {START_DATE}...")
-        download_start = START_DATE
-        mode = 'w' # Write mode
-        header = True
-    else:
-        # Scenario B: Data exists. Check if we need to update.
-        today = datetime.now()
-        if last_date.date() >= (today - timedelta(days=1)).date():
-            print(f"✅ {symbol}: Data is already up to date ({last_date.date()}).")
-            return
-        
-        # Start downloading from the NEXT day
-        next_day = last_date + timedelta(days=1)
-        download_start = next_day.strftime('%Y-%m-%d')
-        print(f"🔄 {symbol}: Updating continuous data from {download_start}...")
-        mode = 'a' # Append mode
-        header = False # Don't repeat headers in CSV
-
-    # 2. Download Data
     try:
-        # Yahoo Finance download
-        df = yf.download(symbol, start=download_start, progress=False)
-        
+        ensure_data_dir()
+        file_path = csv_path(symbol)
+        store = ohlcv_store.store_path(file_path)
+
+        # Keep the CSV and the columnar store in step
+        if os.path.exists(file_path) and not ohlcv_store.exists(store):
+            rows = ohlcv_store.append_dataframe(store, pd.read_csv(file_path))
+            print(f"📦 {symbol}: Built columnar store from CSV ({rows} rows).")
+        elif ohlcv_store.exists(store) and not os.path.exists(file_path):
+            rows = ohlcv_store.export_csv(store, file_path)
+            print(f"📄 {symbol}: Restored CSV from columnar store ({rows} rows).")
+        elif os.path.exists(file_path) and (csv_last_date(file_path) or datetime.min) > \
+                (ohlcv_store.last_date(store) or datetime.min):
+            # An earlier run wrote the CSV but failed before the store; the store skips rows it has
+            rows = ohlcv_store.append_dataframe(store, pd.read_csv(file_path))
+            print(f"📦 {symbol}: Caught the columnar store up with the CSV ({rows} rows).")
+
+        # 1. Determine Start Date
+        last_date = get_last_date(file_path)
+
+        if last_date is None:
+            # Scenario A: No data exists. Download from 2012.
+            print(f"🆕 {symbol}: No local data found. Downloading from {START_DATE}...")
+            download_start = START_DATE
+            append = False
+        else:
+            # Scenario B: Data exists. Check if we need to update.
+            today = datetime.now()
+            if last_date.date() >= (today - timedelta(days=1)).date():
+                print(f"✅ {symbol}: Data is already up to date ({last_date.date()}).")
+                result['status'] = 'up_to_date'
+                return result
+
+            # Start downloading from the NEXT day
+            next_day = last_date + timedelta(days=1)
+            download_start = next_day.strftime('%Y-%m-%d')
+            print(f"🔄 {symbol}: Updating continuous data from {download_start}...")
+            append = True
+
+        # 2. Download Data
+        df, result['attempts'] = fetch_with_retry(source, symbol, download_start)
+
         if df.empty:
             print(f"⚠️ {symbol}: No new data found.")
-            return
+            result['status'] = 'no_data'
+            return result
 
         # 3. Clean Data
-        df.reset_index(inplace=True)
-        # Keep only essential columns
-        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
-        
-        # Flatten multi-index columns if they exist (common yfinance issue)
-        df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
-        
-        # Rename columns with BTC prefix
-        df.columns = ['Date', 'BTC_Open', 'BTC_High', 'BTC_Low', 'BTC_Close', 'BTC_Volume']
-        
+        # Rename columns with the coin prefix (BTC_Open, ETH_Open, ...)
+        prefix = symbol_prefix(symbol)
+        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].copy()
+        df.columns = ['Date'] + [f"{prefix}_{c}" for c in ['Open', 'High', 'Low', 'Close', 'Volume']]
+
         # formatting date to standard string
-        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
 
-        # 4. Save to CSV
-        df.to_csv(file_path, mode=mode, header=header, index=False)
-        
-        if mode == 'w':
-            print(f"✅ {symbol}: Saved {len(df)} rows (Full History).")
+        # 4. Save to the CSV, then the columnar store. Its header is the
+        # commit point: a run that fails in between is caught up next time.
+        if append:
+            append_csv(df, file_path)
+            ohlcv_store.append_dataframe(store, df)
         else:
+            # Fresh download replaces whatever store was there, without
+            # truncating files that running servers have memory-mapped
+            write_csv_atomic(df, file_path)
+            ohlcv_store.replace_dataframe(store, df)
+
+        if append:
             print(f"✅ {symbol}: Appended {len(df)} new rows.")
-            
+        else:
+            print(f"✅ {symbol}: Saved {len(df)} rows (Full History).")
+        result['status'] = 'updated'
+        result['rows'] = len(df)
+        return result
+
     except Exception as e:
         print(f"❌ Error updating {symbol}: {e}")
+        result['error'] = str(e)
+        result['attempts'] = getattr(e, 'attempts', result['attempts'])
+        return result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+
+def update_all(symbols, source=None, max_workers=MAX_WORKERS):
+    """
+    Ingest several symbols concurrently on a bounded thread pool.
+
+    Each symbol writes only its own files, so one failure never touches
+    another symbol's data. Returns the per-symbol results in input order.
+    """
+    source = source or YahooSource()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda sym: update_dataset(sym, source), symbols))
+
+def print_report(results, wall_time):
+    print(f"{'Symbol':<10} {'Status':<11} {'Rows':>7} {'Tries':>5} {'Latency':>9}")
+    for r in results:
+        print(f"{r['symbol']:<10} {r['status']:<11} {r['rows']:>7} {r['attempts']:>5} {r['seconds']:>8.2f}s")
+    total_rows = sum(r['rows'] for r in results)
+    print(f"Ingested {total_rows} rows for {len(results)} symbols in {wall_time:.2f}s")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and update daily OHLCV data")
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS, help='Yahoo Finance tickers')
+    parser.add_argument('--all', action='store_true', help='Track every coin served by the API')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--fixtures', help='Read from <dir>/<SYMBOL>.csv instead of Yahoo Finance')
+    parser.add_argument('--update-model', action='store_true',
+                        help='Fine-tune and publish the market model when its data got new rows (online_update.py)')
+    args = parser.parse_args()
+
+    symbols = TRACKED_SYMBOLS if args.all else args.symbols
+    source = CsvSource(args.fixtures) if args.fixtures else YahooSource()
+
     print("--- 🚀 STARTING DATA ENGINE ---")
-    for sym in SYMBOLS:
-        update_dataset(sym)
-    print("--- ✅ DATA COLLECTION COMPLETE ---")
\ No newline at end of file
+    start = time.perf_counter()
+    results = update_all(symbols, source, max_workers=args.workers)
+    print_report(results, time.perf_counter() - start)
+    print("--- ✅ DATA COLLECTION COMPLETE ---")
+
+    if args.update_model:
+        import online_update
+        import training
+        if any(r['status'] == 'updated' and csv_path(r['symbol']) == training.DATA_PATH for r in results):
+            update = online_update.update()
+            print(f"🧠 Model update: {update['status']} (version {update['version']})")
+        else:
+            print("🧠 Model update skipped: no new rows for the model's data")
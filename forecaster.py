@@ -0,0 +1,158 @@
+"""
+Multi-Step Forecaster
+Autoregressive price rollout for the LSTM models.
+
+Each step feeds the model's prediction back in as the next day's target
+feature (the other features carry the last day forward). The model is called
+directly through one compiled tf.function instead of model.predict, and the
+window slides through a preallocated ring buffer instead of being rebuilt
+with np.append. Any number of windows (scenarios or symbols) roll out
+together as one batch.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import inference
+import market_data
+import model_registry
+
+
+MODEL_PATH = 'models/market_model.h5'
+SCALER_PATH = 'models/market_scaler.pkl'
+DATA_PATH = 'data/BTC_USD.csv'
+FEATURE_COLS = ['BTC_Close', 'BTC_Volume']
+BENCH_HORIZONS = [7, 30, 90]
+
+
+def compile_step(model):
+    """One traced inference graph for every batch size (NumPy models run as is)"""
+    if isinstance(model, inference.NumpyModel):
+        return model
+    import tensorflow as tf
+
+    _, length, features = model.input_shape
+    return tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec((None, length, features), tf.float32)],
+    )
+
+
+class Forecaster:
+    """
+    Rolls a model forward `horizon` steps.
+
+    `target` is the feature index the model predicts (the close price);
+    `scaler` is the fitted scaler for the model's input features. `step`
+    replaces the compiled model call, e.g. with a MicroBatcher around it.
+    """
+
+    def __init__(self, model, scaler, target=0, step=None):
+        self.model = model
+        self.scaler = scaler
+        self.target = target
+        _, self.sequence_length, self.n_features = model.input_shape
+        self._step = step or compile_step(model)
+
+    def rollout(self, windows, horizon):
+        """
+        Scaled windows (batch, sequence_length, features) -> scaled
+        predictions (batch, horizon)
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if windows.ndim == 2:
+            windows = windows[np.newaxis]
+        batch, L, F = windows.shape
+
+        # Every row is kept twice, so ring[:, pos:pos + L] is always the
+        # current window in order and each step writes just one row
+        ring = np.empty((batch, 2 * L, F), dtype=np.float32)
+        ring[:, :L] = windows
+        ring[:, L:] = windows
+        out = np.empty((batch, horizon), dtype=np.float32)
+
+        for step in range(horizon):
+            pos = step % L
+            pred = np.asarray(self._step(ring[:, pos:pos + L])).reshape(batch)
+            out[:, step] = pred
+
+            row = ring[:, pos + L - 1].copy()
+            row[:, self.target] = pred
+            ring[:, pos] = row
+            ring[:, pos + L] = row
+        return out
+
+    def forecast(self, windows, horizon):
+        """
+        Raw feature windows (sequence_length, features) or
+        (batch, sequence_length, features) -> prices (batch, horizon)
+        """
+        windows = np.asarray(windows, dtype=np.float64)
+        if windows.ndim == 2:
+            windows = windows[np.newaxis]
+        batch, L, F = windows.shape
+
+        scaled = self.scaler.transform(windows.reshape(-1, F)).reshape(batch, L, F)
+        predictions = self.rollout(scaled, horizon)
+
+        # One inverse transform for every step of every window
+        dummy = np.zeros((predictions.size, F))
+        dummy[:, self.target] = predictions.ravel()
+        return self.scaler.inverse_transform(dummy)[:, self.target].reshape(batch, horizon)
+
+
+def naive_rollout(model, scaler, window, horizon):
+    """Reference loop: model.predict, inverse_transform and np.append per step"""
+    F = window.shape[1]
+    current_batch = scaler.transform(window).reshape(1, len(window), F)
+    prices = []
+    for _ in range(horizon):
+        next_pred = model.predict(current_batch, verbose=0)
+
+        dummy_row = np.zeros((1, F))
+        dummy_row[0, 0] = next_pred[0, 0]
+        prices.append(float(scaler.inverse_transform(dummy_row)[0][0]))
+
+        new_row = current_batch[0, -1, :].copy()
+        new_row[0] = next_pred[0, 0]
+        current_batch = np.append(current_batch[:, 1:, :], new_row.reshape(1, 1, F), axis=1)
+    return np.array(prices)
+
+
+def benchmark(horizons=BENCH_HORIZONS, batch=32, repeats=3):
+    """Time the per-step predict loop against the compiled rollout"""
+    model = model_registry.get_model(MODEL_PATH)
+    scaler = model_registry.get_scaler(SCALER_PATH)
+    forecaster = Forecaster(model, scaler)
+    window = market_data.stack(
+        market_data.get_store(DATA_PATH).tail(forecaster.sequence_length), FEATURE_COLS
+    )
+    forecaster.forecast(window, 1)  # trace once
+
+    def best(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    print(f"{'Horizon':>7} {'predict loop':>13} {'rollout':>9} {'speedup':>8} "
+          f"{'batch ' + str(batch):>10} {'per path':>9} {'max diff':>9}")
+    for horizon in horizons:
+        naive_s, naive = best(lambda: naive_rollout(model, scaler, window, horizon))
+        fast_s, fast = best(lambda: forecaster.forecast(window, horizon)[0])
+        batch_s, _ = best(lambda: forecaster.forecast(np.repeat(window[np.newaxis], batch, axis=0), horizon))
+        diff = float(np.max(np.abs(naive - fast) / naive))
+        print(f"{horizon:>7} {naive_s * 1000:>11.1f}ms {fast_s * 1000:>7.1f}ms {naive_s / fast_s:>7.1f}x "
+              f"{batch_s * 1000:>8.1f}ms {batch_s / batch * 1000:>7.2f}ms {diff:>9.1e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark multi-step forecasting")
+    parser.add_argument('--horizons', type=int, nargs='+', default=BENCH_HORIZONS)
+    parser.add_argument('--batch', type=int, default=32, help='Windows rolled out together')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.horizons, args.batch, args.repeats)
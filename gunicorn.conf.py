@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for the production API (see wsgi.py)
+
+Every setting can be overridden from the environment, e.g.
+WEB_CONCURRENCY=4 THREADS=16 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads per worker: concurrent requests in one worker share its micro-batcher
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 16))
+preload_app = True
+timeout = 120
+keepalive = 5
+
+
+def post_fork(server, worker):
+    import api_server
+    api_server.start_worker()
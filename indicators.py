@@ -0,0 +1,462 @@
+"""
+Indicator Engine
+Technical indicators (EMA, MACD, RSI, ATR, volatility, VWAP, volume ratio)
+over the OHLCV store behind get_latest_data.
+
+The first call computes every indicator vectorized over the full history and
+keeps the rolling state each one needs (last EMA values, Wilder averages,
+the last `WINDOW` inputs of the rolling sums). Rows appended to the store
+afterwards are folded in one at a time in O(1), so history is never
+recomputed unless the store is rewritten.
+
+    python indicators.py bench   # full recompute vs incremental update
+"""
+import argparse
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import market_data
+
+
+PREFIX = 'BTC'
+EMA_FAST = 12
+EMA_SLOW = 26
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+WINDOW = 20  # rolling volatility / VWAP / volume ratio
+
+NAMES = [
+    f'ema_{EMA_FAST}', f'ema_{EMA_SLOW}', 'macd', f'rsi_{RSI_PERIOD}', f'atr_{ATR_PERIOD}',
+    f'volatility_{WINDOW}', f'vwap_{WINDOW}', f'volume_ratio_{WINDOW}',
+]
+
+
+# -----------------------------------------------------------------------------
+# VECTORIZED (full history)
+# -----------------------------------------------------------------------------
+def _smooth(x, alpha, seed, start):
+    """y[start] = seed, then y[t] = y[t-1] + alpha * (x[t] - y[t-1]); NaN before `start`"""
+    from scipy.signal import lfilter
+    y = np.full(len(x), np.nan)
+    if start < len(x):
+        y[start] = seed
+        y[start + 1:] = lfilter([alpha], [1.0, alpha - 1.0], x[start + 1:], zi=[(1.0 - alpha) * seed])[0]
+    return y
+
+
+def _ema(x, period):
+    return _smooth(x, 2.0 / (period + 1), x[0], 0) if len(x) else np.empty(0)
+
+
+def _wilder(x, period):
+    """Wilder's average: the mean of the first `period` values, then alpha = 1/period"""
+    if len(x) < period:
+        return np.full(len(x), np.nan)
+    return _smooth(x, 1.0 / period, x[:period].mean(), period - 1)
+
+
+def _rolling_sum(x, window):
+    """Sum of the last `window` values, NaN until the window is full"""
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = np.convolve(x, np.ones(window), 'valid')
+    return out
+
+
+def _shift(x):
+    """Series of length n-1 aligned to rows 1..n-1 -> length n with a leading NaN"""
+    return np.concatenate([[np.nan], x])
+
+
+def compute(high, low, close, volume):
+    """
+    Every indicator over the full history as {name: array}, NaN during
+    warm-up, plus the rolling state needed to continue incrementally
+    """
+    high, low, close, volume = (np.asarray(c, dtype=np.float64) for c in (high, low, close, volume))
+    prev_close = close[:-1]
+
+    ema_fast, ema_slow = _ema(close, EMA_FAST), _ema(close, EMA_SLOW)
+
+    change = np.diff(close)
+    gains, losses = np.maximum(change, 0.0), np.maximum(-change, 0.0)
+    avg_gain, avg_loss = _wilder(gains, RSI_PERIOD), _wilder(losses, RSI_PERIOD)
+
+    tr = high - low
+    tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+    atr = _wilder(tr, ATR_PERIOD)
+
+    returns = np.log(close[1:] / prev_close)
+    pv = (high + low + close) / 3.0 * volume
+    volume_sum = _rolling_sum(volume, WINDOW)
+    volume_sum[volume_sum == 0] = np.nan
+
+    values = {
+        f'ema_{EMA_FAST}': ema_fast,
+        f'ema_{EMA_SLOW}': ema_slow,
+        'macd': ema_fast - ema_slow,
+        f'rsi_{RSI_PERIOD}': _shift(_rsi(avg_gain, avg_loss)),
+        f'atr_{ATR_PERIOD}': atr,
+        f'volatility_{WINDOW}': _shift(_std(_rolling_sum(returns, WINDOW), _rolling_sum(returns ** 2, WINDOW))),
+        f'vwap_{WINDOW}': _rolling_sum(pv, WINDOW) / volume_sum,
+        f'volume_ratio_{WINDOW}': volume / (volume_sum / WINDOW),
+    }
+
+    state = IndicatorState()
+    if len(close):
+        state.n = len(close)
+        state.prev_close = close[-1]
+        state.ema_fast.seed(ema_fast[-1])
+        state.ema_slow.seed(ema_slow[-1])
+        state.avg_gain.seed(gains, avg_gain)
+        state.avg_loss.seed(losses, avg_loss)
+        state.atr.seed(tr, atr)
+        state.returns.seed(returns)
+        state.returns_sq.seed(returns ** 2)
+        state.pv.seed(pv)
+        state.volume.seed(volume)
+    return values, state
+
+
+def _rsi(avg_gain, avg_loss):
+    total = avg_gain + avg_loss
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = 100.0 * avg_gain / total
+    rsi[total == 0] = 50.0  # flat market
+    return rsi
+
+
+def _std(s1, s2):
+    """Sample std of a window from its sum and sum of squares"""
+    return np.sqrt(np.maximum(s2 - s1 * s1 / WINDOW, 0.0) / (WINDOW - 1))
+
+
+# -----------------------------------------------------------------------------
+# INCREMENTAL (one candle at a time)
+# -----------------------------------------------------------------------------
+class _Ema:
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+
+    def seed(self, value):
+        self.value = float(value)
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class _Wilder:
+    """Mean of the first `period` inputs, then exponential with alpha = 1/period"""
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.total = 0.0
+        self.value = math.nan
+
+    def seed(self, inputs, values):
+        self.count = len(inputs)
+        if self.count < self.period:
+            self.total = float(np.sum(inputs))
+        else:
+            self.value = float(values[-1])
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+        elif self.count == self.period:
+            self.value = (self.total + x) / self.period
+        else:
+            self.value += (x - self.value) / self.period
+        return self.value
+
+
+class _RollingSum:
+    """Sum of the last `window` inputs; re-summed once per window to stop float drift"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.updates = 0
+
+    def seed(self, inputs):
+        self.values.extend(float(x) for x in inputs[-self.window:])
+        self.total = math.fsum(self.values)
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.total = math.fsum(self.values)
+        return self.total if len(self.values) == self.window else math.nan
+
+
+class IndicatorState:
+    """Everything needed to extend the indicators by one candle"""
+
+    def __init__(self):
+        self.n = 0
+        self.prev_close = None
+        self.ema_fast = _Ema(2.0 / (EMA_FAST + 1))
+        self.ema_slow = _Ema(2.0 / (EMA_SLOW + 1))
+        self.avg_gain = _Wilder(RSI_PERIOD)
+        self.avg_loss = _Wilder(RSI_PERIOD)
+        self.atr = _Wilder(ATR_PERIOD)
+        self.returns = _RollingSum(WINDOW)
+        self.returns_sq = _RollingSum(WINDOW)
+        self.pv = _RollingSum(WINDOW)
+        self.volume = _RollingSum(WINDOW)
+
+    def update(self, high, low, close, volume):
+        """Indicators for the next candle as {name: float}"""
+        ema_fast, ema_slow = self.ema_fast.update(close), self.ema_slow.update(close)
+
+        rsi = volatility = math.nan
+        tr = high - low
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            avg_gain, avg_loss = self.avg_gain.update(max(change, 0.0)), self.avg_loss.update(max(-change, 0.0))
+            total = avg_gain + avg_loss
+            rsi = 100.0 * avg_gain / total if total > 0 else (50.0 if total == 0 else math.nan)
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+            r = math.log(close / self.prev_close)
+            s1, s2 = self.returns.update(r), self.returns_sq.update(r * r)
+            volatility = math.sqrt(max(s2 - s1 * s1 / WINDOW, 0.0) / (WINDOW - 1))
+        atr = self.atr.update(tr)
+        pv_sum = self.pv.update((high + low + close) / 3.0 * volume)
+        volume_sum = self.volume.update(volume) or math.nan
+
+        self.prev_close = close
+        self.n += 1
+        return {
+            f'ema_{EMA_FAST}': ema_fast,
+            f'ema_{EMA_SLOW}': ema_slow,
+            'macd': ema_fast - ema_slow,
+            f'rsi_{RSI_PERIOD}': rsi,
+            f'atr_{ATR_PERIOD}': atr,
+            f'volatility_{WINDOW}': volatility,
+            f'vwap_{WINDOW}': pv_sum / volume_sum,
+            f'volume_ratio_{WINDOW}': volume / (volume_sum / WINDOW),
+        }
+
+
+# -----------------------------------------------------------------------------
+# ENGINE (bound to a market data store)
+# -----------------------------------------------------------------------------
+class IndicatorEngine:
+    """Indicator columns aligned row-for-row with a market_data store"""
+
+    def __init__(self, store, prefix=PREFIX):
+        self.store = store
+        self.inputs = [f'{prefix}_{c}' for c in ('High', 'Low', 'Close', 'Volume')]
+        self.state = None
+        self._cols = {}
+        self._n = 0
+        self._last_close = None
+        self._lock = threading.Lock()
+        self.full_computes = 0
+        self.incremental_rows = 0
+
+    def __len__(self):
+        return self._n
+
+    def refresh(self):
+        """Extend the indicators over rows appended to the store since the last call"""
+        n = len(self.store)
+        if n == self._n and not self._rewritten():
+            return self
+        with self._lock:
+            n = len(self.store)
+            if self.state is None or n < self._n or self._rewritten():
+                self._compute_full()
+            elif n > self._n:
+                self._extend(n)
+        return self
+
+    def _rewritten(self):
+        # A republished or re-sorted store changes the row we last consumed
+        close = self.store.column(self.inputs[2])
+        return self._n > 0 and (len(close) < self._n or close[self._n - 1] != self._last_close)
+
+    def _compute_full(self):
+        values, self.state = compute(*(self.store.column(c) for c in self.inputs))
+        self._n = len(self.store)
+        self._allocate(max(market_data.MIN_CAPACITY, 2 * self._n))
+        for name in NAMES:
+            self._cols[name][:self._n] = values[name]
+        self._last_close = self.store.column(self.inputs[2])[self._n - 1] if self._n else None
+        self.full_computes += 1
+
+    def _extend(self, n):
+        if n > len(self._cols[NAMES[0]]):
+            self._allocate(2 * n)
+        high, low, close, volume = (self.store.column(c) for c in self.inputs)
+        for i in range(self._n, n):
+            row = self.state.update(float(high[i]), float(low[i]), float(close[i]), float(volume[i]))
+            for name in NAMES:
+                self._cols[name][i] = row[name]
+        self.incremental_rows += n - self._n
+        self._n = n
+        self._last_close = close[n - 1]
+
+    def _allocate(self, capacity):
+        cols = {}
+        for name in NAMES:
+            col = np.full(capacity, np.nan)
+            if name in self._cols:
+                col[:self._n] = self._cols[name][:self._n]
+            cols[name] = col
+        self._cols = cols
+
+    def column(self, name):
+        """Full history of one indicator, or of a store column, as a view"""
+        if name in self._cols:
+            return self._cols[name][:self._n]
+        return self.store.column(name)[:self._n]
+
+    def tail(self, n, names=None):
+        """Last `n` rows as a dict of Date plus indicator views"""
+        n = min(n, self._n)
+        view = {market_data.DATE_COL: self.store.tail(n)[market_data.DATE_COL]}
+        for name in names or NAMES:
+            view[name] = self._cols[name][self._n - n:self._n]
+        return view
+
+    def latest(self):
+        return {name: float(self._cols[name][self._n - 1]) for name in NAMES} if self._n else {}
+
+    def stats(self):
+        return {
+            'rows': self._n,
+            'full_computes': self.full_computes,
+            'incremental_rows': self.incremental_rows,
+        }
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(path, prefix=PREFIX):
+    """Shared engine for the store at `path`, extended with any newly appended rows"""
+    store = market_data.get_store(path)
+    key = (id(store), prefix)
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.setdefault(key, IndicatorEngine(store, prefix))
+    return engine.refresh()
+
+
+def drivers(engine):
+    """Plain-language summary of the latest candle for the prediction panel"""
+    latest = engine.latest()
+    if not latest or math.isnan(latest[f'volatility_{WINDOW}']):
+        return {}
+    close = float(engine.column(engine.inputs[2])[-1])
+    volume_ratio = latest[f'volume_ratio_{WINDOW}']
+    # Annualised daily volatility, in percent
+    volatility = latest[f'volatility_{WINDOW}'] * math.sqrt(365) * 100
+    trend = abs(latest['macd']) / close * 100
+    return {
+        'volume': 'High' if volume_ratio > 1.5 else 'Low' if volume_ratio < 0.67 else 'Normal',
+        'trend': 'Bullish' if latest['macd'] > 0 else 'Bearish',
+        'trend_strength': 'Strong' if trend > 2 else 'Moderate' if trend > 0.5 else 'Weak',
+        'volatility': 'High' if volatility > 80 else 'Low' if volatility < 40 else 'Moderate',
+        'rsi': 'Overbought' if latest[f'rsi_{RSI_PERIOD}'] > 70
+               else 'Oversold' if latest[f'rsi_{RSI_PERIOD}'] < 30 else 'Neutral',
+    }
+
+
+def feature_matrix(path, columns, prefix=PREFIX, store=None):
+    """
+    (dates, rows x len(columns)) training features: store columns and
+    indicator names mixed freely, with the indicator warm-up rows dropped.
+    `store` overrides the data file at `path` (e.g. an intraday rollup).
+    """
+    engine = get_engine(path, prefix) if store is None else IndicatorEngine(store, prefix).refresh()
+    matrix = np.column_stack([engine.column(c) for c in columns])
+    first = int(np.argmax(~np.isnan(matrix).any(axis=1))) if len(matrix) else 0
+    return engine.store.column(market_data.DATE_COL)[first:], matrix[first:]
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def synthetic_candles(n, seed=0):
+    """Random-walk daily OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    spread = np.abs(rng.normal(0, 0.02, n)) * close
+    return close + spread, close - spread, close, rng.uniform(1e9, 5e9, n)
+
+
+def benchmark(rows=(1_000, 100_000, 1_000_000), updates=1000, repeats=3):
+    """
+    Per-candle cost of recomputing every indicator over the full history
+    versus folding one new candle into the rolling state
+    """
+    results = []
+    for n in rows:
+        high, low, close, volume = synthetic_candles(n + updates)
+        history = [c[:n] for c in (high, low, close, volume)]
+
+        full = min(_timed(lambda: compute(*history)) for _ in range(repeats))
+
+        _, state = compute(*history)
+        start = time.perf_counter()
+        for i in range(n, n + updates):
+            last = state.update(high[i], low[i], close[i], volume[i])
+        incremental = (time.perf_counter() - start) / updates
+
+        # The incremental path must land where a full recompute does
+        reference, _ = compute(high, low, close, volume)
+        error = max(abs(last[k] - reference[k][-1]) / max(abs(reference[k][-1]), 1e-12) for k in NAMES)
+        results.append({
+            'rows': n,
+            'full_ms': full * 1000,
+            'incremental_us': incremental * 1e6,
+            'speedup': full / incremental,
+            'max_rel_error': error,
+        })
+    return results
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Indicator engine tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Full recompute vs incremental update per new candle')
+    p_bench.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    p_bench.add_argument('--updates', type=int, default=1000)
+    p_show = sub.add_parser('show', help='Latest indicator values for a data file')
+    p_show.add_argument('--data', default='data/BTC_USD.csv')
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        print(f"{'Rows':>9} {'Full recompute':>15} {'Incremental':>12} {'Speedup':>9} {'Max rel err':>12}")
+        for r in benchmark(args.rows, args.updates):
+            print(f"{r['rows']:>9} {r['full_ms']:>13.2f}ms {r['incremental_us']:>10.2f}us "
+                  f"{r['speedup']:>8.0f}x {r['max_rel_error']:>12.1e}")
+    else:
+        engine = get_engine(args.data)
+        print(f"📈 {len(engine)} rows, latest {engine.store.last_date()}")
+        for name, value in engine.latest().items():
+            print(f"  {name:<18} {value:,.4f}")
+        print(f"🧭 Drivers: {drivers(engine)}")
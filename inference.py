@@ -0,0 +1,285 @@
+"""
+Inference Backends
+A TensorFlow-free forward pass for the trained LSTM models.
+
+`export` reads a Keras .h5 model once and writes its weights and layer
+structure to a .npz file next to it. `NumpyModel` runs that file with plain
+NumPy: no TensorFlow import, no graph building, and the input projection of
+each LSTM layer is one matmul over every timestep. It exposes the parts of
+the Keras API the rest of the code uses (input_shape, predict, __call__).
+
+The backend is picked with the INFERENCE_BACKEND environment variable
+('keras' or 'numpy'); see model_registry.get_model.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+MODEL_PATH = 'models/market_model.h5'
+TOLERANCE = 1e-4  # max abs difference from Keras, in scaled units
+PREDICT_BATCH_SIZE = 1024
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+}
+
+
+def export_path(model_path):
+    """models/market_model.h5 -> models/market_model.npz"""
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+def _layer_spec(layer):
+    """Describe one Keras layer, or raise ValueError if it cannot be exported"""
+    kind = type(layer).__name__
+    config = layer.get_config()
+    if kind in ('InputLayer', 'Dropout'):
+        return None  # no-ops at inference time
+    if kind == 'LSTM':
+        if config.get('go_backwards') or config.get('stateful') or not config.get('use_bias', True):
+            raise ValueError(f"Unsupported LSTM options in layer {layer.name}")
+        spec = {'type': 'lstm', 'units': config['units'],
+                'activation': config['activation'],
+                'recurrent_activation': config['recurrent_activation'],
+                'return_sequences': config['return_sequences']}
+    elif kind == 'Dense':
+        spec = {'type': 'dense', 'activation': config['activation'],
+                'use_bias': config.get('use_bias', True)}
+    else:
+        raise ValueError(f"Unsupported layer type {kind} ({layer.name})")
+
+    for name in ('activation', 'recurrent_activation'):
+        if name in spec and spec[name] not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {spec[name]} in layer {layer.name}")
+    return spec
+
+
+def export(model_path=MODEL_PATH, out_path=None):
+    """Write the Keras model's weights and structure to a .npz; returns its path"""
+    from tensorflow.keras.models import load_model
+    from model_registry import _file_hash
+
+    out_path = out_path or export_path(model_path)
+    model = load_model(model_path, compile=False)
+
+    layers, arrays = [], {}
+    for layer in model.layers:
+        spec = _layer_spec(layer)
+        if spec is None:
+            continue
+        for j, weight in enumerate(layer.get_weights()):
+            arrays[f'l{len(layers)}_{j}'] = np.asarray(weight, dtype=np.float32)
+        layers.append(spec)
+
+    meta = {
+        'input_shape': list(model.input_shape[1:]),
+        'layers': layers,
+        'source_version': _file_hash(model_path),
+    }
+    tmp = out_path + '.tmp.npz'
+    np.savez(tmp, spec=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+class NumpyModel:
+    """Forward pass of an exported model with NumPy only"""
+
+    def __init__(self, meta, weights):
+        self.meta = meta
+        self.layers = list(zip(meta['layers'], weights))
+        self.input_shape = (None, *meta['input_shape'])
+        self.source_version = meta['source_version']
+
+    def get_weights(self):
+        return [w for _, ws in self.layers for w in ws]
+
+    def __call__(self, x, training=False):
+        x = np.asarray(x, dtype=np.float32)
+        for spec, weights in self.layers:
+            if spec['type'] == 'lstm':
+                x = self._lstm(x, spec, *weights)
+            else:
+                x = x @ weights[0]
+                if spec['use_bias']:
+                    x = x + weights[1]
+                x = ACTIVATIONS[spec['activation']](x)
+        return x
+
+    def predict(self, x, batch_size=PREDICT_BATCH_SIZE, verbose=0):
+        """Same contract as keras Model.predict: batched, returns (batch, outputs)"""
+        batch_size = batch_size or PREDICT_BATCH_SIZE
+        if len(x) <= batch_size:
+            return self(x)
+        return np.concatenate([self(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+    @staticmethod
+    def _lstm(x, spec, kernel, recurrent_kernel, bias):
+        units = spec['units']
+        act = ACTIVATIONS[spec['activation']]
+        rec_act = ACTIVATIONS[spec['recurrent_activation']]
+        batch, steps, _ = x.shape
+
+        # Input projection for every timestep at once; only h @ U stays in the loop.
+        # Gates are stored (input, forget, output, cell) so one call covers the
+        # three recurrent activations
+        z_in = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        out = np.empty((batch, steps, units), dtype=np.float32) if spec['return_sequences'] else None
+        gates = 3 * units
+
+        for t in range(steps):
+            z = z_in[:, t] + h @ recurrent_kernel
+            ifo = rec_act(z[:, :gates])
+            c = ifo[:, units:2 * units] * c + ifo[:, :units] * act(z[:, gates:])
+            h = ifo[:, 2 * units:] * act(c)
+            if out is not None:
+                out[:, t] = h
+        return out if out is not None else h
+
+
+def _reorder_gates(w, units):
+    """Keras LSTM gate order (input, forget, cell, output) -> (input, forget, output, cell)"""
+    i, f, c, o = (w[..., k * units:(k + 1) * units] for k in range(4))
+    return np.ascontiguousarray(np.concatenate([i, f, o, c], axis=-1))
+
+
+def load(npz_path):
+    with np.load(npz_path) as data:
+        meta = json.loads(str(data['spec']))
+        weights = []
+        for i in range(len(meta['layers'])):
+            layer = []
+            while f'l{i}_{len(layer)}' in data.files:
+                layer.append(data[f'l{i}_{len(layer)}'])
+            if meta['layers'][i]['type'] == 'lstm':
+                layer = [_reorder_gates(w, meta['layers'][i]['units']) for w in layer]
+            weights.append(layer)
+    return NumpyModel(meta, weights)
+
+
+def load_exported(model_path):
+    """
+    NumpyModel for a Keras model path, exporting it first when the .npz is
+    missing or was exported from a different version of the model
+    """
+    from model_registry import _file_hash
+
+    npz_path = export_path(model_path)
+    if os.path.exists(npz_path):
+        model = load(npz_path)
+        if model.source_version == _file_hash(model_path):
+            return model
+        print(f"🔄 {os.path.basename(npz_path)} is stale, re-exporting...")
+    export(model_path, npz_path)
+    return load(npz_path)
+
+
+def verify(model_path=MODEL_PATH, samples=512, seed=0):
+    """Max abs difference between Keras and NumPy outputs on random windows"""
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(model_path, compile=False)
+    numpy_model = load_exported(model_path)
+    x = np.random.default_rng(seed).random((samples, *numpy_model.input_shape[1:]), dtype=np.float32)
+    expected = keras_model.predict(x, batch_size=256, verbose=0)
+    return float(np.max(np.abs(expected - numpy_model.predict(x))))
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+_COLD_START = """
+import time, numpy as np
+start = time.perf_counter()
+import model_registry
+model = model_registry.get_model({path!r}, backend={backend!r})
+model(np.zeros((1, *model.input_shape[1:]), dtype=np.float32), training=False)
+print(time.perf_counter() - start)
+"""
+
+
+def _cold_start(model_path, backend):
+    """Import + load + first prediction in a fresh interpreter"""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    out = subprocess.run(
+        [sys.executable, '-c', _COLD_START.format(path=model_path, backend=backend)],
+        capture_output=True, text=True, check=True, env=env,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark(model_path=MODEL_PATH, calls=200, batch=4096):
+    """Cold start, single-sample latency and batch throughput for each backend"""
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(model_path, compile=False)
+    numpy_model = load_exported(model_path)
+    _, length, features = keras_model.input_shape
+    keras_call = tf.function(
+        lambda x: keras_model(x, training=False),
+        input_signature=[tf.TensorSpec((None, length, features), tf.float32)],
+    )
+    runners = {
+        'keras': (lambda x: np.asarray(keras_call(x)), keras_model.predict),
+        'numpy': (numpy_model, numpy_model.predict),
+    }
+
+    rng = np.random.default_rng(0)
+    single = rng.random((1, length, features), dtype=np.float32)
+    windows = rng.random((batch, length, features), dtype=np.float32)
+    print(f"Max abs diff numpy vs keras: {verify(model_path):.2e} (tolerance {TOLERANCE:.0e})")
+    print(f"{'Backend':<8} {'cold start':>10} {'p50':>8} {'p99':>8} {'batch ' + str(batch):>12}")
+
+    for name, (call, predict) in runners.items():
+        cold = _cold_start(model_path, name)
+        call(single)  # warm up
+        latencies = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            call(single)
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+
+        predict(windows, batch_size=256, verbose=0)
+        start = time.perf_counter()
+        predict(windows, batch_size=256, verbose=0)
+        throughput = batch / (time.perf_counter() - start)
+        print(f"{name:<8} {cold:>9.2f}s {p50:>6.2f}ms {p99:>6.2f}ms {throughput:>8.0f}/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the model for the NumPy backend, or benchmark backends")
+    parser.add_argument('command', choices=['export', 'verify', 'bench'])
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--calls', type=int, default=200, help='Single-sample calls timed by bench')
+    parser.add_argument('--batch', type=int, default=4096, help='Windows per throughput batch')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        path = export(args.model)
+        print(f"✅ Exported {args.model} -> {path}")
+        diff = verify(args.model)
+        print(f"{'✅' if diff <= TOLERANCE else '❌'} Max abs diff vs Keras: {diff:.2e}")
+    elif args.command == 'verify':
+        diff = verify(args.model)
+        print(f"{'✅' if diff <= TOLERANCE else '❌'} Max abs diff vs Keras: {diff:.2e}")
+        sys.exit(0 if diff <= TOLERANCE else 1)
+    else:
+        benchmark(args.model, args.calls, args.batch)
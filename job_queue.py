@@ -0,0 +1,142 @@
+"""
+Job Queue
+Runs long requests (backtests) on a bounded pool of background threads.
+
+Jobs with the same key share one run: submitting a key that is queued,
+running, or finished within `result_ttl` returns the existing job. Each job
+reports progress in [0, 1] through the callback passed to its function.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'error'
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done_event = threading.Event()
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def _touch(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def set_progress(self, fraction):
+        self.progress = min(1.0, max(self.progress, float(fraction)))
+        self._touch()
+
+    def wait_for_change(self, version, timeout):
+        """Block until the job changes after `version` or `timeout` passes"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def to_dict(self, include_result=True):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': round(self.progress * 100, 1),
+            'params': self.params,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.status == DONE and include_result:
+            data['result'] = self.result
+        if self.status == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    def __init__(self, max_workers=2, max_pending=32, result_ttl=600, max_jobs=256):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}  # id -> Job, oldest first
+        self._by_key = {}  # key -> Job
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    def submit(self, key, params, fn):
+        """
+        Queue fn(progress_callback) under `key`, or return the job already
+        covering it. Returns (job, created).
+        """
+        with self._lock:
+            self._expire()
+            job = self._by_key.get(key)
+            if job is not None and job.status != FAILED:
+                self.deduplicated += 1
+                return job, False
+
+            pending = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs already waiting")
+
+            job = Job(key, params)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+        self._pool.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job, fn):
+        job.status = RUNNING
+        job.started = time.time()
+        job._touch()
+        try:
+            result = fn(job.set_progress)
+            if isinstance(result, dict) and 'error' in result:
+                raise RuntimeError(result['error'])
+            job.result = result
+            job.progress = 1.0
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+            job.done_event.set()
+            job._touch()
+
+    def _expire(self):
+        """Drop finished jobs past their TTL, and the oldest ones past max_jobs"""
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        for job in finished:
+            if now - job.finished > self.result_ttl or len(self._jobs) > self.max_jobs:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def stats(self):
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in list(self._jobs.values()):
+            counts[job.status] += 1
+        return {**counts, 'deduplicated': self.deduplicated}
@@ -0,0 +1,166 @@
+"""
+Kline Cache
+TTL + LRU cache in front of the Binance klines endpoint for /api/historical.
+
+Entries are stored as ready-to-send JSON bodies, keyed by
+(symbol, interval, limit). An entry expires when the newest candle closes,
+capped at `max_staleness` so the still-forming candle stays fresh. Concurrent
+misses for the same key share one upstream fetch (single-flight).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+BINANCE_API_URL = os.environ.get('BINANCE_API_URL', 'https://api.binance.com')
+REQUEST_TIMEOUT = 10  # seconds
+MAX_STALENESS = 10  # seconds
+MIN_TTL = 1  # seconds
+MAX_BYTES = 32 * 1024 * 1024
+
+
+class BinanceKlineClient:
+    """Pooled HTTP client for /api/v3/klines"""
+
+    def __init__(self, base_url=BINANCE_API_URL, timeout=REQUEST_TIMEOUT, pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_klines(self, symbol, interval, limit, start_time=None):
+        """Latest `limit` klines, or the first `limit` from `start_time` (epoch ms)"""
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        with metrics.upstream('binance_klines'):
+            response = self.session.get(f'{self.base_url}/api/v3/klines', params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+
+def format_klines(klines):
+    """
+    Convert raw klines to the frontend shape in one vectorized pass
+
+    Returns:
+        (list of {time, open, high, low, close} dicts, last close time in ms)
+    """
+    if not klines:
+        return [], None
+    raw = np.array([k[:7] for k in klines], dtype=object)
+    times = (raw[:, 0].astype(np.int64) // 1000).tolist()  # ms -> seconds
+    ohlc = raw[:, 1:5].astype(np.float64).tolist()
+    data = [
+        {'time': t, 'open': o, 'high': h, 'low': l, 'close': c}
+        for t, (o, h, l, c) in zip(times, ohlc)
+    ]
+    return data, int(raw[-1, 6])
+
+
+class _Flight:
+    """A fetch in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.body = None
+        self.error = None
+
+
+class KlineCache:
+    """Single-flight TTL/LRU cache; `client` is anything with get_klines(symbol, interval, limit)"""
+
+    def __init__(self, client=None, max_bytes=MAX_BYTES, max_staleness=MAX_STALENESS, clock=time.time):
+        self.client = client or BinanceKlineClient()
+        self.max_bytes = max_bytes
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, body)
+        self._bytes = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, symbol, interval, limit):
+        """JSON body ({'data': [...], 'count': n}) for the request, as bytes
+
+        Every miss is exactly one upstream call; coalesced callers wait on it.
+        """
+        key = (symbol, interval, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.body
+
+        try:
+            data, close_time_ms = format_klines(self.client.get_klines(symbol, interval, limit))
+            flight.body = json.dumps({'data': data, 'count': len(data)}).encode()
+            self._store(key, flight.body, close_time_ms)
+            return flight.body
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _store(self, key, body, close_time_ms):
+        now = self.clock()
+        ttl = self.max_staleness
+        if close_time_ms is not None:
+            ttl = min(ttl, max(MIN_TTL, close_time_ms / 1000 - now))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[key] = (now + ttl, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
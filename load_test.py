@@ -0,0 +1,81 @@
+"""
+Load Test
+Fires concurrent forecast requests at a running API and reports throughput
+and latency, plus the server's micro-batcher stats.
+
+Each request asks for a forecast as of a random past date, so every request
+runs the model instead of hitting the forecast cache:
+
+    gunicorn -c gunicorn.conf.py wsgi:app                  # or: python api_server.py --fast-start
+    python load_test.py --concurrency 16 --requests 400
+    MICRO_BATCH_MS=0 gunicorn -c gunicorn.conf.py wsgi:app  # baseline without batching
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def run(url, concurrency, total, horizon, date_from, date_to, seed=0):
+    days = (np.datetime64(date_to) - np.datetime64(date_from)).astype(int)
+    rng = random.Random(seed)
+    dates = [str(np.datetime64(date_from) + rng.randrange(days)) for _ in range(total)]
+    sessions = threading.local()
+
+    def one(as_of):
+        session = getattr(sessions, 'session', None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        start = time.perf_counter()
+        response = session.get(f'{url}/api/forecast', params={'horizon': horizon, 'as_of': as_of}, timeout=120)
+        return time.perf_counter() - start, response.status_code
+
+    # Wait until the server is warm so startup isn't measured
+    while requests.get(f'{url}/api/ready', timeout=5).status_code != 200:
+        time.sleep(0.1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, dates))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    errors = sum(1 for r in results if r[1] != 200)
+    return {
+        'requests': total,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput': total / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'micro_batcher': requests.get(f'{url}/api/health', timeout=5).json().get('micro_batcher'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test /api/forecast on a local instance")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--horizon', type=int, default=7)
+    parser.add_argument('--from', dest='date_from', default='2021-01-01', help='Earliest as_of date')
+    parser.add_argument('--to', dest='date_to', default='2023-01-01', help='Latest as_of date')
+    args = parser.parse_args()
+
+    result = run(args.url, args.concurrency, args.requests, args.horizon, args.date_from, args.date_to)
+    print(f"Requests:   {result['requests']} ({result['errors']} errors) in {result['seconds']:.2f}s")
+    print(f"Throughput: {result['throughput']:.1f} req/s at concurrency {args.concurrency}")
+    print(f"Latency:    p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  p99 {result['p99_ms']:.1f}ms")
+    batcher = result['micro_batcher']
+    if batcher:
+        print(f"Batches:    mean size {batcher['batch_size']['mean']:.1f} rows, "
+              f"max queue depth {batcher['max_queue_depth']}")
+        buckets = ' '.join(f"≤{b['le']}:{b['count']}" for b in batcher['batch_size']['buckets'] if b['count'])
+        print(f"Batch sizes: {buckets}")
+    else:
+        print("Micro-batching disabled (or stats not from this worker)")
@@ -0,0 +1,181 @@
+"""
+Market Data Store
+Keeps each OHLCV CSV in memory as contiguous NumPy columns so request
+handlers never re-parse the file. Rows appended by data_engine are picked up
+by reading only the bytes past the last consumed file offset. When data_engine
+has written a columnar store next to the CSV, it is memory-mapped instead.
+"""
+import io
+import os
+import threading
+
+import numpy as np
+
+import ohlcv_store
+
+
+DATE_COL = 'Date'
+MIN_CAPACITY = 1024
+
+
+class MarketDataStore:
+    """Sorted, append-friendly column store backed by a CSV file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = []
+        self._dates = np.empty(0, dtype='datetime64[D]')
+        self._cols = {}
+        self._n = 0
+        self._offset = 0
+        self._inode = None
+        self._last_line = b''
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def refresh(self):
+        """Load the file, or parse only the rows appended since the last call"""
+        st = os.stat(self.path)
+        if st.st_ino == self._inode and st.st_size == self._offset:
+            return self
+
+        with self._lock:
+            st = os.stat(self.path)
+            if (st.st_ino != self._inode or st.st_size < self._offset
+                    or not self._last_line_unchanged()):
+                # New or rewritten file
+                self._load_full(st.st_ino)
+            elif st.st_size > self._offset:
+                self._load_tail()
+        return self
+
+    def _read_complete_lines(self, offset):
+        """Bytes from `offset` up to the last newline, so half-written rows wait"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        return data[:end]
+
+    def _last_line_unchanged(self):
+        """Guard against an in-place rewrite that happens to grow the file"""
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset - len(self._last_line))
+            return f.read(len(self._last_line)) == self._last_line
+
+    def _remember_last_line(self, data):
+        start = data.rfind(b'\n', 0, len(data) - 1) + 1
+        self._last_line = data[start:]
+
+    def _load_full(self, inode):
+        import pandas as pd
+        data = self._read_complete_lines(0)
+        df = pd.read_csv(io.BytesIO(data))
+        df = df.sort_values(DATE_COL, kind='stable')
+
+        self.columns = [c for c in df.columns if c != DATE_COL]
+        self._n = 0
+        self._allocate(max(MIN_CAPACITY, 2 * len(df)))
+        self._write_rows(df)
+        self._offset = len(data)
+        self._inode = inode
+        self._remember_last_line(data)
+
+    def _load_tail(self):
+        import pandas as pd
+        data = self._read_complete_lines(self._offset)
+        if not data:
+            return
+        df = pd.read_csv(io.BytesIO(data), header=None, names=[DATE_COL] + self.columns)
+        self._offset += len(data)
+        self._remember_last_line(data)
+        if df.empty:
+            return
+
+        df = df.sort_values(DATE_COL, kind='stable')
+        first = np.datetime64(pd.Timestamp(df[DATE_COL].iloc[0]), 'D')
+        if self._n and first <= self._dates[self._n - 1]:
+            # Out-of-order append: rare, so just rebuild from the whole file
+            self._load_full(self._inode)
+            return
+        self._write_rows(df)
+
+    def _allocate(self, capacity):
+        dates = np.empty(capacity, dtype='datetime64[D]')
+        dates[:self._n] = self._dates[:self._n]
+        self._dates = dates
+        cols = {}
+        for name in self.columns:
+            col = np.empty(capacity, dtype=np.float64)
+            if name in self._cols:
+                col[:self._n] = self._cols[name][:self._n]
+            cols[name] = col
+        self._cols = cols
+
+    def _write_rows(self, df):
+        import pandas as pd
+        start, end = self._n, self._n + len(df)
+        if end > len(self._dates):
+            self._allocate(max(MIN_CAPACITY, 2 * end))
+        self._dates[start:end] = pd.to_datetime(df[DATE_COL]).values.astype('datetime64[D]')
+        for name in self.columns:
+            self._cols[name][start:end] = df[name].to_numpy(dtype=np.float64)
+        self._n = end
+
+    # ------------------------------------------------------------------
+    # Views (no copies; valid until the next reallocation)
+    # ------------------------------------------------------------------
+    def _slice(self, start, stop):
+        view = {DATE_COL: self._dates[start:stop]}
+        for name in self.columns:
+            view[name] = self._cols[name][start:stop]
+        return view
+
+    def tail(self, n):
+        """Last `n` rows as a dict of column views"""
+        n = min(n, self._n)
+        return self._slice(self._n - n, self._n)
+
+    def between(self, start=None, end=None):
+        """Rows with start <= Date <= end as a dict of column views"""
+        dates = self._dates[:self._n]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+        hi = self._n if end is None else np.searchsorted(dates, np.datetime64(end, 'D'), side='right')
+        return self._slice(lo, hi)
+
+    def column(self, name):
+        """Full history of one column as a view"""
+        if name == DATE_COL:
+            return self._dates[:self._n]
+        return self._cols[name][:self._n]
+
+    def last_date(self):
+        return self._dates[self._n - 1] if self._n else None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """Shared store for `path`, refreshed with any rows appended since last use"""
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            columnar = ohlcv_store.store_path(key)
+            if ohlcv_store.exists(columnar):
+                store = _stores.setdefault(key, ohlcv_store.ColumnarStore(columnar))
+            else:
+                store = _stores.setdefault(key, MarketDataStore(key))
+    return store.refresh()
+
+
+def stack(view, columns):
+    """(rows, len(columns)) feature matrix from a column view dict"""
+    return np.column_stack([view[c] for c in columns])
@@ -0,0 +1,457 @@
+"""
+Metrics
+Timing spans, latency histograms and counters for the serving stack,
+rendered in the Prometheus text format for /api/metrics.
+
+    with metrics.span('predict.model'):        # app_stage_duration_seconds{stage}
+        ...
+    with metrics.upstream('binance_klines'):   # app_upstream_duration_seconds{service}
+        ...                                    # + app_upstream_requests_total{service,outcome}
+    metrics.count('predict_fallbacks_total', reason='multi_asset')
+
+A span that exits with an exception also counts app_errors_total{stage}.
+Everything is in-process: under gunicorn each worker keeps and serves its
+own numbers. With METRICS=0 (or enable(False) at runtime) span() and
+upstream() hand back one shared no-op context manager and count() returns
+at once, so instrumented code costs a function call and a flag check.
+
+A sampling profiler can be attached to single requests: once profiling is
+allowed (PROFILE_REQUESTS=1 or allow_profiling(True)), a Sampler reads the
+request thread's stack every few milliseconds and keeps the collapsed
+stacks (flamegraph.pl / speedscope input) for the last few requests.
+
+    python metrics.py bench   # cost per span and counter, enabled vs disabled
+"""
+import argparse
+import bisect
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from micro_batcher import Histogram as _Histogram
+
+
+ENABLED = os.environ.get('METRICS', '1') != '0'
+NAMESPACE = 'app'
+# Seconds; from a cache hit to a cold model load or a slow upstream call
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+MAX_PROFILES = 20
+MAX_PROFILE_SECONDS = 60  # a forgotten sampler stops itself
+_profiling = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+
+HELP = {
+    'stage_duration_seconds': ('histogram', 'Time spent in each instrumented stage'),
+    'upstream_duration_seconds': ('histogram', 'Latency of calls to external services'),
+    'upstream_requests_total': ('counter', 'Calls to external services by outcome'),
+    'errors_total': ('counter', 'Exceptions raised out of instrumented stages'),
+    'http_request_duration_seconds': ('histogram', 'Request latency per endpoint'),
+    'http_requests_total': ('counter', 'Requests per endpoint and status'),
+}
+
+
+class Histogram(_Histogram):
+    """Thread-safe latency histogram with Prometheus' cumulative rendering"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        super().__init__(bounds)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.n += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.n
+
+
+_histograms = {}  # (name, labels) -> Histogram
+_counters = {}  # (name, labels) -> value
+_collectors = []  # callables yielding (name, type, help, labels, value)
+_lock = threading.Lock()
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = bool(on)
+
+
+def allow_profiling(on=True):
+    global _profiling
+    _profiling = bool(on)
+
+
+def profiling_allowed():
+    return _profiling
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def histogram(name, **labels):
+    """The histogram for `name` and `labels`, created on first use"""
+    key = _key(name, labels)
+    hist = _histograms.get(key)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(key, Histogram())
+    return hist
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        histogram(name, **labels).observe(value)
+
+
+def count(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def collector(fn):
+    """
+    Register `fn() -> iterable of (name, type, help, labels, value)` for
+    values kept elsewhere (cache stats, queue depths); called on render
+    """
+    _collectors.append(fn)
+    return fn
+
+
+# -----------------------------------------------------------------------------
+# SPANS
+# -----------------------------------------------------------------------------
+class _Span:
+    __slots__ = ('hist', 'label', 'upstream', 'start')
+
+    def __init__(self, hist, label, upstream):
+        self.hist = hist
+        self.label = label
+        self.upstream = upstream
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.hist.observe(time.perf_counter() - self.start)
+        if self.upstream:
+            count('upstream_requests_total', service=self.label, outcome='ok' if exc_type is None else 'error')
+        elif exc_type is not None:
+            count('errors_total', stage=self.label)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+_stage_histograms = {}
+_upstream_histograms = {}
+
+
+def span(stage):
+    """Time a block into app_stage_duration_seconds{stage=...}"""
+    if not ENABLED:
+        return _NO_SPAN
+    hist = _stage_histograms.get(stage)
+    if hist is None:
+        hist = _stage_histograms[stage] = histogram('stage_duration_seconds', stage=stage)
+    return _Span(hist, stage, False)
+
+
+def upstream(service):
+    """Time an external call and count it as ok or error"""
+    if not ENABLED:
+        return _NO_SPAN
+    hist = _upstream_histograms.get(service)
+    if hist is None:
+        hist = _upstream_histograms[service] = histogram('upstream_duration_seconds', service=service)
+    return _Span(hist, service, True)
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def wrap(fn):
+        def timed_fn(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        timed_fn.__name__ = fn.__name__
+        timed_fn.__doc__ = fn.__doc__
+        return timed_fn
+    return wrap
+
+
+def observe_request(endpoint, method, status, seconds):
+    """Record one HTTP request (endpoint is the route rule, not the raw path)"""
+    if ENABLED:
+        histogram('http_request_duration_seconds', endpoint=endpoint, method=method).observe(seconds)
+        count('http_requests_total', endpoint=endpoint, method=method, status=str(status))
+
+
+# -----------------------------------------------------------------------------
+# PROMETHEUS TEXT FORMAT
+# -----------------------------------------------------------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    families = OrderedDict()  # full name -> (type, help, [lines])
+
+    def family(name, kind, text):
+        full = f'{NAMESPACE}_{name}'
+        if full not in families:
+            families[full] = (kind, text, [])
+        return full, families[full][2]
+
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    for (name, labels), hist in histograms:
+        _, text = HELP.get(name, ('histogram', name))
+        full, lines = family(name, 'histogram', text)
+        counts, total, n = hist.snapshot()
+        for bound, cumulative in zip(hist.bounds + [float('inf')], itertools.accumulate(counts)):
+            lines.append(f'{full}_bucket{_labels(labels + (("le", _number(float(bound))),))} {cumulative}')
+        lines.append(f'{full}_sum{_labels(labels)} {_number(total)}')
+        lines.append(f'{full}_count{_labels(labels)} {n}')
+    for (name, labels), value in counters:
+        _, text = HELP.get(name, ('counter', name))
+        full, lines = family(name, 'counter', text)
+        lines.append(f'{full}{_labels(labels)} {_number(value)}')
+    for fn in _collectors:
+        try:
+            samples = list(fn())
+        except Exception as e:
+            print(f"⚠️ Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+            continue
+        for name, kind, text, labels, value in samples:
+            if value is None:
+                continue
+            full, lines = family(name, kind, text)
+            lines.append(f'{full}{_labels(tuple(sorted(labels.items())))} {_number(value)}')
+
+    out = []
+    for full, (kind, text, lines) in families.items():
+        out.append(f'# HELP {full} {text}')
+        out.append(f'# TYPE {full} {kind}')
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
+
+
+def reset():
+    """Drop every recorded value (collectors stay registered)"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _stage_histograms.clear()
+        _upstream_histograms.clear()
+
+
+# -----------------------------------------------------------------------------
+# SAMPLING PROFILER
+# -----------------------------------------------------------------------------
+class Sampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a helper
+    thread; the profiled code runs unmodified
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL, max_seconds=MAX_PROFILE_SECONDS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """'outer;inner;leaf count' per line, for flamegraph.pl or speedscope"""
+        return ''.join(f'{stack} {n}\n' for stack, n in self.stacks.most_common())
+
+    def top(self, n=10):
+        """[(function, share of samples)] by samples spent in the function itself"""
+        leaves = Counter()
+        for stack, k in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += k
+        return [(fn, k / self.samples) for fn, k in leaves.most_common(n)] if self.samples else []
+
+
+_profiles = OrderedDict()  # id -> {'path', 'seconds', 'samples', 'collapsed'}
+_profile_ids = itertools.count(1)
+
+
+def save_profile(sampler, path):
+    """Keep a finished sampler's stacks under a new id (the last MAX_PROFILES are kept)"""
+    profile_id = str(next(_profile_ids))
+    with _lock:
+        _profiles[profile_id] = {
+            'path': path,
+            'seconds': sampler.seconds,
+            'samples': sampler.samples,
+            'top': sampler.top(),
+            'collapsed': sampler.collapsed(),
+        }
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+    return profile_id
+
+
+def get_profile(profile_id):
+    return _profiles.get(profile_id)
+
+
+def list_profiles():
+    with _lock:
+        return [{'id': k, 'path': p['path'], 'seconds': p['seconds'], 'samples': p['samples']}
+                for k, p in _profiles.items()]
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def _per_call_ns(fn, calls):
+    start = time.perf_counter()
+    fn(calls)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def benchmark(calls=1_000_000):
+    """Nanoseconds per instrumented call, enabled and disabled, against an empty loop"""
+    def bare(n):
+        for _ in range(n):
+            pass
+
+    def noop():
+        pass
+
+    null = _NoSpan()
+
+    def with_only(n):
+        for _ in range(n):
+            with null:
+                pass
+
+    def calls_only(n):
+        for _ in range(n):
+            noop()
+
+    def spans(n):
+        for _ in range(n):
+            with span('bench'):
+                pass
+
+    def counts(n):
+        for _ in range(n):
+            count('bench_total')
+
+    was = ENABLED
+    try:
+        results = {'empty loop': _per_call_ns(bare, calls), 'empty function': _per_call_ns(calls_only, calls),
+                   'empty with': _per_call_ns(with_only, calls)}
+        for on in (False, True):
+            enable(on)
+            state = 'enabled' if on else 'disabled'
+            results[f'span ({state})'] = _per_call_ns(spans, calls)
+            results[f'count ({state})'] = _per_call_ns(counts, calls)
+    finally:
+        enable(was)
+        reset()
+    return results
+
+
+def _busy(seconds):
+    """CPU-bound Python loop for the profiler benchmark"""
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += sum(i * i for i in range(200))
+    return n
+
+
+def profiler_overhead(seconds=1.0, interval=PROFILE_INTERVAL):
+    """Work done in `seconds` with the sampler attached, relative to without (before and after)"""
+    before = _busy(seconds)
+    sampler = Sampler(interval=interval).start()
+    sampled = _busy(seconds)
+    sampler.stop()
+    after = _busy(seconds)
+    return {'throughput_ratio': sampled / ((before + after) / 2), 'samples': sampler.samples, 'top': sampler.top(3)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Metrics tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Cost per span/counter call and profiler overhead')
+    p_bench.add_argument('--calls', type=int, default=1_000_000)
+    p_bench.add_argument('--interval', type=float, default=PROFILE_INTERVAL)
+    args = parser.parse_args()
+
+    for name, ns in benchmark(args.calls).items():
+        print(f"{name:<18} {ns:>8.1f}ns per call")
+    r = profiler_overhead(interval=args.interval)
+    print(f"Sampler every {args.interval * 1000:.0f}ms: {r['samples']} samples, "
+          f"{r['throughput_ratio'] * 100:.1f}% of unprofiled throughput")
+    for fn, share in r['top']:
+        print(f"  {share * 100:5.1f}%  {fn}")
@@ -0,0 +1,165 @@
+"""
+Micro-Batcher
+Merges concurrent model calls into one batched call.
+
+Callers block in predict(x) while a single worker thread collects requests
+for up to `max_wait` seconds (or until `max_batch` rows are waiting),
+concatenates them, calls `predict_fn` once and hands each caller its slice
+of the output. Queue depth, batch sizes and per-request latency are kept as
+simple histograms for /api/health.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+
+MAX_BATCH = 256  # rows per model call
+MAX_WAIT = 0.002  # seconds to wait for more requests after the first
+BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class Histogram:
+    """Counts per upper bound; values above the last bound go to '+Inf'"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        self.counts[int(np.searchsorted(self.bounds, value))] += 1
+        self.total += value
+        self.n += 1
+
+    def to_dict(self):
+        labels = [str(b) for b in self.bounds] + ['+Inf']
+        return {
+            'buckets': [{'le': label, 'count': n} for label, n in zip(labels, self.counts)],
+            'count': self.n,
+            'mean': self.total / self.n if self.n else 0.0,
+        }
+
+
+class _Request:
+    def __init__(self, x):
+        self.x = x
+        self.submitted = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """`predict_fn` takes (rows, ...) and returns one output row per input row"""
+
+    def __init__(self, predict_fn, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pid = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.max_queue_depth = 0
+
+    def _ensure_worker(self):
+        # Threads don't survive fork: every process starts its own worker
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._cond = threading.Condition()
+            self._pending = []
+            self._pending_rows = 0
+            threading.Thread(target=self._loop, name='micro-batcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def predict(self, x):
+        """Blocking: the model output for `x`, computed as part of a shared batch"""
+        self._ensure_worker()
+        request = _Request(np.asarray(x, dtype=np.float32))
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._pending.append(request)
+                self._pending_rows += len(request.x)
+                self.max_queue_depth = max(self.max_queue_depth, self._pending_rows)
+                self._cond.notify()
+        if closed:
+            # Superseded batcher (model reloaded): run unbatched
+            return np.asarray(self.predict_fn(request.x))
+        request.event.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    __call__ = predict
+
+    def close(self):
+        """Stop the worker once the requests already queued are served"""
+        if self._pid != os.getpid():
+            self._closed = True
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _take_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return None
+            deadline = self._pending[0].submitted + self.max_wait
+            while self._pending_rows < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rows = [], 0
+            while self._pending and (not batch or rows + len(self._pending[0].x) <= self.max_batch):
+                request = self._pending.pop(0)
+                batch.append(request)
+                rows += len(request.x)
+            self._pending_rows -= rows
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                if len(batch) == 1:
+                    outputs = [np.asarray(self.predict_fn(batch[0].x))]
+                else:
+                    y = np.asarray(self.predict_fn(np.concatenate([r.x for r in batch])))
+                    splits = np.cumsum([len(r.x) for r in batch])[:-1]
+                    outputs = np.split(y, splits)
+                for request, output in zip(batch, outputs):
+                    request.result = output
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+
+            now = time.perf_counter()
+            self.batch_sizes.observe(sum(len(r.x) for r in batch))
+            for request in batch:
+                self.latency_ms.observe((now - request.submitted) * 1000)
+                request.event.set()
+
+    def stats(self):
+        return {
+            'queue_depth': self._pending_rows if self._pid == os.getpid() else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'batch_size': self.batch_sizes.to_dict(),
+            'latency_ms': self.latency_ms.to_dict(),
+        }
@@ -0,0 +1,162 @@
+"""
+Model Registry
+Process-wide cache of model and scaler artifacts shared by the API server and
+the backtest engine. Each artifact is loaded once and reloaded only when the
+file on disk changes.
+
+Models run on the backend named by INFERENCE_BACKEND: 'keras' (default) or
+'numpy', the TensorFlow-free forward pass in inference.py.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+
+BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+
+_lock = threading.Lock()
+_entries = {}
+
+
+def _file_signature(path):
+    """Cheap change detector: (mtime_ns, size) of the file"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _file_hash(path):
+    """Short SHA-256 digest of the file, used as the artifact version"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _estimate_nbytes(obj):
+    """Approximate in-memory size of a loaded model or scaler"""
+    if hasattr(obj, 'get_weights'):
+        return int(sum(w.nbytes for w in obj.get_weights()))
+    if isinstance(obj, dict):
+        return sum(_estimate_nbytes(v) for v in obj.values())
+    return int(sum(v.nbytes for v in vars(obj).values() if isinstance(v, np.ndarray)))
+
+
+def _load_keras(path):
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+
+def _load_joblib(path):
+    import joblib
+    return joblib.load(path)
+
+
+def _load_numpy(path):
+    import inference
+    return inference.load_exported(path)
+
+
+MODEL_LOADERS = {
+    'keras': _load_keras,
+    'numpy': _load_numpy,
+}
+
+
+def _get(path, loader, backend=None):
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+
+    entry = _entries.get(path)
+    if entry is not None and entry['signature'] == signature and entry['backend'] == backend:
+        return entry['obj']
+
+    with _lock:
+        # Another thread may have loaded it while we waited
+        entry = _entries.get(path)
+        if entry is not None and entry['signature'] == signature and entry['backend'] == backend:
+            return entry['obj']
+
+        start = time.perf_counter()
+        obj = loader(path)
+        load_time = time.perf_counter() - start
+
+        _entries[path] = {
+            'obj': obj,
+            'signature': signature,
+            'backend': backend,
+            'version': _file_hash(path),
+            'load_time': load_time,
+            'nbytes': _estimate_nbytes(obj),
+            'loaded_at': time.time(),
+            'loads': entry['loads'] + 1 if entry is not None else 1,
+        }
+        action = 'Reloaded' if entry is not None else 'Loaded'
+        on_backend = f" ({backend} backend)" if backend else ''
+        print(f"📦 {action} {os.path.basename(path)}{on_backend} in {load_time:.2f}s")
+        return obj
+
+
+def get_model(path, backend=None):
+    """
+    Return the model at `path` on `backend` (default BACKEND), loading or
+    hot-reloading it as needed
+    """
+    backend = backend or BACKEND
+    if backend not in MODEL_LOADERS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {list(MODEL_LOADERS)}")
+    return _get(path, MODEL_LOADERS[backend], backend)
+
+
+def get_scaler(path):
+    """Return the joblib-pickled scaler at `path`, loading or hot-reloading it as needed"""
+    return _get(path, _load_joblib)
+
+
+def get_scalers(path):
+    """
+    Return the {symbol: scaler} dict of a multi-symbol model (saved by
+    training.py in the model's one-hot symbol order), loading or
+    hot-reloading it as needed
+    """
+    return _get(path, _load_joblib)
+
+
+def get_symbol_scaler(path, symbol):
+    """One symbol's scaler from a per-symbol scaler file, or None if it has none"""
+    return get_scalers(path).get(symbol)
+
+
+def is_loaded(path):
+    """Whether the artifact at `path` is currently cached"""
+    return os.path.abspath(path) in _entries
+
+
+def get_version(path):
+    """Return the content hash of a loaded artifact, or None if not loaded"""
+    entry = _entries.get(os.path.abspath(path))
+    return entry['version'] if entry is not None else None
+
+
+def clear():
+    """Drop every cached artifact"""
+    with _lock:
+        _entries.clear()
+
+
+def stats():
+    """Load time, memory footprint and version of each cached artifact"""
+    return {
+        os.path.relpath(path): {
+            'version': entry['version'],
+            'backend': entry['backend'],
+            'load_time_s': round(entry['load_time'], 4),
+            'memory_bytes': entry['nbytes'],
+            'loaded_at': entry['loaded_at'],
+            'loads': entry['loads'],
+        }
+        for path, entry in list(_entries.items())
+    }
@@ -0,0 +1,202 @@
+"""
+Multi-Asset Model
+Serves every tracked coin from one shared LSTM instead of scaling the
+Bitcoin forecast by fixed correlation multipliers.
+
+training.py trains the model on several data_engine CSVs at once: each
+symbol is scaled with its own scaler and every input row carries a one-hot
+symbol id. At serving time the latest window of every symbol goes through
+one batched forward pass (or one batched rollout for multi-day forecasts),
+and each symbol's prediction is inverse-scaled with its own scaler.
+
+    python training.py train --data data/BTC_USD.csv data/ETH_USD.csv data/SOL_USD.csv
+    python multi_asset.py bench --symbols 10   # one shared model vs N separate models
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import forecaster
+import market_data
+import training
+
+
+MODEL_PATH = training.MULTI_MODEL_PATH
+SCALERS_PATH = training.MULTI_SCALERS_PATH
+DATA_DIR = 'data'
+FEATURES = training.FEATURES  # raw columns; the first one (Close) is predicted
+
+
+def data_path(prefix):
+    """data_engine CSV of a symbol prefix, e.g. ETH -> data/ETH_USD.csv"""
+    return os.path.join(DATA_DIR, f'{prefix}_USD.csv')
+
+
+def pair(prefix):
+    """Exchange symbol of a prefix, e.g. ETH -> ETHUSDT"""
+    return f'{prefix}USDT'
+
+
+def available():
+    return os.path.exists(MODEL_PATH) and os.path.exists(SCALERS_PATH)
+
+
+class MultiAssetPredictor:
+    """
+    A shared model and its {prefix: scaler} dict (in one-hot order). `step`
+    replaces the compiled model call, as in forecaster.Forecaster.
+    """
+
+    def __init__(self, model, scalers, step=None, features=FEATURES):
+        self.model = model
+        self.scalers = scalers
+        self.prefixes = list(scalers)
+        self.features = list(features)
+        _, self.lookback, n_inputs = model.input_shape
+        if n_inputs != len(self.features) + len(self.prefixes):
+            raise ValueError(f"Model takes {n_inputs} inputs per row, expected {len(self.features)} features "
+                             f"+ {len(self.prefixes)} symbol ids")
+        self.forecaster = forecaster.Forecaster(model, None, step=step)
+
+    def stores(self):
+        """{prefix: market data store} for every symbol whose data file exists"""
+        return {p: market_data.get_store(data_path(p)) for p in self.prefixes if os.path.exists(data_path(p))}
+
+    def windows(self, as_of=None):
+        """
+        Scaled windows with symbol ids, (symbols, lookback, inputs), for every
+        symbol with enough history, plus {prefix: (last close, last date)}
+        """
+        rows, latest = [], {}
+        for prefix, store in self.stores().items():
+            view = store.between(None, as_of) if as_of else store.tail(self.lookback)
+            if len(view[market_data.DATE_COL]) < self.lookback:
+                continue
+            raw = market_data.stack(view, [f'{prefix}_{f}' for f in self.features])[-self.lookback:]
+            scaled = self.scalers[prefix].transform(raw)
+            rows.append(training.with_symbol(scaled, self.prefixes.index(prefix), len(self.prefixes)))
+            latest[prefix] = (float(raw[-1, 0]), np.datetime64(view[market_data.DATE_COL][-1], 'D'))
+        return (np.stack(rows) if rows else None), latest
+
+    def forecast(self, horizon=1, as_of=None):
+        """
+        {pair: {price, predicted_price, percent_change, dates, prices}} for
+        every symbol, from one batched rollout
+        """
+        X, latest = self.windows(as_of)
+        if X is None:
+            return {}
+        scaled = self.forecaster.rollout(X, horizon)
+
+        result = {}
+        for (prefix, (price, last_date)), row in zip(latest.items(), scaled):
+            scaler = self.scalers[prefix]
+            dummy = np.zeros((horizon, scaler.n_features_in_))
+            dummy[:, 0] = row
+            prices = scaler.inverse_transform(dummy)[:, 0]
+            result[pair(prefix)] = {
+                'price': price,
+                'predicted_price': float(prices[0]),
+                'percent_change': float((prices[0] - price) / price * 100),
+                'dates': [str(d) for d in last_date + np.arange(1, horizon + 1)],
+                'prices': prices.tolist(),
+            }
+        return result
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def _load(model, backend, directory, name):
+    """Compiled step for a freshly built model on `backend`"""
+    if backend == 'numpy':
+        import inference
+        path = os.path.join(directory, f'{name}.h5')
+        model.save(path)
+        return inference.load_exported(path)
+    return forecaster.compile_step(model)
+
+
+def _bench_child(variant, n_symbols, calls, backend):
+    """One serving layout in a fresh process: memory and latency to predict every symbol once"""
+    import tensorflow as tf  # noqa: F401 - imported by both layouts so baselines match
+    baseline = training.current_rss_mb()
+    lookback, n_features = training.LOOKBACK, len(FEATURES)
+    rng = np.random.default_rng(0)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        if variant == 'multi':
+            model = training.build_model((lookback, n_features + n_symbols))
+            steps = [_load(model, backend, directory, 'multi')]
+            inputs = [rng.random((n_symbols, lookback, n_features + n_symbols), dtype=np.float32)]
+            models = [model]
+        else:
+            models = [training.build_model((lookback, n_features)) for _ in range(n_symbols)]
+            steps = [_load(m, backend, directory, f'model_{i}') for i, m in enumerate(models)]
+            inputs = [rng.random((1, lookback, n_features), dtype=np.float32) for _ in range(n_symbols)]
+        for step, x in zip(steps, inputs):
+            step(x)  # trace / warm up
+        load_seconds = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            for step, x in zip(steps, inputs):
+                np.asarray(step(x))
+            latencies.append(time.perf_counter() - start)
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(json.dumps({
+        'variant': variant,
+        'symbols': n_symbols,
+        'weights_mb': sum(w.nbytes for m in models for w in m.get_weights()) / 2 ** 20,
+        'rss_mb': training.current_rss_mb() - baseline,
+        'load_seconds': load_seconds,
+        'candle_p50_ms': p50,
+        'candle_p99_ms': p99,
+        'per_symbol_ms': p50 / n_symbols,
+    }))
+
+
+def benchmark(n_symbols=10, calls=200, backend='keras'):
+    """One shared model vs one model per symbol, each measured in its own process"""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    results = []
+    for variant in ('multi', 'separate'):
+        code = f"import multi_asset; multi_asset._bench_child({variant!r}, {n_symbols}, {calls}, {backend!r})"
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Multi-asset model tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Memory and latency: one shared model vs N separate models')
+    p_bench.add_argument('--symbols', type=int, nargs='+', default=[10])
+    p_bench.add_argument('--calls', type=int, default=200)
+    p_bench.add_argument('--backend', choices=['keras', 'numpy'], default='keras')
+    p_show = sub.add_parser('show', help='Next-day forecast of every symbol from the trained model')
+    p_show.add_argument('--horizon', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        print(f"{'Layout':<9} {'Symbols':>7} {'Weights':>8} {'RSS':>8} {'Load':>7} "
+              f"{'Candle p50':>10} {'p99':>8} {'Per symbol':>10}")
+        for n in args.symbols:
+            for r in benchmark(n, args.calls, args.backend):
+                print(f"{r['variant']:<9} {n:>7} {r['weights_mb']:>6.2f}MB {r['rss_mb']:>6.0f}MB "
+                      f"{r['load_seconds']:>6.2f}s {r['candle_p50_ms']:>8.2f}ms {r['candle_p99_ms']:>6.2f}ms "
+                      f"{r['per_symbol_ms']:>8.3f}ms")
+    else:
+        import model_registry
+        predictor = MultiAssetPredictor(model_registry.get_model(MODEL_PATH), model_registry.get_scalers(SCALERS_PATH))
+        for symbol, f in predictor.forecast(args.horizon).items():
+            print(f"{symbol:<9} ${f['price']:>12,.4f} -> ${f['predicted_price']:>12,.4f} ({f['percent_change']:+.2f}%)")
@@ -0,0 +1,373 @@
+"""
+Columnar OHLCV Store
+Binary, memory-mappable companion to the CSV files written by data_engine.
+
+A store is a directory (e.g. data/BTC_USD.ohlcv) holding one raw file per
+column - int64 epoch-second timestamps in Date.i8 and float64 values in
+<column>.f8 - plus a fixed-size header with the column names, row count and
+last timestamp. Appends write the column tails first and then atomically
+replace the header, so readers only ever see fully written rows. A store
+is never truncated in place: replace_dataframe builds the new one in a
+sibling directory and renames it over the old, so readers that still map
+the old column files keep their inodes.
+"""
+import argparse
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+MAGIC = b'OHLCVCOL'
+VERSION = 1
+HEADER = struct.Struct('<8sIIqq')  # magic, version, n_cols, n_rows, last_ts
+NAME_WIDTH = 32
+HEADER_FILE = 'header.bin'
+DATE_COL = 'Date'
+TS_FILE = 'Date.i8'
+
+
+def store_path(csv_path):
+    """Store directory that sits next to a CSV file"""
+    return os.path.splitext(csv_path)[0] + '.ohlcv'
+
+
+def exists(path):
+    return os.path.exists(os.path.join(path, HEADER_FILE))
+
+
+def _column_file(path, name):
+    return os.path.join(path, TS_FILE if name == DATE_COL else f'{name}.f8')
+
+
+def read_header(path):
+    """Column names, row count and last timestamp, without touching the data"""
+    with open(os.path.join(path, HEADER_FILE), 'rb') as f:
+        raw = f.read()
+    magic, version, n_cols, n_rows, last_ts = HEADER.unpack_from(raw)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} OHLCV store")
+    names = []
+    for i in range(n_cols):
+        start = HEADER.size + i * NAME_WIDTH
+        names.append(raw[start:start + NAME_WIDTH].rstrip(b'\x00').decode())
+    return {'columns': names, 'n_rows': n_rows, 'last_ts': last_ts if n_rows else None}
+
+
+def _write_header(path, columns, n_rows, last_ts):
+    raw = HEADER.pack(MAGIC, VERSION, len(columns), n_rows, last_ts or 0)
+    raw += b''.join(name.encode().ljust(NAME_WIDTH, b'\x00') for name in columns)
+    tmp = os.path.join(path, HEADER_FILE + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, HEADER_FILE))
+
+
+def create(path, columns):
+    """Create an empty store for the given float64 value columns (replace_dataframe swaps one out)"""
+    if exists(path):
+        # Truncating mapped column files would crash their readers with SIGBUS
+        raise FileExistsError(f"{path} already exists; use replace_dataframe")
+    for name in columns:
+        if len(name.encode()) > NAME_WIDTH:
+            raise ValueError(f"Column name too long: {name}")
+    os.makedirs(path, exist_ok=True)
+    for name in [DATE_COL] + list(columns):
+        open(_column_file(path, name), 'wb').close()
+    _write_header(path, list(columns), 0, None)
+
+
+def last_date(path):
+    """Last stored date as a naive UTC datetime, read from the header in O(1)"""
+    last_ts = read_header(path)['last_ts']
+    if last_ts is None:
+        return None
+    return datetime.fromtimestamp(last_ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def append(path, timestamps, values, replace_last=False):
+    """
+    Append rows to the store
+
+    Args:
+        path: Store directory
+        timestamps: int64 epoch seconds, ascending
+        values: dict of column name -> float64 array, one per store column
+        replace_last: Let a first row with the last stored timestamp
+            overwrite that row (a rollup's still-open bucket). Readers may
+            briefly see a mix of its old and new values.
+
+    Returns:
+        Number of rows written (rows older than the last stored timestamp,
+        or equal to it without `replace_last`, are skipped)
+    """
+    header = read_header(path)
+    n_rows, last_ts = header['n_rows'], header['last_ts']
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if last_ts is None:
+        keep = np.ones(len(timestamps), bool)
+    else:
+        keep = timestamps >= last_ts if replace_last else timestamps > last_ts
+    timestamps = timestamps[keep]
+    if len(timestamps) == 0:
+        return 0
+    # Overwrite in place (never shrink the mapped files) from the replaced row
+    start = n_rows - 1 if last_ts is not None and timestamps[0] == last_ts else n_rows
+    if np.any(np.diff(timestamps) <= 0):
+        raise ValueError("Timestamps must be strictly increasing")
+
+    columns = {DATE_COL: timestamps}
+    for name in header['columns']:
+        columns[name] = np.asarray(values[name], dtype=np.float64)[keep]
+
+    for name, data in columns.items():
+        file_path = _column_file(path, name)
+        with open(file_path, 'r+b') as f:
+            # Drop any partial tail left by an interrupted append
+            f.truncate(n_rows * 8)
+            f.seek(start * 8)
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Publishing the header is the commit point
+    _write_header(path, header['columns'], start + len(timestamps), int(timestamps[-1]))
+    return len(timestamps)
+
+
+def to_timestamps(dates):
+    """Epoch seconds from date strings / datetimes"""
+    import pandas as pd
+    return pd.to_datetime(dates).values.astype('datetime64[s]').astype(np.int64)
+
+
+def append_dataframe(path, df):
+    """Append a data_engine style DataFrame (Date column + value columns)"""
+    df = df.sort_values(DATE_COL).drop_duplicates(DATE_COL, keep='last')
+    if not exists(path):
+        create(path, [c for c in df.columns if c != DATE_COL])
+    columns = read_header(path)['columns']
+    values = {name: df[name].to_numpy(dtype=np.float64) for name in columns}
+    return append(path, to_timestamps(df[DATE_COL]), values)
+
+
+def replace_dataframe(path, df):
+    """
+    Replace the store at `path` with a DataFrame's rows
+
+    The new store is written to a sibling directory, then the old one is
+    renamed aside and the new one renamed into place. Readers keep their
+    maps of the old (never truncated) files and pick up the new store on
+    their next refresh. A crash at any point leaves either the old store,
+    the new one, or none, which data_engine rebuilds from the CSV.
+
+    Returns:
+        Number of rows written
+    """
+    path = os.path.abspath(path)
+    parent, name = os.path.split(path)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=f'{name}.new-')
+    old = None
+    try:
+        rows = append_dataframe(tmp, df)
+        if os.path.exists(path):
+            old = f'{path}.old-{os.getpid()}-{time.time_ns()}'
+            os.rename(path, old)
+        os.rename(tmp, path)
+    except BaseException:
+        if old is not None and not os.path.exists(path):
+            os.rename(old, path)
+            old = None
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    finally:
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    return rows
+
+
+def open_columns(path):
+    """
+    Memory-map every column read-only, with zero parsing
+
+    Returns:
+        dict of column name -> np.memmap of length n_rows; 'Date' holds int64
+        epoch seconds
+    """
+    header = read_header(path)
+    n_rows = header['n_rows']
+    columns = {}
+    for name, dtype in [(DATE_COL, np.int64)] + [(c, np.float64) for c in header['columns']]:
+        if n_rows == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(_column_file(path, name), dtype=dtype, mode='r', shape=(n_rows,))
+    return columns
+
+
+def export_csv(path, csv_path, date_format='%Y-%m-%d'):
+    """Write the store back out as a data_engine compatible CSV"""
+    import pandas as pd
+    columns = open_columns(path)
+    df = pd.DataFrame({name: np.asarray(col) for name, col in columns.items()})
+    df[DATE_COL] = pd.to_datetime(df[DATE_COL], unit='s').dt.strftime(date_format)
+    df.to_csv(csv_path, index=False)
+    return len(df)
+
+
+class ColumnarStore:
+    """
+    Read side of a store with the same view interface as
+    market_data.MarketDataStore. Dates come back as datetime64[`unit`]:
+    days for daily data, 's' for intraday bars.
+    """
+
+    def __init__(self, path, unit='D'):
+        self.path = path
+        self.unit = unit
+        self.columns = []
+        self._cols = {}
+        self._n = 0
+        self._header_version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    def refresh(self):
+        """Re-map the columns if the header has been republished or the store replaced"""
+        try:
+            st = os.stat(os.path.join(self.path, HEADER_FILE))
+        except FileNotFoundError:
+            if self._header_version is None:
+                raise
+            # Mid replace_dataframe: keep reading the old maps
+            return self
+        version = (st.st_ino, st.st_mtime_ns)
+        if version == self._header_version:
+            return self
+        with self._lock:
+            try:
+                cols = open_columns(self.path)
+            except FileNotFoundError:
+                if self._header_version is None:
+                    raise
+                return self
+            self.columns = [c for c in cols if c != DATE_COL]
+            self._cols = cols
+            self._n = len(cols[DATE_COL])
+            self._header_version = version
+        return self
+
+    def _slice(self, start, stop):
+        dates = self._cols[DATE_COL][start:stop].astype('datetime64[s]')
+        view = {DATE_COL: dates.astype(f'datetime64[{self.unit}]')}
+        for name in self.columns:
+            view[name] = self._cols[name][start:stop]
+        return view
+
+    def tail(self, n):
+        """Last `n` rows; value columns are memmap views, Date is converted"""
+        n = min(n, self._n)
+        return self._slice(self._n - n, self._n)
+
+    def between(self, start=None, end=None):
+        """Rows with start <= Date <= end"""
+        ts = self._cols[DATE_COL]
+        lo = 0 if start is None else np.searchsorted(ts, to_timestamps([start])[0], side='left')
+        if end is None:
+            hi = self._n
+        elif self.unit == 'D':
+            # Inclusive of the whole end day
+            hi = np.searchsorted(ts, to_timestamps([end])[0] + 86400, side='left')
+        else:
+            hi = np.searchsorted(ts, to_timestamps([end])[0], side='right')
+        return self._slice(lo, hi)
+
+    def between_timestamps(self, start=None, end=None):
+        """Rows with start <= epoch seconds <= end"""
+        ts = self._cols[DATE_COL]
+        lo = 0 if start is None else np.searchsorted(ts, start, side='left')
+        hi = self._n if end is None else np.searchsorted(ts, end, side='right')
+        return self._slice(lo, hi)
+
+    def column(self, name):
+        if name == DATE_COL:
+            return self._cols[DATE_COL].astype('datetime64[s]').astype(f'datetime64[{self.unit}]')
+        return self._cols[name]
+
+    def last_date(self):
+        return self.tail(1)[DATE_COL][0] if self._n else None
+
+
+def benchmark(csv_path, repeats=5):
+    """Cold-load time of the full CSV parse versus memory-mapping the store"""
+    import pandas as pd
+    path = store_path(csv_path)
+    if not exists(path):
+        append_dataframe(path, pd.read_csv(csv_path))
+
+    def best_of(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def load_csv():
+        df = pd.read_csv(csv_path).sort_values(DATE_COL)
+        return df['BTC_Close'].values[-1]
+
+    def load_store():
+        return open_columns(path)['BTC_Close'][-1]
+
+    def last_date_csv():
+        return pd.read_csv(csv_path).iloc[-1][DATE_COL]
+
+    csv_time = best_of(load_csv)
+    store_time = best_of(load_store)
+    return {
+        'rows': read_header(path)['n_rows'],
+        'csv_load_ms': csv_time * 1000,
+        'store_load_ms': store_time * 1000,
+        'speedup': csv_time / store_time if store_time > 0 else float('inf'),
+        'csv_last_date_ms': best_of(last_date_csv) * 1000,
+        'store_last_date_ms': best_of(lambda: last_date(path)) * 1000,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Columnar OHLCV store tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_import = sub.add_parser('import', help='Build a store from a CSV')
+    p_import.add_argument('csv')
+    p_export = sub.add_parser('export', help='Export a store to CSV')
+    p_export.add_argument('store')
+    p_export.add_argument('csv')
+    p_bench = sub.add_parser('bench', help='Compare cold-load time against the CSV')
+    p_bench.add_argument('csv')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        import pandas as pd
+        rows = append_dataframe(store_path(args.csv), pd.read_csv(args.csv))
+        print(f"✅ Imported {rows} rows into {store_path(args.csv)}")
+    elif args.command == 'export':
+        rows = export_csv(args.store, args.csv)
+        print(f"✅ Exported {rows} rows to {args.csv}")
+    else:
+        result = benchmark(args.csv)
+        print(f"Rows: {result['rows']}")
+        print(f"CSV load:        {result['csv_load_ms']:.2f} ms")
+        print(f"Store load:      {result['store_load_ms']:.3f} ms ({result['speedup']:.0f}x faster)")
+        print(f"CSV last date:   {result['csv_last_date_ms']:.2f} ms")
+        print(f"Store last date: {result['store_last_date_ms']:.3f} ms")
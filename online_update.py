@@ -0,0 +1,396 @@
+"""
+Online Model Updates
+Fine-tunes the published market model on recent candles instead of
+retraining it from scratch, then publishes it as a new version.
+
+An update:
+
+1. Loads the published model and scaler and the last `window` rows of
+   data (the columnar store makes this a tail read, not a CSV parse).
+2. Handles range drift. When recent rows fall outside the scaler's fitted
+   min/max (a new all-time high), the range is widened with some headroom
+   instead of refitting. The first LSTM layer's input weights and the
+   output layer are rescaled by the same affine change, so the widened
+   model gives the same prices as before.
+3. Fine-tunes for a few epochs at a low learning rate on every window
+   except the newest `holdout` ones.
+4. Scores the old and the new model on the holdout, and publishes only if
+   the new one is no worse.
+5. Saves the model, scaler, NumPy export and a JSON manifest under
+   models/versions/, then swaps each into place with os.replace. The
+   model registry reloads on file change, so servers pick up the new
+   version without a restart.
+
+    python online_update.py update              # after python data_engine.py
+    python online_update.py versions
+    python online_update.py publish 20260101120000-3fa2c1   # roll back
+    python online_update.py bench --epochs 50   # update vs full retrain
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import inference
+import market_data
+import model_registry
+import rollups
+import training
+
+
+VERSIONS_DIR = 'models/versions'
+WINDOW_DAYS = 365  # rows fine-tuned on, before the holdout
+HOLDOUT_DAYS = 30
+EPOCHS = 5
+LEARNING_RATE = 1e-4
+HEADROOM = 0.25  # widen a drifted range by this fraction of its span
+TOLERANCE = 0.0  # publish when holdout MSE is at most (1 + TOLERANCE) x the current model's
+KEEP_VERSIONS = 10
+
+
+# -----------------------------------------------------------------------------
+# SCALER DRIFT
+# -----------------------------------------------------------------------------
+def expand_scaler(scaler, rows, headroom=HEADROOM):
+    """
+    (scaler, a, b): a copy of the MinMaxScaler whose range covers `rows`
+    plus headroom, and the per-feature affine map between the two scalings
+    (new = a * old + b). Returns (scaler, None, None) when nothing drifted.
+    """
+    lo, hi = rows.min(axis=0), rows.max(axis=0)
+    if np.all(lo >= scaler.data_min_) and np.all(hi <= scaler.data_max_):
+        return scaler, None, None
+
+    data_min = np.minimum(scaler.data_min_, lo - headroom * (scaler.data_max_ - lo) * (lo < scaler.data_min_))
+    data_max = np.maximum(scaler.data_max_, hi + headroom * (hi - scaler.data_min_) * (hi > scaler.data_max_))
+    # Prices and volumes never go negative
+    data_min = np.where(scaler.data_min_ >= 0, np.maximum(data_min, 0), data_min)
+
+    new = copy.deepcopy(scaler)
+    feature_min, feature_max = scaler.feature_range
+    new.data_min_, new.data_max_ = data_min, data_max
+    new.data_range_ = data_max - data_min
+    new.scale_ = (feature_max - feature_min) / new.data_range_
+    new.min_ = feature_min - data_min * new.scale_
+    a = new.scale_ / scaler.scale_
+    return new, a, new.min_ - scaler.min_ * a
+
+
+def compensate(model, a, b, target=0):
+    """
+    Rescale the first layer's input weights and the output layer in place so
+    the model takes inputs scaled by (a * x + b) and predicts in the same
+    scaling, giving the same prices as before
+    """
+    weighted = [layer for layer in model.layers if layer.get_weights()]
+    first, last = weighted[0], weighted[-1]
+
+    kernel, *rest = first.get_weights()
+    bias = rest[-1]
+    # x_old = (x_new - b) / a, so x_old @ W = x_new @ (W / a) - (b / a) @ W
+    first.set_weights([kernel / a[:, None], *rest[:-1], bias - (b / a) @ kernel])
+
+    out_kernel, out_bias = last.get_weights()
+    last.set_weights([out_kernel * a[target], out_bias * a[target] + b[target]])
+
+
+# -----------------------------------------------------------------------------
+# VALIDATION
+# -----------------------------------------------------------------------------
+def holdout_error(model, scaler, X, y, target=0):
+    """(MSE in scaled units, mean absolute error in price) of next-step predictions"""
+    predicted = np.asarray(model.predict(X, batch_size=256, verbose=0)).reshape(-1)
+    mse = float(np.mean((predicted - y) ** 2))
+    # Differences of scaled values map back to price through the scale alone
+    return mse, float(np.mean(np.abs(predicted - y)) / scaler.scale_[target])
+
+
+# -----------------------------------------------------------------------------
+# VERSIONS
+# -----------------------------------------------------------------------------
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def version_paths(version, model_path=training.MODEL_PATH, scaler_path=training.SCALER_PATH,
+                  versions_dir=VERSIONS_DIR):
+    """Files of one saved version"""
+    model = os.path.join(versions_dir, f'{_stem(model_path)}-{version}.h5')
+    return {
+        'model': model,
+        'scaler': os.path.join(versions_dir, f'{_stem(scaler_path)}-{version}.pkl'),
+        'export': inference.export_path(model),
+        'manifest': os.path.join(versions_dir, f'{_stem(model_path)}-{version}.json'),
+    }
+
+
+def list_versions(model_path=training.MODEL_PATH, versions_dir=VERSIONS_DIR):
+    """Manifests of the saved versions of a model, oldest first; the served one has 'current' set"""
+    if not os.path.isdir(versions_dir):
+        return []
+    prefix = f'{_stem(model_path)}-'
+    manifests = []
+    for name in sorted(os.listdir(versions_dir)):
+        if name.startswith(prefix) and name.endswith('.json'):
+            with open(os.path.join(versions_dir, name)) as f:
+                manifests.append(json.load(f))
+    served = model_registry._file_hash(model_path) if os.path.exists(model_path) else None
+    for manifest in manifests:
+        manifest['current'] = manifest['model_hash'] == served
+    return manifests
+
+
+def _replace(src, dst):
+    """Copy src over dst atomically: readers see the old file or the new one, never a partial one"""
+    tmp = f'{dst}.{os.getpid()}.tmp'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def publish(version, model_path=training.MODEL_PATH, scaler_path=training.SCALER_PATH,
+            versions_dir=VERSIONS_DIR):
+    """
+    Make a saved version the served one (also how to roll back). The NumPy
+    export goes first so a reload never finds it stale, and the model goes
+    last. Each file swaps atomically. A forecast made between the scaler
+    and the model swap is keyed on both versions, so it's recomputed on
+    the next request.
+    """
+    paths = version_paths(version, model_path, scaler_path, versions_dir)
+    if not os.path.exists(paths['manifest']):
+        raise FileNotFoundError(f"No saved version {version} of {model_path}")
+    if os.path.exists(paths['export']):
+        _replace(paths['export'], inference.export_path(model_path))
+    _replace(paths['scaler'], scaler_path)
+    _replace(paths['model'], model_path)
+
+    with open(paths['manifest']) as f:
+        manifest = json.load(f)
+    manifest.pop('current', None)
+    manifest['published_at'] = datetime.now().isoformat(timespec='seconds')
+    with open(paths['manifest'], 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"🚀 Published {os.path.basename(model_path)} version {version}")
+    return manifest
+
+
+def _save_version(model, scaler, manifest, model_path, scaler_path, versions_dir):
+    os.makedirs(versions_dir, exist_ok=True)
+    paths = version_paths(manifest['version'], model_path, scaler_path, versions_dir)
+    model.save(paths['model'])
+    with open(paths['scaler'], 'wb') as f:
+        pickle.dump(scaler, f)
+    inference.export(paths['model'], paths['export'])
+    manifest['model_hash'] = model_registry._file_hash(paths['model'])
+    with open(paths['manifest'], 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return paths
+
+
+def _prune(model_path, scaler_path, versions_dir, keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions"""
+    for manifest in list_versions(model_path, versions_dir)[:-keep]:
+        for path in version_paths(manifest['version'], model_path, scaler_path, versions_dir).values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# -----------------------------------------------------------------------------
+# UPDATE
+# -----------------------------------------------------------------------------
+def update(data_path=training.DATA_PATH, timeframe='1d', features=training.FEATURES, window=WINDOW_DAYS,
+           holdout=HOLDOUT_DAYS, epochs=EPOCHS, learning_rate=LEARNING_RATE, tolerance=TOLERANCE,
+           publish_version=True, force=False, seed=0, model_path=None, scaler_path=None,
+           versions_dir=VERSIONS_DIR):
+    """
+    Fine-tune the published model on the newest rows and publish it if it
+    beats the current one on the holdout
+
+    Returns:
+        dict with status ('published', 'rejected', 'staged' when
+        publish_version is False, or 'up_to_date'), version, holdout
+        errors, scaler drift and per-stage seconds
+    """
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    default_model, default_scaler = training.model_paths(timeframe)
+    model_path = model_path or default_model
+    scaler_path = scaler_path or default_scaler
+    lookback = training.LOOKBACK
+    seconds = {}
+    start = time.perf_counter()
+
+    prefix = training.symbol_prefix(data_path)
+    store = market_data.get_store(data_path) if timeframe == '1d' else rollups.get_store(prefix, timeframe)
+    last_date = str(store.last_date())
+    current = [m for m in list_versions(model_path, versions_dir) if m['current']]
+    if current and current[-1]['last_date'] == last_date and not force:
+        print(f"✅ {os.path.basename(model_path)} is already trained through {last_date}")
+        return {'status': 'up_to_date', 'version': current[-1]['version'], 'last_date': last_date}
+    if holdout < 1:
+        raise ValueError("holdout must be at least 1 window")
+
+    rows = training.load_features(data_path, features, timeframe)[-(window + holdout + lookback):]
+    model = load_model(model_path, compile=False)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    parent = model_registry._file_hash(model_path)
+    seconds['load'] = time.perf_counter() - start
+
+    # New highs (or lows) widen the range; the rescaled model predicts the same prices
+    stage = time.perf_counter()
+    scaler, a, b = expand_scaler(scaler, rows)
+    drift = None
+    if a is not None:
+        compensate(model, a, b)
+        drift = {'data_min': scaler.data_min_.tolist(), 'data_max': scaler.data_max_.tolist()}
+        print(f"📐 Widened scaler range to {drift['data_min']} .. {drift['data_max']}")
+    X, y = training.windows(scaler.transform(rows).astype(np.float32), lookback)
+    X_train, y_train = np.ascontiguousarray(X[:-holdout]), y[:-holdout]
+    X_hold, y_hold = np.ascontiguousarray(X[-holdout:]), y[-holdout:]
+    baseline = holdout_error(model, scaler, X_hold, y_hold)
+    seconds['prepare'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    tf.keras.utils.set_random_seed(seed)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='mean_squared_error')
+    history = model.fit(X_train, y_train, epochs=epochs, batch_size=training.BATCH_SIZE, shuffle=True, verbose=0)
+    seconds['fine_tune'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    candidate = holdout_error(model, scaler, X_hold, y_hold)
+    accepted = candidate[0] <= baseline[0] * (1 + tolerance)
+    seconds['validate'] = time.perf_counter() - stage
+
+    version = f"{datetime.now():%Y%m%d%H%M%S}-{parent[:6]}"
+    manifest = {
+        'version': version,
+        'parent': parent,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'data_path': data_path,
+        'timeframe': timeframe,
+        'features': list(features),
+        'last_date': last_date,
+        'train_windows': len(X_train),
+        'holdout_windows': len(X_hold),
+        'epochs': epochs,
+        'learning_rate': learning_rate,
+        'train_loss': float(history.history['loss'][-1]),
+        'holdout': {'baseline_mse': baseline[0], 'baseline_mae': baseline[1],
+                    'candidate_mse': candidate[0], 'candidate_mae': candidate[1]},
+        'scaler_drift': drift,
+        'accepted': bool(accepted),
+    }
+    result = {'status': 'rejected', 'version': version, **{k: manifest[k] for k in
+                                                             ('last_date', 'holdout', 'scaler_drift')}}
+    if accepted:
+        stage = time.perf_counter()
+        _save_version(model, scaler, manifest, model_path, scaler_path, versions_dir)
+        if publish_version:
+            publish(version, model_path, scaler_path, versions_dir)
+            _prune(model_path, scaler_path, versions_dir)
+        seconds['publish'] = time.perf_counter() - stage
+        result['status'] = 'published' if publish_version else 'staged'
+    else:
+        print(f"⚠️ Fine-tuned model is worse on the holdout "
+              f"({candidate[0]:.6f} vs {baseline[0]:.6f} MSE); keeping the current one")
+    seconds['total'] = time.perf_counter() - start
+    result['seconds'] = seconds
+    return result
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def benchmark(data_path=training.DATA_PATH, epochs=training.EPOCHS, holdout=HOLDOUT_DAYS):
+    """
+    Wall time and holdout price error of an update vs a full retrain, both
+    started from copies of the published model in a temporary directory
+    """
+    from tensorflow.keras.models import load_model
+
+    rows = training.load_features(data_path)
+    X_rows = rows[-(holdout + training.LOOKBACK):]
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'market_model.h5')
+        scaler_path = os.path.join(tmp, 'market_scaler.pkl')
+        shutil.copyfile(training.MODEL_PATH, model_path)
+        shutil.copyfile(training.SCALER_PATH, scaler_path)
+
+        updated = update(data_path, holdout=holdout, publish_version=False, force=True, model_path=model_path,
+                         scaler_path=scaler_path, versions_dir=os.path.join(tmp, 'versions'))
+
+        retrain_model = os.path.join(tmp, 'retrained.h5')
+        retrain_scaler = os.path.join(tmp, 'retrained.pkl')
+        retrained = training.train([data_path], epochs=epochs, model_path=retrain_model, scaler_path=retrain_scaler)
+        with open(retrain_scaler, 'rb') as f:
+            scaler = pickle.load(f)
+        X, y = training.windows(scaler.transform(X_rows).astype(np.float32), training.LOOKBACK)
+        _, retrain_mae = holdout_error(load_model(retrain_model, compile=False), scaler, np.ascontiguousarray(X), y)
+
+    return {
+        'update_seconds': updated['seconds']['total'],
+        'update_stages': updated['seconds'],
+        'update_mae': updated['holdout']['candidate_mae'],
+        'current_mae': updated['holdout']['baseline_mae'],
+        'retrain_seconds': retrained['seconds'],
+        'retrain_epochs': retrained['epochs'],
+        'retrain_mae': retrain_mae,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fine-tune and publish the market model on new candles")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_update = sub.add_parser('update', help='Fine-tune on recent rows and publish if the holdout improves')
+    p_update.add_argument('--data', default=training.DATA_PATH)
+    p_update.add_argument('--timeframe', default='1d', choices=['1d'] + rollups.BASES + rollups.ROLLUPS)
+    p_update.add_argument('--features', nargs='+', default=training.FEATURES)
+    p_update.add_argument('--window', type=int, default=WINDOW_DAYS)
+    p_update.add_argument('--holdout', type=int, default=HOLDOUT_DAYS)
+    p_update.add_argument('--epochs', type=int, default=EPOCHS)
+    p_update.add_argument('--learning-rate', type=float, default=LEARNING_RATE)
+    p_update.add_argument('--tolerance', type=float, default=TOLERANCE)
+    p_update.add_argument('--no-publish', action='store_true', help='Save the version without serving it')
+    p_update.add_argument('--force', action='store_true', help='Update even without new candles')
+    p_versions = sub.add_parser('versions', help='List saved versions')
+    p_versions.add_argument('--timeframe', default='1d', choices=['1d'] + rollups.BASES + rollups.ROLLUPS)
+    p_publish = sub.add_parser('publish', help='Serve a saved version (roll back or forward)')
+    p_publish.add_argument('version')
+    p_publish.add_argument('--timeframe', default='1d', choices=['1d'] + rollups.BASES + rollups.ROLLUPS)
+    p_bench = sub.add_parser('bench', help='Update vs full retrain wall time')
+    p_bench.add_argument('--data', default=training.DATA_PATH)
+    p_bench.add_argument('--epochs', type=int, default=training.EPOCHS, help='Full retrain epochs')
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        r = update(args.data, args.timeframe, args.features, args.window, args.holdout, args.epochs,
+                   args.learning_rate, args.tolerance, not args.no_publish, args.force)
+        if r['status'] != 'up_to_date':
+            h = r['holdout']
+            print(f"{r['status']}: version {r['version']}, holdout MAE ${h['baseline_mae']:,.2f} -> "
+                  f"${h['candidate_mae']:,.2f} in {r['seconds']['total']:.1f}s")
+    elif args.command == 'versions':
+        print(f"  {'Version':<22} {'Last date':<12} {'Holdout MAE':>12} {'Drift':>6} {'Published':<20}")
+        for m in list_versions(training.model_paths(args.timeframe)[0]):
+            print(f"{'*' if m['current'] else ' '} {m['version']:<22} {m['last_date'][:10]:<12} "
+                  f"{m['holdout']['candidate_mae']:>12,.2f} {'yes' if m['scaler_drift'] else 'no':>6} "
+                  f"{m.get('published_at') or '-':<20}")
+    elif args.command == 'publish':
+        publish(args.version, *training.model_paths(args.timeframe))
+    else:
+        r = benchmark(args.data, args.epochs)
+        print(f"Update:       {r['update_seconds']:>8.1f}s  holdout MAE ${r['update_mae']:,.2f} "
+              f"(was ${r['current_mae']:,.2f})")
+        print("              " + ', '.join(f"{k} {v:.2f}s" for k, v in r['update_stages'].items() if k != 'total'))
+        print(f"Full retrain: {r['retrain_seconds']:>8.1f}s  holdout MAE ${r['retrain_mae']:,.2f} "
+              f"({r['retrain_epochs']} epochs)")
+        print(f"Speedup:      {r['retrain_seconds'] / r['update_seconds']:>8.1f}x")
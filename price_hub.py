@@ -0,0 +1,335 @@
+"""
+Price Hub
+Latest price of every tracked symbol, fed by one upstream and fanned out to
+any number of subscribers over server-sent events.
+
+The upstream is a pluggable PriceFeed: a single Binance poller that fetches
+every symbol in one request, or a replay of recorded ticks for tests and
+benchmarks. Each tick is encoded once; subscribers wait on one condition
+and always receive the newest price per symbol, so a slow client skips
+stale ticks instead of queueing them.
+"""
+import abc
+import argparse
+import csv
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+
+import metrics
+
+
+BINANCE_API_URL = os.environ.get('BINANCE_API_URL', 'https://api.binance.com')
+POLL_INTERVAL = 1.0  # seconds
+HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+
+
+# -----------------------------------------------------------------------------
+# FEEDS
+# -----------------------------------------------------------------------------
+class PriceFeed(abc.ABC):
+    """
+    Interface for an upstream price source.
+
+    run() calls publish(symbol, price, timestamp) for every tick until `stop`
+    is set, then returns.
+    """
+    name = 'base'
+
+    @abc.abstractmethod
+    def run(self, symbols, publish, stop):
+        """Publish ticks for `symbols` until `stop` is set"""
+
+
+class BinancePollingFeed(PriceFeed):
+    """One /api/v3/ticker/price request per interval covering every symbol"""
+    name = 'binance'
+
+    def __init__(self, base_url=BINANCE_API_URL, interval=POLL_INTERVAL, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.interval = interval
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def run(self, symbols, publish, stop):
+        params = {'symbols': json.dumps(symbols, separators=(',', ':'))}
+        failing = False
+        while not stop.is_set():
+            try:
+                with metrics.upstream('binance_prices'):
+                    response = self.session.get(f'{self.base_url}/api/v3/ticker/price',
+                                                params=params, timeout=self.timeout)
+                    response.raise_for_status()
+                now = time.time()
+                for tick in response.json():
+                    publish(tick['symbol'], float(tick['price']), now)
+                failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"⚠️ Price poll failed: {e}")
+                failing = True
+            stop.wait(self.interval)
+
+
+class ReplayFeed(PriceFeed):
+    """
+    Recorded ticks (timestamp, symbol, price) replayed at `speed` times real
+    time; speed 0 replays as fast as possible. With `restamp`, ticks are
+    published with the current time instead of the recorded one.
+    """
+    name = 'replay'
+
+    def __init__(self, ticks, speed=1.0, loop=False, restamp=False):
+        self.ticks = load_ticks(ticks) if isinstance(ticks, str) else list(ticks)
+        self.speed = speed
+        self.loop = loop
+        self.restamp = restamp
+
+    def run(self, symbols, publish, stop):
+        wanted = set(symbols)
+        while self.ticks:
+            start, first = time.monotonic(), self.ticks[0][0]
+            for timestamp, symbol, price in self.ticks:
+                if self.speed > 0:
+                    delay = (timestamp - first) / self.speed - (time.monotonic() - start)
+                    if delay > 0 and stop.wait(delay):
+                        return
+                if stop.is_set():
+                    return
+                if symbol in wanted:
+                    publish(symbol, price, time.time() if self.restamp else timestamp)
+            if not self.loop:
+                return
+
+
+def load_ticks(path):
+    """Ticks from a CSV with timestamp,symbol,price columns, oldest first"""
+    with open(path, newline='') as f:
+        return [(float(r['timestamp']), r['symbol'], float(r['price'])) for r in csv.DictReader(f)]
+
+
+def save_ticks(path, ticks):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'symbol', 'price'])
+        writer.writerows(ticks)
+
+
+def synthetic_ticks(symbols, n, interval=0.01, seed=0):
+    """Random-walk ticks: `n` ticks round-robin over `symbols`, `interval` seconds apart"""
+    rng = random.Random(seed)
+    prices = {s: 100.0 * (i + 1) for i, s in enumerate(symbols)}
+    ticks = []
+    for k in range(n):
+        symbol = symbols[k % len(symbols)]
+        prices[symbol] *= 1 + rng.gauss(0, 0.001)
+        ticks.append((k * interval, symbol, round(prices[symbol], 6)))
+    return ticks
+
+
+def feed_from_config(spec):
+    """'binance' or 'replay:<ticks.csv>' (looped at real time)"""
+    if spec.startswith('replay:'):
+        return ReplayFeed(spec[len('replay:'):], loop=True)
+    if spec == 'binance':
+        return BinancePollingFeed()
+    raise ValueError(f"Unknown price feed {spec!r}")
+
+
+# -----------------------------------------------------------------------------
+# HUB
+# -----------------------------------------------------------------------------
+class PriceHub:
+    def __init__(self, feed, symbols):
+        self.feed = feed
+        self.symbols = list(symbols)
+        self._seq = 0
+        self._prices = {}  # symbol -> tick dict
+        self._messages = {}  # symbol -> (seq, encoded SSE event)
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.ticks = 0
+        self.subscribers = 0
+
+    def start(self):
+        """Start the feed thread (once per process: threads don't survive fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            threading.Thread(
+                target=self.feed.run, args=(self.symbols, self.publish, self._stop),
+                name=f'price-feed-{self.feed.name}', daemon=True,
+            ).start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Stop the feed and end every open stream"""
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+
+    def publish(self, symbol, price, timestamp):
+        tick = {'symbol': symbol, 'price': price, 'time': timestamp}
+        message = f"data: {json.dumps(tick)}\n\n".encode()
+        with self._changed:
+            self._seq += 1
+            self._prices[symbol] = tick
+            self._messages[symbol] = (self._seq, message)
+            self.ticks += 1
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """Latest tick of every symbol seen so far"""
+        self.start()
+        return dict(self._prices)
+
+    def get_price(self, symbol, timeout=0.0):
+        """Latest price, waiting up to `timeout` seconds for a first tick; None if there is none"""
+        self.start()
+        tick = self._prices.get(symbol)
+        if tick is None and timeout > 0 and symbol in self.symbols:
+            with self._changed:
+                self._changed.wait_for(lambda: symbol in self._prices or self._stop.is_set(), timeout)
+            tick = self._prices.get(symbol)
+        return tick['price'] if tick is not None else None
+
+    def stream(self, symbols=None, heartbeat=HEARTBEAT, max_seconds=None):
+        """
+        SSE chunks: the latest tick of each symbol on connect, then every
+        change. Ends after `max_seconds` (clients reconnect) or on stop().
+        """
+        self.start()
+        symbols = list(symbols or self.symbols)
+        seen = dict.fromkeys(symbols, 0)
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        stop = self._stop
+
+        def pending():
+            return [m for s in symbols
+                    for seq, m in [self._messages.get(s, (0, None))] if seq > seen[s]]
+
+        with self._changed:
+            self.subscribers += 1
+        try:
+            last = -1
+            while not stop.is_set():
+                with self._changed:
+                    # Cheap wake-up test; which symbols changed is checked after
+                    woke = self._changed.wait_for(lambda: stop.is_set() or self._seq != last, heartbeat)
+                    last = self._seq
+                    chunks = pending()
+                    for s in symbols:
+                        seen[s] = self._messages.get(s, (0,))[0]
+                if chunks:
+                    yield b''.join(chunks)
+                elif not woke:
+                    yield b': keep-alive\n\n'
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+        finally:
+            with self._changed:
+                self.subscribers -= 1
+
+    def stats(self):
+        return {
+            'feed': self.feed.name,
+            'running': self._pid == os.getpid() and not self._stop.is_set(),
+            'symbols': len(self._prices),
+            'ticks': self.ticks,
+            'subscribers': self.subscribers,
+        }
+
+
+# -----------------------------------------------------------------------------
+# TOOLS
+# -----------------------------------------------------------------------------
+def record(path, symbols, seconds, interval=POLL_INTERVAL):
+    """Record live Binance ticks to a CSV for later replay"""
+    ticks, stop = [], threading.Event()
+    timer = threading.Timer(seconds, stop.set)
+    timer.start()
+    BinancePollingFeed(interval=interval).run(symbols, lambda *tick: ticks.append(tick), stop)
+    save_ticks(path, ticks)
+    return len(ticks)
+
+
+def benchmark(subscribers=1000, symbols=None, rate=50, seconds=5.0, ticks_path=None):
+    """
+    Fan replayed ticks out to many in-process subscribers and report
+    delivery latency (publish -> subscriber) and delivered events per second
+    """
+    symbols = symbols or ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT', 'ADAUSDT',
+                          'XRPUSDT', 'DOTUSDT', 'DOGEUSDT', 'AVAXUSDT', 'POLUSDT']
+    ticks = load_ticks(ticks_path) if ticks_path else synthetic_ticks(symbols, int(rate * seconds), 1 / rate)
+    hub = PriceHub(ReplayFeed(ticks, speed=1.0, restamp=True), symbols)
+
+    latencies = [[] for _ in range(subscribers)]
+    ready = threading.Barrier(subscribers + 1)
+
+    def subscriber(k):
+        # Half the clients watch one symbol, half watch everything
+        watch = [symbols[k % len(symbols)]] if k % 2 else symbols
+        stream = hub.stream(watch, heartbeat=1.0)
+        ready.wait()
+        for chunk in stream:
+            now = time.time()
+            for event in chunk.split(b'\n\n'):
+                if event.startswith(b'data: '):
+                    latencies[k].append(now - json.loads(event[6:])['time'])
+
+    threads = [threading.Thread(target=subscriber, args=(k,), daemon=True) for k in range(subscribers)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    hub.start()
+    time.sleep(seconds + 0.5)
+    hub.stop()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.asarray(l) for l in latencies]) * 1000
+    return {
+        'subscribers': subscribers,
+        'ticks': hub.ticks,
+        'events': int(len(all_latencies)),
+        'events_per_s': len(all_latencies) / elapsed,
+        'p50_ms': float(np.percentile(all_latencies, 50)),
+        'p99_ms': float(np.percentile(all_latencies, 99)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Price hub tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_record = sub.add_parser('record', help='Record live Binance ticks to a CSV')
+    p_record.add_argument('out')
+    p_record.add_argument('--seconds', type=float, default=60)
+    p_record.add_argument('--symbols', nargs='+', default=['BTCUSDT', 'ETHUSDT'])
+    p_bench = sub.add_parser('bench', help='Fan replayed ticks out to simulated subscribers')
+    p_bench.add_argument('--subscribers', type=int, nargs='+', default=[100, 1000, 2000])
+    p_bench.add_argument('--rate', type=float, default=50, help='Ticks per second')
+    p_bench.add_argument('--seconds', type=float, default=5)
+    p_bench.add_argument('--ticks', help='Recorded ticks CSV (default: synthetic random walk)')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        n = record(args.out, args.symbols, args.seconds)
+        print(f"✅ Recorded {n} ticks to {args.out}")
+    else:
+        print(f"{'Subscribers':>11} {'Ticks':>6} {'Events':>8} {'Events/s':>9} {'p50':>8} {'p99':>8}")
+        for n in args.subscribers:
+            r = benchmark(n, rate=args.rate, seconds=args.seconds, ticks_path=args.ticks)
+            print(f"{n:>11} {r['ticks']:>6} {r['events']:>8} {r['events_per_s']:>9.0f} "
+                  f"{r['p50_ms']:>6.2f}ms {r['p99_ms']:>6.2f}ms")
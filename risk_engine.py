@@ -0,0 +1,274 @@
+"""
+Risk Engine
+Monte Carlo and bootstrap distributions around a backtest's point metrics.
+
+A backtest is one path; resampling it shows how much its return and
+drawdown could vary:
+
+- bootstrap: circular block bootstrap of the daily equity returns. Blocks
+  of consecutive days are drawn so volatility clustering survives.
+- trades: Monte Carlo over the closed trades, drawn with replacement, so
+  the order and mix of winners and losers vary.
+
+All paths of a chunk are simulated at once as (paths, horizon) arrays, and
+chunks are capped at CHUNK_ELEMENTS values to bound memory. Chunks can be
+spread over worker processes. Each chunk has its own seed spawned from
+`seed`, so results don't depend on the worker count.
+
+    python risk_engine.py run --days 365 --paths 10000
+    python risk_engine.py bench --paths 10000 100000 --workers 1 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import backtest_engine
+
+
+METHODS = ['bootstrap', 'trades']
+PATHS = 10000
+BLOCK_DAYS = 5
+CONFIDENCE = 0.95
+RUIN = 0.5  # ruin is losing this fraction of the starting capital
+CHUNK_ELEMENTS = 2_000_000  # values per (paths, horizon) array, about 16MB of float64
+
+
+def daily_returns(equity):
+    """Day-over-day returns of an equity curve"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity[1:] / equity[:-1] - 1
+
+
+def block_indices(rng, n, paths, horizon, block):
+    """(paths, horizon) indices into n samples, in runs of `block` consecutive ones (wrapping around)"""
+    block = max(1, min(block, n))
+    starts = rng.integers(0, n, size=(paths, -(-horizon // block)))
+    idx = (starts[:, :, None] + np.arange(block)) % n
+    return idx.reshape(paths, -1)[:, :horizon]
+
+
+def simulate_chunk(growth, paths, horizon, block, seed):
+    """
+    Per-path total return, max drawdown (percent) and lowest equity
+    (fraction of the start) for `paths` resampled paths
+
+    `growth` holds 1 + return per sample; block=1 draws samples independently
+    """
+    rng = np.random.default_rng(seed)
+    if block > 1:
+        idx = block_indices(rng, len(growth), paths, horizon, block)
+    else:
+        idx = rng.integers(0, len(growth), size=(paths, horizon))
+    # Column 0 is the starting capital so drawdowns count losses from day one
+    equity = np.empty((paths, horizon + 1))
+    equity[:, 0] = 1.0
+    np.cumprod(growth[idx], axis=1, out=equity[:, 1:])
+    return equity[:, -1] - 1, backtest_engine._max_drawdown(equity), equity.min(axis=1)
+
+
+def _simulate_task(args):
+    return simulate_chunk(*args)
+
+
+def simulate_paths(returns, paths=PATHS, horizon=None, block=BLOCK_DAYS, seed=0, workers=1):
+    """
+    Resample `returns` into `paths` paths of `horizon` steps
+
+    Returns:
+        (total_return, max_drawdown, min_equity) arrays with one value per path
+    """
+    growth = 1 + np.asarray(returns, dtype=np.float64)
+    horizon = horizon or len(growth)
+    chunk = max(1, CHUNK_ELEMENTS // horizon)
+    sizes = [min(chunk, paths - lo) for lo in range(0, paths, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(growth, size, horizon, block, s) for size, s in zip(sizes, seeds)]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        # spawn: never fork a parent that may already hold TensorFlow state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+            parts = list(pool.map(_simulate_task, tasks))
+    else:
+        parts = [simulate_chunk(*task) for task in tasks]
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def summarize(total_return, max_drawdown, min_equity, confidence=CONFIDENCE, ruin=RUIN):
+    """
+    Confidence intervals and tail risk over simulated paths (percent)
+
+    var/cvar are the loss over the horizon at `confidence` and the mean loss
+    beyond it (negative when even the tail makes money); risk_of_ruin is the
+    share of paths that ever lose `ruin` of the starting capital.
+    """
+    alpha = 1 - confidence
+    total_return = total_return * 100
+
+    def interval(values):
+        low, median, high = np.quantile(values, [alpha / 2, 0.5, 1 - alpha / 2])
+        return {'mean': float(values.mean()), 'low': float(low), 'median': float(median), 'high': float(high)}
+
+    cutoff = np.quantile(total_return, alpha)
+    return {
+        'total_return': interval(total_return),
+        'max_drawdown': interval(max_drawdown),
+        'var': float(-cutoff),
+        'cvar': float(-total_return[total_return <= cutoff].mean()),
+        'probability_of_loss': float(np.mean(total_return < 0) * 100),
+        'risk_of_ruin': float(np.mean(min_equity <= 1 - ruin) * 100),
+    }
+
+
+def analyze(backtest, paths=PATHS, horizon=None, block=BLOCK_DAYS, confidence=CONFIDENCE,
+            ruin=RUIN, methods=METHODS, seed=0, workers=1):
+    """
+    Risk report for a run_backtest() result
+
+    Args:
+        backtest: dict from backtest_engine.run_backtest
+        paths: Paths per method
+        horizon: Days per path (default: the backtest's length)
+        block: Days per bootstrap block
+        confidence: Level of the intervals and VaR/CVaR
+        ruin: Fraction of the starting capital whose loss counts as ruin
+        methods: Any of METHODS; trades is skipped with fewer than 2 trades
+        seed: Seed for reproducible paths
+        workers: Processes to spread chunks over
+
+    Returns:
+        dict with the backtest's point metrics and one summary per method
+    """
+    # The curve starts at the initial capital: no exit is booked on the first day
+    returns = daily_returns([day['equity'] for day in backtest['equity_curve']])
+    if len(returns) == 0:
+        raise ValueError("Backtest is too short to resample")
+    trade_returns = np.array([trade['return'] for trade in backtest['trades']]) / 100
+    horizon = horizon or len(returns)
+
+    start = time.perf_counter()
+    report = {
+        'paths': paths,
+        'horizon_days': horizon,
+        'block_days': block,
+        'confidence': confidence,
+        'ruin': ruin,
+        'seed': seed,
+        'backtest': {name: backtest[name] for name in
+                     ('total_return', 'max_drawdown', 'win_rate', 'profit_factor', 'total_trades')},
+    }
+    if 'bootstrap' in methods:
+        report['bootstrap'] = summarize(*simulate_paths(returns, paths, horizon, block, seed, workers),
+                                        confidence, ruin)
+    if 'trades' in methods:
+        # Scale the trade count to the horizon, keeping the backtest's trade frequency
+        n_trades = max(1, round(len(trade_returns) * horizon / len(returns)))
+        report['trades'] = None if len(trade_returns) < 2 else dict(
+            summarize(*simulate_paths(trade_returns, paths, n_trades, 1, seed, workers), confidence, ruin),
+            trades_per_path=n_trades,
+        )
+    report['elapsed_seconds'] = time.perf_counter() - start
+    return report
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def synthetic_returns(days=365, seed=0):
+    """Fat-tailed daily returns with mostly flat days, like a strategy that's often out of the market"""
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_t(3, days) * 0.02 + 0.001
+    return np.where(rng.random(days) < 0.6, 0.0, returns)
+
+
+def _loop_paths(returns, paths, horizon, block, seed):
+    """Reference: one path at a time, the way a per-path loop would do it"""
+    rng = np.random.default_rng(seed)
+    n = len(returns)
+    out = []
+    for _ in range(paths):
+        days = []
+        while len(days) < horizon:
+            start = rng.integers(n)
+            days.extend(returns[(start + k) % n] for k in range(block))
+        equity = np.cumprod(1 + np.array(days[:horizon]))
+        peak = np.maximum.accumulate(np.concatenate([[1.0], equity]))
+        out.append((equity[-1] - 1, np.max(1 - np.concatenate([[1.0], equity]) / peak) * 100))
+    return out
+
+
+def benchmark(path_counts=(10000, 100000), worker_counts=(1, os.cpu_count() or 1), days=365,
+              block=BLOCK_DAYS, loop_paths=200):
+    """Wall time of simulate_paths() + summarize() per path count and worker count"""
+    returns = synthetic_returns(days)
+    rows = []
+    start = time.perf_counter()
+    _loop_paths(returns, loop_paths, days, block, 0)
+    per_path = (time.perf_counter() - start) / loop_paths
+    for paths in path_counts:
+        rows.append({'paths': paths, 'mode': 'per-path loop (extrapolated)', 'seconds': per_path * paths})
+        for workers in dict.fromkeys(worker_counts):
+            start = time.perf_counter()
+            summarize(*simulate_paths(returns, paths, days, block, seed=0, workers=workers))
+            seconds = time.perf_counter() - start
+            rows.append({'paths': paths, 'mode': f'vectorized, {workers} worker(s)', 'seconds': seconds})
+    return rows
+
+
+def _print_summary(name, summary):
+    tr, dd = summary['total_return'], summary['max_drawdown']
+    print(f"\n{name}")
+    print(f"  Return:       {tr['median']:8.2f}%  [{tr['low']:.2f}%, {tr['high']:.2f}%]")
+    print(f"  Max Drawdown: {dd['median']:8.2f}%  [{dd['low']:.2f}%, {dd['high']:.2f}%]")
+    print(f"  VaR / CVaR:   {summary['var']:8.2f}% / {summary['cvar']:.2f}%")
+    print(f"  P(loss):      {summary['probability_of_loss']:8.2f}%")
+    print(f"  Risk of Ruin: {summary['risk_of_ruin']:8.2f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo / bootstrap risk around a backtest")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='Backtest, then resample it')
+    p_run.add_argument('--days', type=int, default=365)
+    p_run.add_argument('--capital', type=float, default=10000)
+    p_run.add_argument('--threshold', type=float, default=backtest_engine.ENTRY_THRESHOLD)
+    p_run.add_argument('--hold', type=int, default=backtest_engine.HOLD_DAYS)
+    p_run.add_argument('--paths', type=int, default=PATHS)
+    p_run.add_argument('--horizon', type=int, default=None, help='Days per path (default: --days)')
+    p_run.add_argument('--block', type=int, default=BLOCK_DAYS)
+    p_run.add_argument('--confidence', type=float, default=CONFIDENCE)
+    p_run.add_argument('--ruin', type=float, default=RUIN)
+    p_run.add_argument('--seed', type=int, default=0)
+    p_run.add_argument('--workers', type=int, default=1)
+    p_bench = sub.add_parser('bench', help='Vectorized vs per-path simulation time')
+    p_bench.add_argument('--paths', type=int, nargs='+', default=[10000, 100000])
+    p_bench.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    p_bench.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        backtest = backtest_engine.run_backtest(days=args.days, initial_capital=args.capital,
+                                                threshold=args.threshold, hold_days=args.hold)
+        if 'error' in backtest:
+            print(f"Error: {backtest['error']}")
+        else:
+            report = analyze(backtest, args.paths, args.horizon, args.block, args.confidence,
+                             args.ruin, seed=args.seed, workers=args.workers)
+            print(f"Backtest: {backtest['total_return']:.2f}% return, {backtest['max_drawdown']:.2f}% max drawdown, "
+                  f"{backtest['total_trades']} trades")
+            _print_summary(f"Block bootstrap ({report['paths']} paths, {report['horizon_days']} days, "
+                           f"{report['block_days']}-day blocks)", report['bootstrap'])
+            if report['trades'] is None:
+                print("\nTrade Monte Carlo skipped: fewer than 2 closed trades")
+            else:
+                _print_summary(f"Trade Monte Carlo ({report['trades']['trades_per_path']} trades per path)",
+                               report['trades'])
+            print(f"\n{report['confidence']:.0%} intervals, computed in {report['elapsed_seconds']:.2f}s")
+    else:
+        print(f"{'Paths':>8} {'Mode':<32} {'Time':>10}")
+        for r in benchmark(args.paths, args.workers, args.days):
+            print(f"{r['paths']:>8} {r['mode']:<32} {r['seconds']:>9.3f}s")
@@ -0,0 +1,365 @@
+"""
+Rollup Store
+Intraday candles at every chart timeframe, built from one base resolution.
+
+Base candles (1m or 1h) are appended to a columnar store in the
+ohlcv_store format (data/BTC_USD_1m.ohlcv), and each coarser timeframe is
+kept pre-aggregated in its own store next to it (data/BTC_USD_1h.ohlcv,
+..._1d, ..._1w, ..._1mo). When base bars arrive, each rollup re-aggregates
+only its still-open last bucket plus the new bars and writes them over its
+tail. A range query at any timeframe is then a binary search and a slice
+of memory-mapped columns, with no resampling over millions of minute bars.
+
+    python rollups.py update --symbol BTCUSDT --base 1m --days 30   # from Binance, resumes
+    python rollups.py import minute_bars.csv --prefix BTC --base 1m
+    python rollups.py bench --rows 1000000 5000000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import kline_cache
+import ohlcv_store
+
+
+DATA_DIR = 'data'
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Bucket widths in seconds; None = calendar month
+TIMEFRAMES = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '4h': 14400,
+    '1d': 86400, '1w': 604800, '1M': None,
+}
+BASES = ['1m', '1h']
+ROLLUPS = ['30m', '1h', '4h', '1d', '1w', '1M']
+WEEK_OFFSET = 4 * 86400  # 1970-01-01 was a Thursday; weeks start on Monday
+BINANCE_LIMIT = 1000  # klines per request
+
+
+def label(timeframe):
+    """File-safe name: '1M' (month) and '1m' (minute) differ only in case"""
+    return '1mo' if timeframe == '1M' else timeframe
+
+
+def store_dir(prefix, timeframe, data_dir=None):
+    return os.path.join(data_dir or DATA_DIR, f'{prefix}_USD_{label(timeframe)}.ohlcv')
+
+
+def rollups_for(base):
+    """Timeframes kept pre-aggregated on top of `base`"""
+    return [tf for tf in ROLLUPS if TIMEFRAMES[tf] is None or TIMEFRAMES[tf] > TIMEFRAMES[base]]
+
+
+def base_of(prefix, data_dir=None):
+    """Base timeframe stored for `prefix`, or None"""
+    return next((b for b in BASES if ohlcv_store.exists(store_dir(prefix, b, data_dir))), None)
+
+
+def available(prefix, timeframe, data_dir=None):
+    return ohlcv_store.exists(store_dir(prefix, timeframe, data_dir))
+
+
+# -----------------------------------------------------------------------------
+# AGGREGATION
+# -----------------------------------------------------------------------------
+def bucket_start(ts, timeframe):
+    """Start (epoch seconds) of the `timeframe` bucket holding each timestamp"""
+    ts = np.asarray(ts, dtype=np.int64)
+    seconds = TIMEFRAMES[timeframe]
+    if seconds is None:
+        return ts.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    offset = WEEK_OFFSET if timeframe == '1w' else 0
+    return (ts - offset) // seconds * seconds + offset
+
+
+def bucket_end(ts, timeframe):
+    """End (exclusive) of the bucket starting at each timestamp"""
+    ts = np.asarray(ts, dtype=np.int64)
+    if TIMEFRAMES[timeframe] is None:
+        months = ts.astype('datetime64[s]').astype('datetime64[M]') + 1
+        return months.astype('datetime64[s]').astype(np.int64)
+    return ts + TIMEFRAMES[timeframe]
+
+
+def aggregate(ts, open_, high, low, close, volume, timeframe):
+    """
+    Sorted bars -> (bucket start timestamps, {Open..Volume}) at `timeframe`;
+    buckets without any input bar are left out
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    if len(ts) == 0:
+        return ts, {c: np.empty(0) for c in COLUMNS}
+    buckets = bucket_start(ts, timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return buckets[starts], {
+        'Open': np.asarray(open_)[starts],
+        'High': np.maximum.reduceat(high, starts),
+        'Low': np.minimum.reduceat(low, starts),
+        'Close': np.asarray(close)[ends],
+        'Volume': np.add.reduceat(volume, starts),
+    }
+
+
+# -----------------------------------------------------------------------------
+# WRITE SIDE
+# -----------------------------------------------------------------------------
+def _columns(prefix):
+    return [f'{prefix}_{c}' for c in COLUMNS]
+
+
+def ingest(prefix, base, timestamps, values, data_dir=None):
+    """
+    Append base bars and bring every rollup up to date
+
+    Args:
+        prefix: Symbol prefix, e.g. BTC
+        base: Base timeframe ('1m' or '1h')
+        timestamps: int64 epoch seconds of each bar's open, ascending
+        values: dict of Open/High/Low/Close/Volume arrays
+
+    Returns:
+        Number of new base bars (bars not newer than the store are skipped)
+    """
+    path = store_dir(prefix, base, data_dir)
+    if not ohlcv_store.exists(path):
+        ohlcv_store.create(path, _columns(prefix))
+    added = ohlcv_store.append(path, timestamps, {f'{prefix}_{c}': values[c] for c in COLUMNS})
+
+    last_ts = ohlcv_store.read_header(path)['last_ts']
+    if last_ts is None:
+        return added
+    base_cols = ohlcv_store.open_columns(path)
+    for timeframe in rollups_for(base):
+        # Also heals a rollup left behind by an interrupted ingest
+        rollup = store_dir(prefix, timeframe, data_dir)
+        if (added or not ohlcv_store.exists(rollup)
+                or ohlcv_store.read_header(rollup)['last_ts'] != bucket_start([last_ts], timeframe)[0]):
+            update_rollup(prefix, base, timeframe, data_dir, base_cols)
+    return added
+
+
+def update_rollup(prefix, base, timeframe, data_dir=None, base_cols=None):
+    """Re-aggregate the rollup's open bucket and every base bar after it"""
+    path = store_dir(prefix, timeframe, data_dir)
+    if not ohlcv_store.exists(path):
+        ohlcv_store.create(path, _columns(prefix))
+    last_ts = ohlcv_store.read_header(path)['last_ts']
+
+    base_cols = base_cols or ohlcv_store.open_columns(store_dir(prefix, base, data_dir))
+    ts = base_cols[ohlcv_store.DATE_COL]
+    lo = 0 if last_ts is None else int(np.searchsorted(ts, last_ts, side='left'))
+    if lo == len(ts):
+        return 0
+    buckets, bars = aggregate(ts[lo:], *(base_cols[c][lo:] for c in _columns(prefix)), timeframe)
+    return ohlcv_store.append(path, buckets, {f'{prefix}_{c}': bars[c] for c in COLUMNS}, replace_last=True)
+
+
+def fetch_binance(symbol, base, start_ts, client=None):
+    """Closed `base` klines of `symbol` from `start_ts` (epoch seconds) up to now"""
+    client = client or kline_cache.BinanceKlineClient()
+    now_ms = time.time() * 1000
+    start_ms, rows = start_ts * 1000, []
+    while True:
+        klines = client.get_klines(symbol, base, BINANCE_LIMIT, start_time=start_ms)
+        closed = [k for k in klines if k[6] < now_ms]
+        rows.extend(closed)
+        if len(klines) < BINANCE_LIMIT or len(closed) < len(klines):
+            break
+        start_ms = klines[-1][0] + 1
+    data = np.array([[float(v) for v in k[:6]] for k in rows]).reshape(-1, 6)
+    return (data[:, 0] // 1000).astype(np.int64), dict(zip(COLUMNS, data[:, 1:].T))
+
+
+def update(symbol, base='1m', days=30, data_dir=None, client=None):
+    """Fetch new base bars for a Binance symbol (the last `days` on first run) and ingest them"""
+    prefix = symbol[:-len('USDT')] if symbol.endswith('USDT') else symbol
+    path = store_dir(prefix, base, data_dir)
+    last_ts = ohlcv_store.read_header(path)['last_ts'] if ohlcv_store.exists(path) else None
+    start = last_ts + TIMEFRAMES[base] if last_ts is not None else int(time.time()) - days * 86400
+    ts, values = fetch_binance(symbol, base, start, client)
+    return ingest(prefix, base, ts, values, data_dir)
+
+
+def import_csv(csv_path, prefix, base, data_dir=None, chunksize=1_000_000):
+    """
+    Ingest base bars from a CSV with a Date (or timestamp) column and
+    Open..Volume columns, with or without the symbol prefix
+    """
+    import pandas as pd
+    added = 0
+    for df in pd.read_csv(csv_path, chunksize=chunksize):
+        df.columns = [c[len(prefix) + 1:] if c.startswith(f'{prefix}_') else c for c in df.columns]
+        time_col = 'Date' if 'Date' in df.columns else 'timestamp'
+        ts = ohlcv_store.to_timestamps(df[time_col])
+        added += ingest(prefix, base, ts, {c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS}, data_dir)
+    return added
+
+
+# -----------------------------------------------------------------------------
+# READ SIDE
+# -----------------------------------------------------------------------------
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(prefix, timeframe, data_dir=None):
+    """Shared store of one symbol at one timeframe (base or rollup), re-mapped after writes"""
+    path = os.path.abspath(store_dir(prefix, timeframe, data_dir))
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, ohlcv_store.ColumnarStore(path, unit='s'))
+    return store.refresh()
+
+
+def query(prefix, timeframe, start=None, end=None, data_dir=None):
+    """Bars with start <= open time <= end (epoch seconds) as a dict of column views"""
+    return get_store(prefix, timeframe, data_dir).between_timestamps(start, end)
+
+
+def closed_tail(prefix, timeframe, n, data_dir=None):
+    """Last `n` bars whose bucket has closed (a rollup's last bucket may still be filling)"""
+    store = get_store(prefix, timeframe, data_dir)
+    base = base_of(prefix, data_dir)
+    if base is None or timeframe == base:
+        return store.tail(n)
+    last_bar = ohlcv_store.read_header(store_dir(prefix, base, data_dir))['last_ts'] + TIMEFRAMES[base]
+    view = store.tail(n + 1)
+    dates = view[ohlcv_store.DATE_COL].astype('datetime64[s]').astype(np.int64)
+    keep = len(dates)
+    if keep and bucket_end(dates[-1:], timeframe)[0] > last_bar:
+        keep -= 1
+    lo = max(keep - n, 0)
+    return {k: v[lo:keep] for k, v in view.items()}
+
+
+def resample(prefix, base, timeframe, start=None, end=None, data_dir=None):
+    """The same bars as query(), aggregated on the fly from the base store"""
+    view = query(prefix, base, start, end, data_dir)
+    ts = view[ohlcv_store.DATE_COL].astype('datetime64[s]').astype(np.int64)
+    buckets, bars = aggregate(ts, *(view[c] for c in _columns(prefix)), timeframe)
+    return {ohlcv_store.DATE_COL: buckets.astype('datetime64[s]'), **{f'{prefix}_{c}': bars[c] for c in COLUMNS}}
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def synthetic_bars(n, base='1m', start='2020-01-01', seed=0):
+    """Random-walk bars every `base`, as (timestamps, {Open..Volume})"""
+    rng = np.random.default_rng(seed)
+    step = TIMEFRAMES[base]
+    ts = np.datetime64(start, 's').astype(np.int64) + step * np.arange(n, dtype=np.int64)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.001 * np.sqrt(step / 60), n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    return ts, {
+        'Open': open_, 'High': np.maximum(open_, close) + spread, 'Low': np.minimum(open_, close) - spread,
+        'Close': close, 'Volume': rng.uniform(1, 100, n),
+    }
+
+
+def _median_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def benchmark(rows=1_000_000, base='1m', timeframes=('1h', '4h', '1d', '1w'), span_days=30,
+              repeats=20, appends=200):
+    """
+    Build rollups for `rows` synthetic base bars in a temporary directory,
+    then time incremental appends and range queries (rollup store vs
+    resampling the base bars on the fly, in NumPy and in pandas)
+    """
+    import pandas as pd
+    prefix = 'BENCH'
+    ts, values = synthetic_bars(rows + appends, base)
+    rng = np.random.default_rng(1)
+    result = {'rows': rows}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        ingest(prefix, base, ts[:rows], {c: v[:rows] for c, v in values.items()}, data_dir)
+        result['build_s'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(rows, rows + appends):
+            ingest(prefix, base, ts[i:i + 1], {c: v[i:i + 1] for c, v in values.items()}, data_dir)
+        result['append_ms'] = (time.perf_counter() - start) / appends * 1000
+
+        df = pd.DataFrame({c: v[:rows] for c, v in values.items()}, index=pd.to_datetime(ts[:rows], unit='s'))
+        agg = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+        pandas_rule = {'1h': '1h', '4h': '4h', '1d': '1D', '1w': 'W-MON', '1M': 'MS'}
+        spans = {'span': span_days * 86400, 'full': None}
+
+        result['queries'] = []
+        for timeframe in timeframes:
+            for span_name, span in spans.items():
+                if span is None:
+                    lo, hi = int(ts[0]), int(ts[rows - 1])
+                else:
+                    lo = int(rng.integers(ts[0], ts[rows - 1] - span))
+                    hi = lo + span
+
+                def rollup():
+                    v = query(prefix, timeframe, bucket_start([lo], timeframe)[0], hi, data_dir)
+                    return np.asarray(v[f'{prefix}_Close'])
+
+                def on_the_fly():
+                    return resample(prefix, base, timeframe, lo, hi, data_dir)
+
+                def with_pandas():
+                    return df.loc[pd.Timestamp(lo, unit='s'):pd.Timestamp(hi, unit='s')].resample(
+                        pandas_rule[timeframe], label='left', closed='left').agg(agg).dropna()
+
+                result['queries'].append({
+                    'timeframe': timeframe,
+                    'span': f'{span_days}d' if span else 'all',
+                    'bars': len(rollup()),
+                    'rollup_ms': _median_ms(rollup, repeats),
+                    'numpy_ms': _median_ms(on_the_fly, repeats),
+                    'pandas_ms': _median_ms(with_pandas, max(repeats // 4, 3)),
+                })
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Intraday base candles and their rollups")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_update = sub.add_parser('update', help='Fetch new base bars from Binance and update the rollups')
+    p_update.add_argument('--symbol', nargs='+', default=['BTCUSDT'])
+    p_update.add_argument('--base', choices=BASES, default='1m')
+    p_update.add_argument('--days', type=int, default=30, help='History to fetch on the first run')
+    p_import = sub.add_parser('import', help='Ingest base bars from a CSV')
+    p_import.add_argument('csv')
+    p_import.add_argument('--prefix', default='BTC')
+    p_import.add_argument('--base', choices=BASES, default='1m')
+    p_bench = sub.add_parser('bench', help='Rollup query latency vs resampling on the fly')
+    p_bench.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    p_bench.add_argument('--base', choices=BASES, default='1m')
+    p_bench.add_argument('--span-days', type=int, default=30)
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        for symbol in args.symbol:
+            n = update(symbol, args.base, args.days)
+            print(f"✅ {symbol}: {n} new {args.base} bars, rollups {', '.join(rollups_for(args.base))} updated")
+    elif args.command == 'import':
+        n = import_csv(args.csv, args.prefix, args.base)
+        print(f"✅ Imported {n} {args.base} bars for {args.prefix}")
+    else:
+        for rows in args.rows:
+            r = benchmark(rows, args.base, span_days=args.span_days)
+            print(f"\n{rows:,} {args.base} bars: rollups built in {r['build_s']:.2f}s, "
+                  f"{r['append_ms']:.2f}ms per appended bar (all rollups)")
+            print(f"{'Timeframe':<9} {'Span':>5} {'Bars':>7} {'Rollup':>9} {'NumPy':>9} {'pandas':>9}")
+            for q in r['queries']:
+                print(f"{q['timeframe']:<9} {q['span']:>5} {q['bars']:>7} {q['rollup_ms']:>7.3f}ms "
+                      f"{q['numpy_ms']:>7.2f}ms {q['pandas_ms']:>7.2f}ms")
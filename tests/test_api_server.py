@@ -0,0 +1,145 @@
+"""Flask test-client checks of /api/predict, /api/forecast and the SSE stream cap"""
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import api_server
+import job_queue
+import market_data
+import model_registry
+import price_hub
+
+
+class FakePrices:
+    """Stands in for the price hub so no Binance poller starts"""
+
+    def __init__(self, price):
+        self.price = price
+
+    def get_price(self, symbol, timeout=0.0):
+        return self.price
+
+
+@pytest.fixture
+def client(request, tmp_path, monkeypatch):
+    import tensorflow as tf
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'models').mkdir()
+    rng = np.random.default_rng(0)
+    rows = 200
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, rows)))
+    frame = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=rows, freq='D').strftime('%Y-%m-%d'),
+        'BTC_Close': close,
+        'BTC_Volume': rng.uniform(1e9, 5e9, rows),
+    })
+    frame.to_csv(api_server.DATA_PATH, index=False)
+
+    tf.keras.utils.set_random_seed(0)
+    window = getattr(request, 'param', 60)
+    model = tf.keras.Sequential([tf.keras.Input((window, 2)), tf.keras.layers.LSTM(4), tf.keras.layers.Dense(1)])
+    model.save(api_server.MODEL_PATH)
+    joblib.dump(MinMaxScaler().fit(frame[['BTC_Close', 'BTC_Volume']].values), api_server.SCALER_PATH)
+
+    model_registry.clear()
+    market_data._stores.clear()
+    monkeypatch.setattr(api_server, '_forecast', None)
+    monkeypatch.setattr(api_server, 'prices', FakePrices(30000.0))
+    yield api_server.app.test_client()
+    model_registry.clear()
+    market_data._stores.clear()
+
+
+def test_repeat_poll_with_matching_etag_gets_304(client):
+    first = client.get('/api/predict?symbol=BTCUSDT&timeframe=1d')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag and first.headers['Cache-Control'] == api_server.PREDICT_CACHE_CONTROL
+
+    before = api_server.cache_stats()['not_modified']
+    again = client.get('/api/predict?symbol=BTCUSDT&timeframe=1d', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    assert api_server.cache_stats()['not_modified'] == before + 1
+
+    stale = client.get('/api/predict?symbol=BTCUSDT&timeframe=1d', headers={'If-None-Match': '"other"'})
+    assert stale.status_code == 200
+    assert stale.get_json() == first.get_json() | {'timestamp': stale.get_json()['timestamp']}
+
+
+def test_etag_changes_with_the_inputs(client):
+    etag = client.get('/api/predict?symbol=BTCUSDT').headers['ETag']
+    assert client.get('/api/predict?symbol=ETHUSDT', headers={'If-None-Match': etag}).status_code == 200
+    api_server.prices.price = 31000.0
+    assert client.get('/api/predict?symbol=BTCUSDT', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_cache_counters_do_not_lose_concurrent_updates():
+    before = api_server.cache_stats()['hits']
+    threads = [threading.Thread(target=lambda: [api_server.count_cache('hits') for _ in range(10000)])
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert api_server.cache_stats()['hits'] == before + 80000
+
+
+@pytest.mark.parametrize('client', [30], indirect=True)
+def test_forecasts_use_the_model_window(client):
+    """A model trained on 30-day windows gets 30 rows, not a hardcoded 60"""
+    assert client.get('/api/predict?symbol=BTCUSDT').status_code == 200
+
+    latest = client.get('/api/forecast?horizon=3')
+    assert latest.status_code == 200
+    assert len(latest.get_json()['forecast']) == 3
+
+    # 40 rows of history: enough for this model, not for a 60-day window
+    past = client.get('/api/forecast?horizon=2&as_of=2024-02-09')
+    assert past.status_code == 200
+    assert past.get_json()['current_price'] == pytest.approx(
+        market_data.get_store(api_server.DATA_PATH).between(None, '2024-02-09')['BTC_Close'][-1]
+    )
+
+
+@pytest.fixture
+def stream_client(monkeypatch):
+    hub = price_hub.PriceHub(price_hub.ReplayFeed([(0.0, 'BTCUSDT', 30000.0)], speed=0), ['BTCUSDT'])
+    monkeypatch.setattr(api_server, 'prices', hub)
+    monkeypatch.setattr(api_server, 'backtest_jobs', job_queue.JobQueue(max_workers=1))
+    monkeypatch.setattr(api_server, 'MAX_STREAMS', 1)
+    monkeypatch.setattr(api_server, '_open_streams', 0)
+    yield api_server.app.test_client()
+    hub.stop()
+    api_server.backtest_jobs._pool.shutdown(wait=True)
+
+
+def test_streams_above_the_cap_get_503(stream_client):
+    job, _ = api_server.backtest_jobs.submit('k', {}, lambda progress: {'total_return': 1.0})
+    assert job.done_event.wait(5)
+
+    held = stream_client.get('/api/prices/stream', buffered=False)
+    assert held.status_code == 200
+    assert held.mimetype == 'text/event-stream'
+    assert api_server._open_streams == 1
+
+    for url in ('/api/prices/stream', f'/api/backtest/jobs/{job.id}/events'):
+        refused = stream_client.get(url)
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After']
+        assert refused.get_json()['max_streams'] == 1
+
+    held.close()
+    assert api_server._open_streams == 0
+    events = stream_client.get(f'/api/backtest/jobs/{job.id}/events')
+    assert events.status_code == 200
+    assert b'"status": "done"' in events.data
+    events.close()
+    assert api_server._open_streams == 0
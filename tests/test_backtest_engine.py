@@ -0,0 +1,162 @@
+"""
+Regression tests: the batched prediction stage and vectorized simulation
+must reproduce the original per-day backtest loop
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import backtest_engine
+import market_data
+
+
+SEQUENCE_LENGTH = backtest_engine.SEQUENCE_LENGTH
+
+
+@pytest.fixture(scope='module')
+def model():
+    """Predicts about the window's last close, with noise from small random weights, so it trades"""
+    import tensorflow as tf
+    model = tf.keras.Sequential([
+        tf.keras.Input((SEQUENCE_LENGTH, 2)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(1),
+    ])
+    kernel = np.random.default_rng(1).normal(0, 0.01, (SEQUENCE_LENGTH * 2, 1))
+    kernel[-2] += 1.0  # last row's close
+    model.layers[-1].set_weights([kernel.astype(np.float32), np.array([0.02], np.float32)])
+    return model
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 300
+    return pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=rows, freq='D').strftime('%Y-%m-%d'),
+        'BTC_Close': 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, rows))),
+        'BTC_Volume': rng.uniform(1e9, 5e9, rows),
+    })
+
+
+@pytest.fixture(scope='module')
+def scaler(frame):
+    return MinMaxScaler().fit(frame[['BTC_Close', 'BTC_Volume']].values)
+
+
+def per_day_backtest(model, scaler, df, days, initial_capital=10000):
+    """The engine's original loop: one scaler call and one model.predict per day"""
+    backtest_df = df.tail(days + SEQUENCE_LENGTH).reset_index(drop=True)
+    results = []
+    capital = initial_capital
+    position = 0
+    wins = losses = 0
+    trades = []
+    for i in range(SEQUENCE_LENGTH, len(backtest_df) - 1):
+        sequence = backtest_df[['BTC_Close', 'BTC_Volume']].iloc[i - SEQUENCE_LENGTH:i].values
+        X = scaler.transform(sequence).reshape(1, SEQUENCE_LENGTH, 2)
+        dummy_pred = np.zeros((1, 2))
+        dummy_pred[:, 0] = model.predict(X, verbose=0).flatten()
+        predicted_price = scaler.inverse_transform(dummy_pred)[0][0]
+
+        current_price = backtest_df['BTC_Close'].iloc[i]
+        next_day_actual = backtest_df['BTC_Close'].iloc[i + 1]
+        predicted_return = (predicted_price - current_price) / current_price
+        if predicted_return > 0.005 and position == 0:
+            position = 1
+            entry_price = current_price
+        elif position == 1:
+            actual_return = (next_day_actual - entry_price) / entry_price
+            trade_pnl = capital * actual_return
+            capital += trade_pnl
+            wins += actual_return > 0
+            losses += actual_return <= 0
+            trades.append(trade_pnl)
+            position = 0
+        results.append({'date': backtest_df['Date'].iloc[i], 'equity': capital, 'price': current_price})
+
+    if position == 1:
+        actual_return = (backtest_df['BTC_Close'].iloc[-1] - entry_price) / entry_price
+        capital += capital * actual_return
+        wins += actual_return > 0
+        losses += actual_return <= 0
+
+    equity = [r['equity'] for r in results]
+    peak, max_dd = equity[0], 0
+    for value in equity:
+        peak = max(peak, value)
+        max_dd = max(max_dd, (peak - value) / peak * 100)
+    gross_wins = sum(p for p in trades if p > 0) if trades else 0
+    gross_losses = abs(sum(p for p in trades if p < 0)) if trades else 1
+    return {
+        'equity_curve': results,
+        'final_capital': capital,
+        'total_return': (capital - initial_capital) / initial_capital * 100,
+        'win_rate': wins / (wins + losses) * 100 if wins + losses else 0,
+        'max_drawdown': max_dd,
+        'profit_factor': gross_wins / gross_losses if gross_losses > 0 else 0,
+        'total_trades': wins + losses,
+        'wins': wins,
+        'losses': losses,
+    }
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path, model, scaler, frame):
+    """backtest_engine reading the fixture series and model instead of data/ and models/"""
+    path = tmp_path / 'BTC_USD.csv'
+    frame.to_csv(path, index=False)
+    store = market_data.MarketDataStore(str(path)).refresh()
+    monkeypatch.setattr(backtest_engine, 'load_backtest_components', lambda timeframe='1d': (model, scaler, store))
+    monkeypatch.setattr(backtest_engine, '_prediction_caches', {})
+    return backtest_engine
+
+
+def test_predict_prices_matches_per_day_predict(model, scaler, frame):
+    features = frame[['BTC_Close', 'BTC_Volume']].values[:SEQUENCE_LENGTH + 20]
+    batched = backtest_engine.predict_prices(model, scaler, features, SEQUENCE_LENGTH, batch_size=7)
+
+    expected = []
+    for k in range(len(features) - SEQUENCE_LENGTH + 1):
+        X = scaler.transform(features[k:k + SEQUENCE_LENGTH]).reshape(1, SEQUENCE_LENGTH, 2)
+        dummy_pred = np.zeros((1, 2))
+        dummy_pred[:, 0] = model.predict(X, verbose=0).flatten()
+        expected.append(scaler.inverse_transform(dummy_pred)[0][0])
+    np.testing.assert_allclose(batched, expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize('days', [30, 120])
+def test_run_backtest_matches_per_day_loop(engine, model, scaler, frame, days):
+    expected = per_day_backtest(model, scaler, frame, days)
+    result = engine.run_backtest(days=days)
+
+    assert expected['total_trades'] >= 3
+    assert [r['date'] for r in result['equity_curve']] == [r['date'] for r in expected['equity_curve']]
+    np.testing.assert_allclose([r['equity'] for r in result['equity_curve']],
+                               [r['equity'] for r in expected['equity_curve']], rtol=1e-9)
+    np.testing.assert_allclose([r['price'] for r in result['equity_curve']],
+                               [r['price'] for r in expected['equity_curve']])
+    for name in ('final_capital', 'total_return', 'win_rate', 'max_drawdown', 'profit_factor'):
+        assert result[name] == pytest.approx(expected[name], rel=1e-9), name
+    for name in ('total_trades', 'wins', 'losses'):
+        assert result[name] == expected[name], name
+
+
+def test_cached_predictions_serve_shorter_backtests(engine, model, scaler, frame):
+    engine.run_backtest(days=120)
+    expected = per_day_backtest(model, scaler, frame, 30)
+    result = engine.run_backtest(days=30)
+    np.testing.assert_allclose([r['equity'] for r in result['equity_curve']],
+                               [r['equity'] for r in expected['equity_curve']], rtol=1e-9)
+
+
+@pytest.mark.parametrize('hold_days', [0, -1])
+def test_hold_below_one_day_is_rejected(engine, hold_days):
+    with pytest.raises(ValueError):
+        engine.run_backtest(days=30, hold_days=hold_days)
+    closes = np.linspace(100, 130, 31)
+    with pytest.raises(ValueError):
+        engine.simulate(closes, closes[:-1] * 1.1, hold_days=hold_days)
+    with pytest.raises(ValueError):
+        engine.simulate_grid(closes, closes[:-1] * 1.1, [0.005], [hold_days], [0.0], [0.0])
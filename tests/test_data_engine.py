@@ -0,0 +1,187 @@
+"""Ingestion from CsvSource fixtures: full download, appends, retries and crash consistency"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_engine
+import market_data
+import ohlcv_store
+
+
+ROWS = 400
+
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    """Fixture directory for CsvSource; data_engine writes under tmp_path/data"""
+    monkeypatch.setattr(data_engine, 'DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(data_engine.time, 'sleep', lambda seconds: None)
+    directory = tmp_path / 'fixtures'
+    directory.mkdir()
+    return directory
+
+
+def history(rows=ROWS, seed=0):
+    """Daily candles ending yesterday, so a full copy counts as up to date"""
+    rng = np.random.default_rng(seed)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.03, rows)))
+    end = datetime.now().date() - timedelta(days=1)
+    return pd.DataFrame({
+        'Date': pd.date_range(end=end, periods=rows, freq='D'),
+        'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+        'Volume': rng.uniform(1e9, 5e9, rows),
+    })
+
+
+def publish(directory, symbol, df):
+    df.to_csv(directory / f'{symbol}.csv', index=False)
+
+
+def assert_csv_matches_store(symbol, expected):
+    path = data_engine.csv_path(symbol)
+    csv = pd.read_csv(path)
+    store = ohlcv_store.open_columns(ohlcv_store.store_path(path))
+    prefix = data_engine.symbol_prefix(symbol)
+    assert list(csv['Date']) == list(expected['Date'].dt.strftime('%Y-%m-%d'))
+    assert not csv['Date'].duplicated().any()
+    np.testing.assert_allclose(csv[f'{prefix}_Close'], expected['Close'])
+    np.testing.assert_allclose(np.asarray(store[f'{prefix}_Close']), expected['Close'])
+    np.testing.assert_array_equal(np.asarray(store['Date']), ohlcv_store.to_timestamps(csv['Date']))
+
+
+def test_csv_source_returns_rows_from_start(fixtures):
+    df = history()
+    publish(fixtures, 'BTC-USD', df)
+    start = df['Date'].iloc[-5].strftime('%Y-%m-%d')
+    fetched = data_engine.CsvSource(str(fixtures)).fetch('BTC-USD', start)
+    assert list(fetched['Date']) == list(df['Date'].iloc[-5:])
+
+
+def test_data_source_must_implement_fetch():
+    class Incomplete(data_engine.DataSource):
+        name = 'incomplete'
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_full_download_then_append_in_place(fixtures):
+    df = history()
+    source = data_engine.CsvSource(str(fixtures))
+    publish(fixtures, 'BTC-USD', df.iloc[:-10])
+    assert data_engine.update_dataset('BTC-USD', source)['status'] == 'updated'
+
+    path = data_engine.csv_path('BTC-USD')
+    reader = market_data.MarketDataStore(path).refresh()
+    inode = os.stat(path).st_ino
+
+    publish(fixtures, 'BTC-USD', df)
+    result = data_engine.update_dataset('BTC-USD', source)
+    assert (result['status'], result['rows']) == ('updated', 10)
+    # Appended in place: same file, so readers only parse the new rows
+    assert os.stat(path).st_ino == inode
+    assert len(reader.refresh()) == ROWS
+    assert_csv_matches_store('BTC-USD', df)
+    assert data_engine.update_dataset('BTC-USD', source)['status'] == 'up_to_date'
+
+
+def test_full_refresh_replaces_a_torn_csv(fixtures):
+    df = history()
+    source = data_engine.CsvSource(str(fixtures))
+    publish(fixtures, 'BTC-USD', df.iloc[:-10])
+    data_engine.update_dataset('BTC-USD', source)
+    # A torn last row makes the local data unreadable, forcing a full download
+    with open(data_engine.csv_path('BTC-USD'), 'a') as f:
+        f.write('20')
+
+    publish(fixtures, 'BTC-USD', df)
+    result = data_engine.update_dataset('BTC-USD', source)
+    assert (result['status'], result['rows']) == ('updated', ROWS)
+    assert_csv_matches_store('BTC-USD', df)
+
+
+def test_failed_csv_append_is_rolled_back(fixtures, monkeypatch):
+    df = history()
+    source = data_engine.CsvSource(str(fixtures))
+    publish(fixtures, 'BTC-USD', df.iloc[:-10])
+    data_engine.update_dataset('BTC-USD', source)
+    path = data_engine.csv_path('BTC-USD')
+    size = os.path.getsize(path)
+
+    def disk_full(fd):
+        raise OSError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setattr(data_engine.os, 'fsync', disk_full)
+        publish(fixtures, 'BTC-USD', df)
+        assert data_engine.update_dataset('BTC-USD', source)['status'] == 'error'
+    assert os.path.getsize(path) == size
+    assert_csv_matches_store('BTC-USD', df.iloc[:-10])
+
+    assert data_engine.update_dataset('BTC-USD', source)['status'] == 'updated'
+    assert_csv_matches_store('BTC-USD', df)
+
+
+def test_store_catches_up_after_a_failed_store_write(fixtures, monkeypatch):
+    df = history()
+    source = data_engine.CsvSource(str(fixtures))
+    publish(fixtures, 'BTC-USD', df.iloc[:-10])
+    data_engine.update_dataset('BTC-USD', source)
+
+    # The CSV append lands, then the store write fails
+    real_append = ohlcv_store.append_dataframe
+    calls = []
+
+    def fail_once(path, frame):
+        calls.append(len(frame))
+        if len(calls) == 1:
+            raise OSError('store write failed')
+        return real_append(path, frame)
+    monkeypatch.setattr(ohlcv_store, 'append_dataframe', fail_once)
+    publish(fixtures, 'BTC-USD', df.iloc[:-3])
+    assert data_engine.update_dataset('BTC-USD', source)['status'] == 'error'
+
+    # The next run rebuilds the store's missing rows from the CSV, then
+    # fetches only what neither has, so the CSV gets no duplicates
+    publish(fixtures, 'BTC-USD', df)
+    result = data_engine.update_dataset('BTC-USD', source)
+    assert (result['status'], result['rows']) == ('updated', 3)
+    assert_csv_matches_store('BTC-USD', df)
+
+
+class FlakySource(data_engine.CsvSource):
+    """CsvSource that fails the first `failures` fetches of each symbol"""
+    name = 'flaky'
+
+    def __init__(self, directory, failures):
+        super().__init__(directory)
+        self.failures = failures
+        self.calls = {}
+
+    def fetch(self, symbol, start):
+        self.calls[symbol] = self.calls.get(symbol, 0) + 1
+        if self.calls[symbol] <= self.failures.get(symbol, 0):
+            raise ConnectionError('upstream timeout')
+        return super().fetch(symbol, start)
+
+
+def test_update_all_retries_and_isolates_failures(fixtures):
+    symbols = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD']
+    for seed, symbol in enumerate(symbols):
+        publish(fixtures, symbol, history(seed=seed))
+    source = FlakySource(str(fixtures), {'ETH-USD': 2, 'SOL-USD': data_engine.MAX_RETRIES + 1})
+
+    results = data_engine.update_all(symbols, source, max_workers=4)
+
+    assert [r['symbol'] for r in results] == symbols
+    by_symbol = {r['symbol']: r for r in results}
+    assert by_symbol['BTC-USD']['attempts'] == 1
+    assert (by_symbol['ETH-USD']['status'], by_symbol['ETH-USD']['attempts']) == ('updated', 3)
+    assert by_symbol['SOL-USD']['status'] == 'error'
+    assert by_symbol['SOL-USD']['attempts'] == data_engine.MAX_RETRIES + 1
+    assert 'upstream timeout' in by_symbol['SOL-USD']['error']
+    assert not os.path.exists(data_engine.csv_path('SOL-USD'))
+    for seed, symbol in enumerate(symbols):
+        if symbol != 'SOL-USD':
+            assert_csv_matches_store(symbol, history(seed=seed))
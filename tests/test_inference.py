@@ -0,0 +1,53 @@
+"""NumPy backend parity with Keras on a small exported LSTM"""
+import numpy as np
+import pytest
+
+import inference
+import model_registry
+
+tf = pytest.importorskip('tensorflow')
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """Stacked LSTM shaped like training.build_model, scaled down"""
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input((20, 2)),
+        tf.keras.layers.LSTM(8, return_sequences=True),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(4, activation='relu'),
+        tf.keras.layers.Dense(1),
+    ])
+    path = str(tmp_path / 'model.h5')
+    model.save(path)
+    return path
+
+
+def test_numpy_predictions_match_keras(model_path):
+    keras_model = tf.keras.models.load_model(model_path, compile=False)
+    numpy_model = inference.load(inference.export(model_path))
+    assert numpy_model.input_shape == keras_model.input_shape
+
+    x = np.random.default_rng(1).random((64, 20, 2), dtype=np.float32)
+    expected = keras_model.predict(x, verbose=0)
+    np.testing.assert_allclose(numpy_model.predict(x), expected, atol=inference.TOLERANCE)
+    np.testing.assert_allclose(numpy_model(x[:1]), expected[:1], atol=inference.TOLERANCE)
+    # Batches past PREDICT_BATCH_SIZE are split and concatenated
+    np.testing.assert_allclose(numpy_model.predict(x, batch_size=10), expected, atol=inference.TOLERANCE)
+    assert inference.verify(model_path, samples=64) < inference.TOLERANCE
+
+
+def test_load_exported_re_exports_a_stale_npz(model_path):
+    first = inference.load_exported(model_path)
+    assert first.source_version == model_registry._file_hash(model_path)
+
+    tf.keras.utils.set_random_seed(1)
+    retrained = tf.keras.Sequential([tf.keras.Input((20, 2)), tf.keras.layers.LSTM(8), tf.keras.layers.Dense(1)])
+    retrained.save(model_path)
+
+    second = inference.load_exported(model_path)
+    assert second.source_version == model_registry._file_hash(model_path) != first.source_version
+    x = np.random.default_rng(2).random((8, 20, 2), dtype=np.float32)
+    np.testing.assert_allclose(second.predict(x), retrained.predict(x, verbose=0), atol=inference.TOLERANCE)
@@ -0,0 +1,112 @@
+"""JobQueue with trivial job functions: dedupe, retry after failure, TTL expiry and error results"""
+import threading
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def queue():
+    q = job_queue.JobQueue(max_workers=2, max_pending=4, result_ttl=600)
+    yield q
+    q._pool.shutdown(wait=True)
+
+
+def finished(job):
+    assert job.done_event.wait(5), 'job did not finish'
+    return job
+
+
+def test_identical_submissions_share_one_job(queue):
+    gate = threading.Event()
+    calls = []
+
+    def fn(progress):
+        calls.append(1)
+        assert gate.wait(5)
+        progress(0.5)
+        return {'total_return': 1.0}
+
+    first, created = queue.submit('k', {'days': 30}, fn)
+    assert created
+    second, created = queue.submit('k', {'days': 30}, fn)
+    assert not created and second is first
+
+    gate.set()
+    finished(first)
+    assert first.status == job_queue.DONE
+    assert first.result == {'total_return': 1.0}
+    assert first.progress == 1.0
+
+    # A finished job within the TTL is still shared
+    third, created = queue.submit('k', {'days': 30}, fn)
+    assert not created and third is first
+    assert calls == [1]
+    assert queue.stats()['deduplicated'] == 2
+
+
+def test_failed_job_is_not_deduplicated(queue):
+    def boom(progress):
+        raise ValueError('no data')
+
+    failed, _ = queue.submit('k', {}, boom)
+    finished(failed)
+    assert failed.status == job_queue.FAILED
+    assert failed.error == 'no data'
+    assert failed.to_dict()['error'] == 'no data'
+
+    retry, created = queue.submit('k', {}, lambda progress: {'ok': True})
+    assert created and retry is not failed
+    assert finished(retry).status == job_queue.DONE
+    assert queue.stats()['deduplicated'] == 0
+
+
+def test_error_dict_result_fails_the_job(queue):
+    job, _ = queue.submit('k', {}, lambda progress: {'error': 'Not enough data'})
+    finished(job)
+    assert job.status == job_queue.FAILED
+    assert job.error == 'Not enough data'
+    assert job.result is None
+    assert 'result' not in job.to_dict()
+
+
+def test_expire_drops_jobs_past_ttl(queue):
+    old, _ = queue.submit('old', {}, lambda progress: 1)
+    fresh, _ = queue.submit('fresh', {}, lambda progress: 2)
+    finished(old)
+    finished(fresh)
+    old.finished -= queue.result_ttl + 1
+
+    with queue._lock:
+        queue._expire()
+    assert queue.get(old.id) is None
+    assert queue.get(fresh.id) is fresh
+
+    # The expired key runs again instead of returning the stale job
+    again, created = queue.submit('old', {}, lambda progress: 3)
+    assert created and again is not old
+    assert finished(again).result == 3
+
+
+def test_expire_keeps_at_most_max_jobs(queue):
+    queue.max_jobs = 2
+    jobs = [finished(queue.submit(str(i), {}, lambda progress: i)[0]) for i in range(3)]
+    with queue._lock:
+        queue._expire()
+    assert queue.get(jobs[0].id) is None
+    assert [queue.get(j.id) for j in jobs[1:]] == jobs[1:]
+
+
+def test_queue_full(queue):
+    gate = threading.Event()
+    try:
+        running = [queue.submit(f'run{i}', {}, lambda progress: gate.wait(5))[0] for i in range(2)]
+        while any(j.status == job_queue.QUEUED for j in running):
+            running[0].wait_for_change(running[0].version, 0.01)
+        for i in range(queue.max_pending):
+            queue.submit(str(i), {}, lambda progress: gate.wait(5))
+        with pytest.raises(job_queue.QueueFull):
+            queue.submit('one-too-many', {}, lambda progress: None)
+    finally:
+        gate.set()
@@ -0,0 +1,136 @@
+"""KlineCache with a fake client: single-flight, candle-close TTL and LRU eviction"""
+import threading
+import time
+
+import pytest
+
+import kline_cache
+
+
+class FakeClient:
+    """Counts get_klines calls; one candle closing at `close_at` (epoch seconds)"""
+
+    def __init__(self, close_at=None, gate=None, error=None):
+        self.close_at = close_at
+        self.gate = gate
+        self.error = error
+        self.calls = []
+
+    def get_klines(self, symbol, interval, limit):
+        self.calls.append((symbol, interval, limit))
+        if self.gate is not None:
+            assert self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        close_ms = int((self.close_at or 0) * 1000)
+        return [[close_ms - 60000, '1', '2', '0.5', '1.5', '10', close_ms]] * limit
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_share_one_fetch():
+    gate = threading.Event()
+    client = FakeClient(close_at=time.time() + 60, gate=gate)
+    cache = kline_cache.KlineCache(client)
+    callers = 16
+    bodies = []
+    threads = [threading.Thread(target=lambda: bodies.append(cache.get('BTCUSDT', '1m', 5)))
+               for _ in range(callers)]
+    for t in threads:
+        t.start()
+    # Release the fetch only once every other caller is waiting on it
+    wait_for(lambda: cache.stats()['coalesced'] == callers - 1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(client.calls) == 1
+    assert len(bodies) == callers and len(set(bodies)) == 1
+    assert cache.stats()['misses'] == 1
+    cache.get('BTCUSDT', '1m', 5)
+    assert len(client.calls) == 1 and cache.stats()['hits'] == 1
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached():
+    gate = threading.Event()
+    client = FakeClient(gate=gate, error=ConnectionError('binance down'))
+    cache = kline_cache.KlineCache(client)
+    errors = []
+
+    def call():
+        try:
+            cache.get('BTCUSDT', '1m', 5)
+        except ConnectionError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    wait_for(lambda: cache.stats()['coalesced'] == 3)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 4 and len(client.calls) == 1
+    client.error = None
+    cache.get('BTCUSDT', '1m', 5)
+    assert len(client.calls) == 2
+
+
+@pytest.mark.parametrize('closes_in, ttl', [
+    (3.0, 3.0),                          # expires when the candle closes
+    (3600.0, kline_cache.MAX_STALENESS),  # capped so the forming candle stays fresh
+    (-5.0, kline_cache.MIN_TTL),          # already closed: refetch soon, not instantly
+])
+def test_entries_expire_at_candle_close(closes_in, ttl):
+    clock = Clock()
+    client = FakeClient(close_at=clock.now + closes_in)
+    cache = kline_cache.KlineCache(client, clock=clock)
+    cache.get('BTCUSDT', '1h', 3)
+
+    clock.now += ttl - 0.01
+    cache.get('BTCUSDT', '1h', 3)
+    assert len(client.calls) == 1
+    clock.now += 0.02
+    cache.get('BTCUSDT', '1h', 3)
+    assert len(client.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity():
+    clock = Clock()
+    client = FakeClient(close_at=clock.now + 60)
+    size = len(kline_cache.KlineCache(FakeClient(close_at=clock.now + 60), clock=clock).get('A', '1m', 2))
+    cache = kline_cache.KlineCache(client, max_bytes=2 * size, clock=clock)
+
+    cache.get('A', '1m', 2)
+    cache.get('B', '1m', 2)
+    cache.get('A', '1m', 2)  # A is now the most recently used
+    cache.get('C', '1m', 2)  # over capacity: B goes
+    assert cache.stats()['entries'] == 2 and cache.stats()['bytes'] <= 2 * size
+    calls = len(client.calls)
+    cache.get('A', '1m', 2)
+    cache.get('C', '1m', 2)
+    assert len(client.calls) == calls
+    cache.get('B', '1m', 2)
+    assert len(client.calls) == calls + 1
+
+
+def test_body_larger_than_the_cache_is_served_but_not_kept():
+    client = FakeClient(close_at=time.time() + 60)
+    cache = kline_cache.KlineCache(client, max_bytes=10)
+    assert cache.get('BTCUSDT', '1m', 5)
+    assert cache.stats()['entries'] == 0
+    cache.get('BTCUSDT', '1m', 5)
+    assert len(client.calls) == 2
@@ -0,0 +1,55 @@
+"""Replacing a columnar store must never disturb readers that have it mapped"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ohlcv_store
+
+
+def frame(rows, start='2024-01-01', value=1.0):
+    return pd.DataFrame({
+        'Date': pd.date_range(start, periods=rows, freq='D').strftime('%Y-%m-%d'),
+        'BTC_Close': np.arange(rows, dtype=np.float64) + value,
+    })
+
+
+def test_replace_keeps_old_maps_readable(tmp_path):
+    path = str(tmp_path / 'BTC_USD.ohlcv')
+    ohlcv_store.append_dataframe(path, frame(1000))
+    reader = ohlcv_store.ColumnarStore(path).refresh()
+    before = reader.column('BTC_Close')
+    inode = os.stat(os.path.join(path, 'BTC_Close.f8')).st_ino
+
+    ohlcv_store.replace_dataframe(path, frame(10, '2020-01-01', value=500.0))
+
+    # The old file was renamed away, not truncated: the old map still reads
+    assert os.stat(os.path.join(path, 'BTC_Close.f8')).st_ino != inode
+    assert len(reader) == 1000 and before[-1] == 1000.0
+    reader.refresh()
+    assert len(reader) == 10
+    np.testing.assert_array_equal(reader.column('BTC_Close'), np.arange(10) + 500.0)
+    assert os.listdir(tmp_path) == ['BTC_USD.ohlcv']
+
+
+def test_failed_replace_leaves_the_old_store(tmp_path, monkeypatch):
+    path = str(tmp_path / 'BTC_USD.ohlcv')
+    ohlcv_store.append_dataframe(path, frame(100))
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(ohlcv_store, 'append', fail)
+    with pytest.raises(OSError):
+        ohlcv_store.replace_dataframe(path, frame(10))
+
+    assert ohlcv_store.read_header(path)['n_rows'] == 100
+    assert os.listdir(tmp_path) == ['BTC_USD.ohlcv']
+
+
+def test_create_refuses_to_truncate_a_store(tmp_path):
+    path = str(tmp_path / 'BTC_USD.ohlcv')
+    ohlcv_store.append_dataframe(path, frame(10))
+    with pytest.raises(FileExistsError):
+        ohlcv_store.create(path, ['BTC_Close'])
+    assert ohlcv_store.read_header(path)['n_rows'] == 10
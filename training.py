@@ -0,0 +1,335 @@
+"""
+Training
+Builds LSTM training windows without materializing them and trains the
+market model from the command line (the notebook uses the same pieces).
+
+Each window is a view into the scaled series instead of a 60-row copy, so
+memory stays at the size of the series whatever the lookback. For Keras the
+window starts are shuffled and batched by tf.data and each batch is gathered
+from one in-graph copy of the series, with prefetch overlapping the gather
+with training. Several symbols train together: each symbol is scaled on its
+own and windows never cross from one symbol into the next; a one-hot
+symbol id is appended to every row so one shared network learns all of them.
+
+    python training.py train --data data/BTC_USD.csv --features Close Volume rsi_14
+    python training.py train --data data/*_USD.csv   # multi-asset model (multi_asset.py serves it)
+    python training.py train --timeframe 1h          # on 1h bars from rollups.py
+    python training.py bench --rows 200000   # peak RSS and samples/s vs the Python loop
+"""
+import argparse
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import indicators
+import market_data
+import rollups
+
+
+LOOKBACK = 60
+TEST_SPLIT = 0.2
+FEATURES = ['Close', 'Volume']  # the first one is the prediction target
+BATCH_SIZE = 32
+EPOCHS = 50
+DATA_PATH = 'data/BTC_USD.csv'
+MODEL_PATH = 'models/market_model.h5'
+SCALER_PATH = 'models/market_scaler.pkl'
+MULTI_MODEL_PATH = 'models/multi_model.h5'
+MULTI_SCALERS_PATH = 'models/multi_scalers.pkl'  # {symbol prefix: scaler}, in one-hot order
+
+
+# -----------------------------------------------------------------------------
+# DATA
+# -----------------------------------------------------------------------------
+def symbol_prefix(path):
+    """Column prefix of a data_engine CSV, e.g. data/BTC_USD.csv -> BTC"""
+    return os.path.basename(path).split('_')[0]
+
+
+def model_paths(timeframe='1d'):
+    """(model, scaler) files of the single-symbol model for a timeframe"""
+    if timeframe == '1d':
+        return MODEL_PATH, SCALER_PATH
+    return (f'models/market_model_{rollups.label(timeframe)}.h5',
+            f'models/market_scaler_{rollups.label(timeframe)}.pkl')
+
+
+def load_features(path, features=FEATURES, timeframe='1d'):
+    """
+    (rows, len(features)) matrix for one symbol. Raw columns are given
+    without the prefix ('Close'); indicator names ('rsi_14') are computed by
+    the indicator engine and their warm-up rows dropped. Daily bars come
+    from the data_engine file at `path`, other timeframes from the symbol's
+    rollup store.
+    """
+    prefix = symbol_prefix(path)
+    columns = [f if f in indicators.NAMES else f'{prefix}_{f}' for f in features]
+    store = market_data.get_store(path) if timeframe == '1d' else rollups.get_store(prefix, timeframe)
+    if any(f in indicators.NAMES for f in features):
+        return indicators.feature_matrix(path, columns, prefix, store)[1]
+    return market_data.stack(store.between(), columns)
+
+
+def with_symbol(series, index, n_symbols):
+    """`series` with `n_symbols` one-hot columns appended, marking symbol `index`"""
+    one_hot = np.zeros((len(series), n_symbols), dtype=series.dtype)
+    one_hot[:, index] = 1
+    return np.hstack([series, one_hot])
+
+
+def windows(series, lookback=LOOKBACK, target=0):
+    """
+    (X, y) for next-step prediction as views of `series`, with no copies:
+    X[k] = series[k:k + lookback] and y[k] = series[k + lookback, target].
+    Same values as the notebook's loop, without its lookback-times memory.
+    """
+    view = np.lib.stride_tricks.sliding_window_view(series, lookback, axis=0)  # (n, features, lookback)
+    return view[:-1].transpose(0, 2, 1), series[lookback:, target]
+
+
+class WindowedDataset:
+    """
+    One or more scaled series stored back to back, plus the start row of
+    every window; each symbol's starts are split chronologically into
+    train and validation
+    """
+
+    def __init__(self, series, lookback=LOOKBACK, target=0, test_split=TEST_SPLIT):
+        self.lookback = lookback
+        self.target = target
+        self.n_features = series[0].shape[1]
+        self.data = np.concatenate(series).astype(np.float32)
+        self.starts = {'train': [], 'val': []}
+        self.symbol_ids = {'train': [], 'val': []}
+        offset = 0
+        for symbol_id, s in enumerate(series):
+            starts = offset + np.arange(max(len(s) - lookback, 0))
+            split = int(len(starts) * (1 - test_split))
+            for name, part in (('train', starts[:split]), ('val', starts[split:])):
+                self.starts[name].append(part)
+                self.symbol_ids[name].append(np.full(len(part), symbol_id))
+            offset += len(s)
+        self.starts = {k: np.concatenate(v) for k, v in self.starts.items()}
+        self.symbol_ids = {k: np.concatenate(v) for k, v in self.symbol_ids.items()}
+
+    @property
+    def input_shape(self):
+        return (self.lookback, self.n_features)
+
+    def samples(self, split='train'):
+        return len(self.starts[split])
+
+    def batch(self, starts):
+        """Gather (X, y) for the given window starts (copies only this batch)"""
+        rows = starts[:, None] + np.arange(self.lookback)
+        return self.data[rows], self.data[starts + self.lookback, self.target]
+
+    def dataset(self, split='train', batch_size=BATCH_SIZE, shuffle=False, seed=0):
+        """Streaming tf.data pipeline of (X, y) batches"""
+        import tensorflow as tf
+        data = tf.constant(self.data)
+        targets = tf.constant(self.data[:, self.target])
+        offsets = tf.range(self.lookback, dtype=tf.int64)
+
+        def gather(starts):
+            return tf.gather(data, starts[:, None] + offsets), tf.gather(targets, starts + self.lookback)
+
+        ds = tf.data.Dataset.from_tensor_slices(self.starts[split].astype(np.int64))
+        if shuffle:
+            ds = ds.shuffle(len(self.starts[split]), seed=seed, reshuffle_each_iteration=True)
+        return ds.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def prepare(paths, features=FEATURES, lookback=LOOKBACK, test_split=TEST_SPLIT, symbol_columns=False,
+            timeframe='1d'):
+    """
+    Scale each symbol with its own MinMaxScaler -> (WindowedDataset, {symbol: scaler}).
+    With `symbol_columns`, rows also carry the symbol's one-hot id.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+    series, scalers = [], {}
+    for index, path in enumerate(paths):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled = scaler.fit_transform(load_features(path, features, timeframe))
+        series.append(with_symbol(scaled, index, len(paths)) if symbol_columns else scaled)
+        scalers[symbol_prefix(path)] = scaler
+    return WindowedDataset(series, lookback, test_split=test_split), scalers
+
+
+# -----------------------------------------------------------------------------
+# TRAINING
+# -----------------------------------------------------------------------------
+def build_model(input_shape):
+    """Same architecture as train_model.ipynb"""
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+    model = Sequential([
+        Input(shape=input_shape),
+        LSTM(64, return_sequences=True),
+        Dropout(0.2),
+        LSTM(64, return_sequences=False),
+        Dropout(0.2),
+        Dense(1),
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def train(paths, features=FEATURES, lookback=LOOKBACK, epochs=EPOCHS, batch_size=BATCH_SIZE,
+          model_path=None, scaler_path=None, timeframe='1d'):
+    """
+    One symbol trains the serving model for `timeframe` (market_model.h5 +
+    market_scaler.pkl for daily bars, see model_paths). Several train one
+    shared multi-asset model with a one-hot symbol id and save every
+    symbol's scaler together (multi_model.h5 + multi_scalers.pkl).
+    """
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+
+    multi = len(paths) > 1
+    if multi and timeframe != '1d':
+        raise ValueError("The multi-asset model is trained on daily bars")
+    default_model, default_scaler = (MULTI_MODEL_PATH, MULTI_SCALERS_PATH) if multi else model_paths(timeframe)
+    model_path = model_path or default_model
+    scaler_path = scaler_path or default_scaler
+    start = time.perf_counter()
+    windowed, scalers = prepare(paths, features, lookback, symbol_columns=multi, timeframe=timeframe)
+    print(f"🔄 {windowed.samples('train')} training / {windowed.samples('val')} validation windows "
+          f"of shape {windowed.input_shape} from {', '.join(scalers)}")
+
+    model = build_model(windowed.input_shape)
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=5, verbose=1),
+        ModelCheckpoint(model_path, monitor='val_loss', save_best_only=True, verbose=1),
+    ]
+    fit_start = time.perf_counter()
+    history = model.fit(
+        windowed.dataset('train', batch_size, shuffle=True),
+        validation_data=windowed.dataset('val', batch_size),
+        epochs=epochs, callbacks=callbacks, verbose=1,
+    )
+    fit_seconds = time.perf_counter() - fit_start
+
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scalers if multi else scalers[symbol_prefix(paths[0])], f)
+
+    epochs_run = len(history.history['loss'])
+    return {
+        'epochs': epochs_run,
+        'samples_per_s': windowed.samples('train') * epochs_run / fit_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'seconds': time.perf_counter() - start,
+        'val_loss': float(min(history.history['val_loss'])),
+    }
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def _loop_windows(scaled_data, lookback):
+    """The notebook's original sequence builder"""
+    X, y = [], []
+    for i in range(lookback, len(scaled_data)):
+        X.append(scaled_data[i-lookback:i])
+        y.append(scaled_data[i, 0])
+    return np.array(X), np.array(y)
+
+
+def _bench_child(method, rows, n_features, lookback, batch_size, symbols):
+    """One method in a fresh process: build the windows and make one shuffled pass over them"""
+    import tensorflow as tf  # noqa: F401 - imported by every method so baselines match
+    rng = np.random.default_rng(0)
+    series = [rng.random((rows, n_features)) for _ in range(symbols)]
+    baseline = current_rss_mb()
+
+    start = time.perf_counter()
+    samples = 0
+    if method == 'loop':
+        built = [_loop_windows(s, lookback) for s in series]
+        X, y = np.concatenate([b[0] for b in built]), np.concatenate([b[1] for b in built])
+        del built
+        for idx in np.array_split(rng.permutation(len(X)), max(len(X) // batch_size, 1)):
+            xb = X[idx]
+            samples += len(xb)
+    elif method == 'strided':
+        windowed = WindowedDataset(series, lookback, test_split=0.0)
+        starts = rng.permutation(windowed.starts['train'])
+        for idx in np.array_split(starts, max(len(starts) // batch_size, 1)):
+            xb, _ = windowed.batch(idx)
+            samples += len(xb)
+    else:
+        windowed = WindowedDataset(series, lookback, test_split=0.0)
+        for xb, _ in windowed.dataset('train', batch_size, shuffle=True):
+            samples += int(xb.shape[0])
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'method': method,
+        'samples': samples,
+        'seconds': seconds,
+        'samples_per_s': samples / seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_over_baseline_mb': peak_rss_mb() - baseline,
+    }))
+
+
+def benchmark(rows=200_000, n_features=2, lookback=LOOKBACK, batch_size=BATCH_SIZE, symbols=1,
+              methods=('loop', 'strided', 'tfdata')):
+    """Peak RSS and samples/s of each window builder, each in its own process"""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    results = []
+    for method in methods:
+        code = (f"import training; training._bench_child({method!r}, {rows}, {n_features}, "
+                f"{lookback}, {batch_size}, {symbols})")
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the market model, or benchmark window building")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_train = sub.add_parser('train', help='Train and save the model and scaler(s)')
+    p_train.add_argument('--data', nargs='+', default=[DATA_PATH], help='One data_engine CSV per symbol')
+    p_train.add_argument('--features', nargs='+', default=FEATURES,
+                         help=f"Raw columns without prefix and/or indicators ({', '.join(indicators.NAMES)})")
+    p_train.add_argument('--timeframe', default='1d', choices=['1d'] + rollups.BASES + rollups.ROLLUPS,
+                         help='Bar size; anything but 1d reads the rollup store (rollups.py)')
+    p_train.add_argument('--lookback', type=int, default=LOOKBACK)
+    p_train.add_argument('--epochs', type=int, default=EPOCHS)
+    p_train.add_argument('--batch', type=int, default=BATCH_SIZE)
+    p_train.add_argument('--model', help=f'Default {MODEL_PATH}, or {MULTI_MODEL_PATH} for several symbols')
+    p_train.add_argument('--scaler', help=f'Default {SCALER_PATH}, or {MULTI_SCALERS_PATH} for several symbols')
+    p_bench = sub.add_parser('bench', help='Peak RSS and samples/s: Python loop vs strided views vs tf.data')
+    p_bench.add_argument('--rows', type=int, default=200_000, help='Rows per symbol (synthetic)')
+    p_bench.add_argument('--features', type=int, default=2)
+    p_bench.add_argument('--symbols', type=int, default=1)
+    p_bench.add_argument('--lookback', type=int, default=LOOKBACK)
+    p_bench.add_argument('--batch', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        r = train(args.data, args.features, args.lookback, args.epochs, args.batch, args.model, args.scaler,
+                  args.timeframe)
+        print(f"🎉 Trained {r['epochs']} epochs in {r['seconds']:.1f}s: best val_loss {r['val_loss']:.6f}, "
+              f"{r['samples_per_s']:,.0f} samples/s, peak RSS {r['peak_rss_mb']:,.0f} MB")
+    else:
+        print(f"{args.symbols} x {args.rows:,} rows, {args.features} features, lookback {args.lookback}")
+        print(f"{'Method':<8} {'Samples':>9} {'Seconds':>8} {'Samples/s':>11} {'Peak RSS':>10} {'Over base':>10}")
+        for r in benchmark(args.rows, args.features, args.lookback, args.batch, args.symbols):
+            print(f"{r['method']:<8} {r['samples']:>9} {r['seconds']:>8.2f} {r['samples_per_s']:>11,.0f} "
+                  f"{r['peak_rss_mb']:>8.0f}MB {r['peak_over_baseline_mb']:>8.0f}MB")
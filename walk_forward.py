@@ -0,0 +1,293 @@
+"""
+Walk-Forward Backtesting
+Splits the full price history into rolling train/test folds and backtests the
+folds in parallel worker processes.
+
+Each worker loads the model and scaler once in its initializer and attaches
+to the price/feature arrays through shared memory, so tasks only carry fold
+boundaries. Within a fold the train window is in-sample: if a parameter grid
+is given, the best threshold/hold combination on the train window is chosen
+with the vectorized sweep core and then traded out-of-sample on the test
+window.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import backtest_engine
+import market_data
+import model_registry
+
+
+TRAIN_DAYS = 365
+TEST_DAYS = 90
+
+# Worker process state, set up once by _init_worker
+_worker = {}
+
+
+def _share(array):
+    """Copy an array into a new shared memory block; returns (block, spec)"""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(closes_spec, features_spec, model_path, scaler_path, threads, backend):
+    """Runs once per worker: pin TF threads (Keras only), load the model, map shared arrays"""
+    if backend == 'keras':
+        # The NumPy backend never imports TensorFlow, so workers start without it
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    _worker['model'] = model_registry.get_model(model_path, backend)
+    _worker['scaler'] = model_registry.get_scaler(scaler_path)
+    # Keep the SharedMemory handles alive as long as the arrays are used
+    _worker['closes_shm'], _worker['closes'] = _attach(closes_spec)
+    _worker['features_shm'], _worker['features'] = _attach(features_spec)
+
+
+def make_folds(n_rows, train_days=TRAIN_DAYS, test_days=TEST_DAYS, step=None):
+    """
+    Rolling folds over row indices
+
+    A fold is (train_start, test_start, test_end): train rows are
+    [train_start, test_start), test rows [test_start, test_end). The first
+    train window starts after SEQUENCE_LENGTH rows so every traded day has a
+    full input window.
+    """
+    step = step or test_days
+    folds = []
+    test_start = backtest_engine.SEQUENCE_LENGTH + train_days
+    while test_start + test_days <= n_rows:
+        folds.append((test_start - train_days, test_start, test_start + test_days))
+        test_start += step
+    return folds
+
+
+def run_fold(fold, initial_capital=10000, grid=None, sort_by='total_return'):
+    """
+    Backtest one fold inside a worker
+
+    Each window of rows [a, b) is traded like run_backtest(days=b - a): days
+    a .. b-2 are traded and b-1 only supplies the last exit price.
+    """
+    train_start, test_start, test_end = fold
+    start = time.perf_counter()
+    closes = _worker['closes']
+    L = backtest_engine.SEQUENCE_LENGTH
+
+    # One predict call covers both windows (rows train_start .. test_end-2)
+    predictions = backtest_engine.predict_prices(
+        _worker['model'], _worker['scaler'],
+        _worker['features'][train_start - L:test_end - 2], L,
+    )
+    train_days = test_start - train_start
+    train_pred = predictions[:train_days - 1]
+    test_pred = predictions[train_days:]
+
+    params = {
+        'threshold': backtest_engine.ENTRY_THRESHOLD,
+        'hold_days': backtest_engine.HOLD_DAYS,
+        'fee': backtest_engine.FEE,
+        'slippage': backtest_engine.SLIPPAGE,
+    }
+    if grid is not None and len(grid):
+        metrics = backtest_engine.simulate_grid(
+            closes[train_start:test_start], train_pred,
+            grid[:, 0], grid[:, 1].astype(np.int64), grid[:, 2], grid[:, 3], initial_capital,
+        )
+        key = np.asarray(metrics[sort_by], dtype=np.float64)
+        best = int(np.argmin(key) if sort_by == 'max_drawdown' else np.argmax(key))
+        params = {
+            'threshold': float(grid[best, 0]),
+            'hold_days': int(grid[best, 1]),
+            'fee': float(grid[best, 2]),
+            'slippage': float(grid[best, 3]),
+        }
+
+    sim = backtest_engine.simulate(closes[test_start:test_end], test_pred, initial_capital, **params)
+    pnl = sim['trades']['pnl']
+    return {
+        'fold': fold,
+        'params': params,
+        'equity': sim['equity'],
+        'final_capital': sim['final_capital'],
+        'total_return': float(sim['total_return']),
+        'win_rate': float(sim['win_rate']),
+        'max_drawdown': float(sim['max_drawdown']),
+        'profit_factor': float(sim['profit_factor']),
+        'total_trades': int(sim['total_trades']),
+        'wins': int(sim['wins']),
+        'losses': int(sim['losses']),
+        'gross_wins': float(pnl[pnl > 0].sum()),
+        'gross_losses': float(-pnl[pnl < 0].sum()),
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+    }
+
+
+def _run_fold_task(args):
+    return run_fold(*args)
+
+
+def aggregate(fold_results, initial_capital=10000):
+    """Chain the folds' test windows into one out-of-sample report"""
+    if not fold_results:
+        return {}
+    growth = np.array([r['final_capital'] / initial_capital for r in fold_results])
+
+    # Stitch equity curves: each fold starts from the previous fold's ending capital
+    start_capital = initial_capital * np.concatenate([[1.0], np.cumprod(growth)[:-1]])
+    equity = np.concatenate([
+        r['equity'] / initial_capital * c for r, c in zip(fold_results, start_capital)
+    ])
+
+    wins = sum(r['wins'] for r in fold_results)
+    losses = sum(r['losses'] for r in fold_results)
+    gross_wins = sum(r['gross_wins'] for r in fold_results)
+    gross_losses = sum(r['gross_losses'] for r in fold_results)
+    returns = np.array([r['total_return'] for r in fold_results])
+    return {
+        'folds': len(fold_results),
+        'compounded_return': float((np.prod(growth) - 1) * 100),
+        'mean_fold_return': float(returns.mean()),
+        'std_fold_return': float(returns.std()),
+        'positive_folds': int(np.sum(returns > 0)),
+        'win_rate': wins / (wins + losses) * 100 if (wins + losses) > 0 else 0,
+        'max_drawdown': float(backtest_engine._max_drawdown(equity)),
+        'worst_fold_drawdown': float(max(r['max_drawdown'] for r in fold_results)),
+        'profit_factor': gross_wins / gross_losses if gross_losses > 0 else 0,
+        'total_trades': wins + losses,
+    }
+
+
+def run_walk_forward(train_days=TRAIN_DAYS, test_days=TEST_DAYS, step=None, initial_capital=10000,
+                     thresholds=None, hold_days=None, fees=None, slippages=None,
+                     sort_by='total_return', workers=None):
+    """
+    Run every fold in a process pool and return per-fold and aggregate metrics
+
+    Parameter grids are optional; when any is given, each fold picks its best
+    combination on the train window.
+    """
+    store = market_data.get_store(backtest_engine.DATA_PATH)
+    history = store.tail(len(store))
+    dates = history['Date']
+    closes = np.ascontiguousarray(history['BTC_Close'], dtype=np.float64)
+    features = np.ascontiguousarray(market_data.stack(history, backtest_engine.FEATURE_COLS), dtype=np.float64)
+
+    folds = make_folds(len(closes), train_days, test_days, step)
+    if not folds:
+        return {'error': 'Not enough historical data for one fold'}
+
+    grid = None
+    if any(g is not None for g in (thresholds, hold_days, fees, slippages)):
+        grid = np.array(np.meshgrid(
+            thresholds or [backtest_engine.ENTRY_THRESHOLD],
+            hold_days or [backtest_engine.HOLD_DAYS],
+            fees or [backtest_engine.FEE],
+            slippages or [backtest_engine.SLIPPAGE],
+            indexing='ij',
+        ), dtype=np.float64).reshape(4, -1).T
+
+    workers = min(workers or os.cpu_count() or 1, len(folds))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    closes_shm, closes_spec = _share(closes)
+    features_shm, features_spec = _share(features)
+    start = time.perf_counter()
+    try:
+        # spawn: never fork a parent that may already hold TensorFlow state
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(closes_spec, features_spec, backtest_engine.MODEL_PATH,
+                      backtest_engine.SCALER_PATH, threads, model_registry.BACKEND),
+        ) as pool:
+            tasks = [(fold, initial_capital, grid, sort_by) for fold in folds]
+            fold_results = list(pool.map(_run_fold_task, tasks))
+    finally:
+        for shm in (closes_shm, features_shm):
+            shm.close()
+            shm.unlink()
+    elapsed = time.perf_counter() - start
+
+    report_folds = []
+    for r in fold_results:
+        train_start, test_start, test_end = r['fold']
+        report_folds.append({
+            'train_start': str(dates[train_start]),
+            'test_start': str(dates[test_start]),
+            'test_end': str(dates[test_end - 1]),
+            **{k: v for k, v in r.items() if k not in ('fold', 'equity')},
+        })
+
+    return {
+        'train_days': train_days,
+        'test_days': test_days,
+        'workers': workers,
+        'elapsed_seconds': elapsed,
+        'fold_seconds': float(sum(r['seconds'] for r in fold_results)),
+        'aggregate': aggregate(fold_results, initial_capital),
+        'folds': report_folds,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Walk-forward backtest over the full history")
+    parser.add_argument('--train-days', type=int, default=TRAIN_DAYS)
+    parser.add_argument('--test-days', type=int, default=TEST_DAYS)
+    parser.add_argument('--step', type=int, default=None, help='Days between folds (default: test days)')
+    parser.add_argument('--capital', type=float, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--thresholds', help='Grid tuned on each train window, e.g. 0:0.02:21')
+    parser.add_argument('--holds', help='e.g. 1,2,3')
+    parser.add_argument('--fees')
+    parser.add_argument('--slippages')
+    parser.add_argument('--sort-by', default='total_return', choices=backtest_engine.SWEEP_METRICS)
+    parser.add_argument('--backend', choices=list(model_registry.MODEL_LOADERS),
+                        help='Inference backend (default: INFERENCE_BACKEND or keras)')
+    args = parser.parse_args()
+    if args.backend:
+        model_registry.BACKEND = args.backend
+
+    parse = backtest_engine.parse_grid
+    report = run_walk_forward(
+        train_days=args.train_days, test_days=args.test_days, step=args.step,
+        initial_capital=args.capital, workers=args.workers, sort_by=args.sort_by,
+        thresholds=parse(args.thresholds) if args.thresholds else None,
+        hold_days=parse(args.holds, int) if args.holds else None,
+        fees=parse(args.fees) if args.fees else None,
+        slippages=parse(args.slippages) if args.slippages else None,
+    )
+    if 'error' in report:
+        print(f"Error: {report['error']}")
+    else:
+        print(f"{'Test window':<25} {'Thresh':>7} {'Hold':>4} {'Return%':>8} {'Win%':>6} {'MaxDD%':>7} {'Trades':>6} {'Secs':>6}")
+        for f in report['folds']:
+            print(f"{f['test_start'] + '..' + f['test_end']:<25} {f['params']['threshold']:>7.4f} "
+                  f"{f['params']['hold_days']:>4} {f['total_return']:>8.2f} {f['win_rate']:>6.1f} "
+                  f"{f['max_drawdown']:>7.2f} {f['total_trades']:>6} {f['seconds']:>6.2f}")
+        agg = report['aggregate']
+        print(f"\nFolds: {agg['folds']} ({agg['positive_folds']} positive)")
+        print(f"Compounded Return: {agg['compounded_return']:.2f}%")
+        print(f"Win Rate: {agg['win_rate']:.2f}%")
+        print(f"Max Drawdown: {agg['max_drawdown']:.2f}%")
+        print(f"Profit Factor: {agg['profit_factor']:.2f}")
+        print(f"Total Trades: {agg['total_trades']}")
+        print(f"Wall time: {report['elapsed_seconds']:.2f}s on {report['workers']} workers "
+              f"({report['fold_seconds']:.2f}s of fold work)")
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production serving
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports this once, so whatever preload() loads
+is shared copy-on-write by every forked worker.
+"""
+import api_server
+
+api_server.preload()
+app = api_server.app